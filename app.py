@@ -1,10 +1,22 @@
+import click
 from flask import Flask, render_template, redirect, url_for, request, flash, session, jsonify
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from config import Config
-from models import db, User
+from models import db
 from service.user_service import UserService
 from service.post_service import PostService
 from service.order_service import OrderService
+from service.stats_service import StatsService
+from service.analytics_service import AnalyticsService, parse_report_args
+from service.maintenance import MaintenanceService
+from service.search_service import SearchService, parse_search_args
+from service.pagination import parse_page_args, page_payload
+from service import (cache, events, identity, jobs, metrics, price_index, query_budget, replica, search_index,
+                     sqlite_profile, startup, suggest_index, upsert)
+from service.etag import feed_etag, not_modified, resource_etag, with_etag
+from service.export import EXPORT_FORMATS, export_response
+from service.bulk_import import read_post_rows
+from service.serialization import json_response
 
 
 def create_app(config_class=Config):
@@ -12,24 +24,30 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     # Initialize extensions
+    sqlite_profile.configure_engine(app)
     db.init_app(app)
+    sqlite_profile.init_app(app)
     jwt = JWTManager(app)
-
-    # Create database tables
+    cache.init_app(app)
+    identity.init_app(app)
+    price_index.init_app(app)
+    suggest_index.init_app(app)
+    jobs.init_app(app)
+    events.init_app(app)
+
+    # Check the schema revision; tables and the admin user are only created when it is not current
     with app.app_context():
-        db.create_all()
-
-        # Create admin user if not exists
-        admin = db.session.query(db.exists().where(User.username == 'admin')).scalar()
-        if not admin:
-            UserService.create_user('admin', 'admin@example.com', 'admin123', is_admin=True)
+        upsert.init_app(app)
+        startup.init_app(app)
+        search_index.init_app(app)
+        replica.init_app(app)
+        metrics.init_app(app)
+        query_budget.init_app(app)
 
     # Helper function to check if user is admin
     def is_admin():
-        if 'user_id' not in session:
-            return False
-        user, _ = UserService.get_user_by_id(session['user_id'])
-        return user and user.is_admin
+        principal = identity.current_principal()
+        return principal is not None and principal.is_admin
 
     # ========== API ROUTES ==========
 
@@ -87,17 +105,27 @@ def create_app(config_class=Config):
         if 'user_id' not in session:
             return jsonify({"error": "Vui lòng đăng nhập"}), 401
 
-        user, error = UserService.get_user_by_id(session['user_id'])
-        if error:
-            return jsonify({"error": error}), 400
+        principal = identity.current_principal()
+        if principal is None:
+            return jsonify({"error": "User not found"}), 400
 
-        return jsonify({"user": user.to_dict()}), 200
+        return jsonify({"user": principal.to_dict()}), 200
 
     # Post API Routes
     @app.route('/api/posts', methods=['GET'])
     def api_get_posts():
-        posts = PostService.get_all_posts()
-        return jsonify({"posts": posts}), 200
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+
+        posts = PostService.get_all_posts(limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
     @app.route('/api/posts', methods=['POST'])
     def api_create_post():
@@ -134,14 +162,52 @@ def create_app(config_class=Config):
 
         return jsonify({"message": "Đăng bài thành công!", "post": post.to_dict()}), 201
 
+    @app.route('/api/posts/import', methods=['POST'])
+    def api_import_posts():
+        if 'user_id' not in session:
+            return jsonify({"error": "Vui lòng đăng nhập"}), 401
+
+        try:
+            rows = read_post_rows(request)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({"error": f"Tệp nhập không hợp lệ: {e}"}), 400
+
+        report, error = PostService.bulk_create_posts(session['user_id'], rows)
+        if error:
+            # Các lô trước lô lỗi đã được lưu: trả kèm báo cáo để client gửi tiếp từ resume_from_row
+            return jsonify({"error": error, **(report or {})}), 400
+
+        return jsonify({"message": f"Đã đăng {report['created']} bài", **report}), 200
+
     @app.route('/api/posts/search', methods=['GET'])
     def api_search_posts():
         search_type = request.args.get('type')
         query = request.args.get('query')
 
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+
+        # Không có type: tìm kết hợp văn bản, giá, người bán, loại sản phẩm, kèm sắp xếp và facet
+        if search_type is None:
+            try:
+                result = SearchService.search(**parse_search_args(request.args), limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số tìm kiếm không hợp lệ"}), 400
+            return with_etag(json_response(result), etag), 200
+
         posts = []
         if search_type == 'name' and query:
-            posts = PostService.search_posts_by_product_name(query)
+            try:
+                posts = PostService.search_posts_by_product_name(query, limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
         elif search_type == 'price':
             min_price = request.args.get('min_price')
             max_price = request.args.get('max_price')
@@ -149,11 +215,33 @@ def create_app(config_class=Config):
             try:
                 min_price = float(min_price) if min_price else None
                 max_price = float(max_price) if max_price else None
-                posts = PostService.search_posts_by_price_range(min_price, max_price)
             except ValueError:
                 return jsonify({"error": "Giá phải là số"}), 400
+            try:
+                posts = PostService.search_posts_by_price_range(min_price, max_price, limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
+
+    @app.route('/api/posts/suggest', methods=['GET'])
+    def api_suggest_product_types():
+        # Gợi ý loại sản phẩm theo tiền tố khi gõ, trả lời từ chỉ mục trong bộ nhớ
+        try:
+            limit = int(request.args.get('limit', suggest_index.MAX_SUGGESTIONS))
+        except ValueError:
+            return jsonify({"error": "Số gợi ý phải là số nguyên"}), 400
+        if limit < 1:
+            return jsonify({"error": "Số gợi ý phải lớn hơn 0"}), 400
 
-        return jsonify({"posts": posts}), 200
+        suggestions = suggest_index.suggest(request.args.get('prefix', ''), limit)
+        return json_response({"suggestions": suggestions}), 200
+
+    @app.route('/api/posts/stream', methods=['GET'])
+    def api_stream_posts():
+        # Đẩy các thay đổi của bài đăng tới client (SSE); bản ASGI phục vụ được nhiều kết nối hơn nhiều
+        subscription = events.get_hub().subscribe(events.parse_last_event_id(request.headers.get('Last-Event-ID')))
+        return events.sse_response(events.stream(subscription, app.config.get('SSE_HEARTBEAT') or 15))
 
     @app.route('/api/posts/<int:post_id>', methods=['GET'])
     def api_get_post(post_id):
@@ -161,7 +249,12 @@ def create_app(config_class=Config):
         if error:
             return jsonify({"error": error}), 404
 
-        return jsonify({"post": post.to_dict()}), 200
+        etag = resource_etag('post', post.id, post.updated_at)
+        response = not_modified(etag)
+        if response:
+            return response
+
+        return with_etag(jsonify({"post": post.to_dict()}), etag), 200
 
     # Order API Routes
     @app.route('/api/orders', methods=['POST'])
@@ -186,29 +279,90 @@ def create_app(config_class=Config):
 
         return jsonify({"message": "Đặt hàng thành công!", "order": order.to_dict()}), 201
 
+    @app.route('/api/orders/batch', methods=['POST'])
+    def api_create_orders():
+        if 'user_id' not in session:
+            return jsonify({"error": "Vui lòng đăng nhập"}), 401
+
+        data = request.get_json()
+        try:
+            items = [(int(item['post_id']), int(item['quantity'])) for item in data.get('items')]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Thông tin không hợp lệ"}), 400
+
+        orders, failures = OrderService.create_orders(session['user_id'], items)
+
+        if failures:
+            return jsonify({"error": "Không thể đặt hàng", "items": failures}), 400
+
+        return jsonify({"message": "Đặt hàng thành công!", "orders": [order.to_dict() for order in orders]}), 201
+
     @app.route('/api/user/purchases', methods=['GET'])
     def api_get_user_purchases():
         if 'user_id' not in session:
             return jsonify({"error": "Vui lòng đăng nhập"}), 401
 
-        purchases = OrderService.get_orders_by_buyer(session['user_id'])
-        return jsonify({"purchases": purchases}), 200
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag(session['user_id'])
+        response = not_modified(etag)
+        if response:
+            return response
+
+        purchases = OrderService.get_orders_by_buyer(session['user_id'], limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("purchases", purchases)), etag), 200
 
     @app.route('/api/user/sales', methods=['GET'])
     def api_get_user_sales():
         if 'user_id' not in session:
             return jsonify({"error": "Vui lòng đăng nhập"}), 401
 
-        sales = OrderService.get_orders_by_seller(session['user_id'])
-        return jsonify({"sales": sales}), 200
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag(session['user_id'])
+        response = not_modified(etag)
+        if response:
+            return response
+
+        sales = OrderService.get_orders_by_seller(session['user_id'], limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("sales", sales)), etag), 200
+
+    @app.route('/api/user/stats', methods=['GET'])
+    def api_get_user_stats():
+        if 'user_id' not in session:
+            return jsonify({"error": "Vui lòng đăng nhập"}), 401
+
+        etag = feed_etag(session['user_id'])
+        response = not_modified(etag)
+        if response:
+            return response
+
+        stats = StatsService.get_user_stats(session['user_id'])
+        return with_etag(jsonify({"stats": stats}), etag), 200
 
     @app.route('/api/user/posts', methods=['GET'])
     def api_get_user_posts():
         if 'user_id' not in session:
             return jsonify({"error": "Vui lòng đăng nhập"}), 401
 
-        posts = PostService.get_posts_by_user(session['user_id'])
-        return jsonify({"posts": posts}), 200
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag(session['user_id'])
+        response = not_modified(etag)
+        if response:
+            return response
+
+        posts = PostService.get_posts_by_user(session['user_id'], limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
     # Admin API Routes
     @app.route('/api/admin/posts', methods=['GET'])
@@ -216,24 +370,104 @@ def create_app(config_class=Config):
         if not is_admin():
             return jsonify({"error": "Bạn không có quyền truy cập"}), 403
 
-        posts = PostService.get_all_posts()
-        return jsonify({"posts": posts}), 200
+        export_format = request.args.get('format', 'json')
+        if export_format != 'json':
+            if export_format not in EXPORT_FORMATS:
+                return jsonify({"error": "Định dạng xuất không hợp lệ"}), 400
+            return export_response(PostService.iter_all_posts(), export_format, 'posts')
+
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag(session.get('user_id'))
+        response = not_modified(etag)
+        if response:
+            return response
+
+        posts = PostService.get_all_posts(limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
     @app.route('/api/admin/users', methods=['GET'])
     def api_admin_get_all_users():
         if not is_admin():
             return jsonify({"error": "Bạn không có quyền truy cập"}), 403
 
+        export_format = request.args.get('format', 'json')
+        if export_format != 'json':
+            if export_format not in EXPORT_FORMATS:
+                return jsonify({"error": "Định dạng xuất không hợp lệ"}), 400
+            return export_response(UserService.iter_all_users(), export_format, 'users')
+
         users = UserService.get_all_users()
-        return jsonify({"users": users}), 200
+        return json_response({"users": users}), 200
 
     @app.route('/api/admin/orders', methods=['GET'])
     def api_admin_get_all_orders():
         if not is_admin():
             return jsonify({"error": "Bạn không có quyền truy cập"}), 403
 
-        orders = OrderService.get_all_orders()
-        return jsonify({"orders": orders}), 200
+        export_format = request.args.get('format', 'json')
+        if export_format != 'json':
+            if export_format not in EXPORT_FORMATS:
+                return jsonify({"error": "Định dạng xuất không hợp lệ"}), 400
+            return export_response(OrderService.iter_all_orders(), export_format, 'orders')
+
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag(session['user_id'])
+        response = not_modified(etag)
+        if response:
+            return response
+
+        orders = OrderService.get_all_orders(limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("orders", orders)), etag), 200
+
+    @app.route('/api/admin/cache', methods=['GET'])
+    def api_admin_cache_stats():
+        if not is_admin():
+            return jsonify({"error": "Bạn không có quyền truy cập"}), 403
+
+        response_cache = cache.get_cache()
+        return jsonify({"cache": response_cache.stats() if response_cache else None}), 200
+
+    @app.route('/api/admin/analytics', methods=['GET'])
+    def api_admin_analytics():
+        if not is_admin():
+            return jsonify({"error": "Bạn không có quyền truy cập"}), 403
+
+        try:
+            start, end, granularity = parse_report_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số thống kê không hợp lệ"}), 400
+
+        etag = feed_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+
+        report = AnalyticsService.get_report(start, end, request.args.get('product_type'), granularity)
+        return with_etag(json_response({"analytics": report}), etag), 200
+
+    @app.route('/api/admin/jobs', methods=['GET'])
+    def api_admin_get_jobs():
+        if not is_admin():
+            return jsonify({"error": "Bạn không có quyền truy cập"}), 403
+
+        status = request.args.get('status')
+        if status and status not in jobs.STATUSES:
+            return jsonify({"error": "Trạng thái công việc không hợp lệ"}), 400
+
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        return json_response(page_payload("jobs", jobs.get_jobs(status, limit=limit, cursor=cursor))), 200
 
     @app.route('/api/admin/posts/<int:post_id>', methods=['DELETE'])
     def api_admin_delete_post(post_id):
@@ -298,6 +532,33 @@ def create_app(config_class=Config):
             return redirect(url_for('main'))
         return render_template('admin.html', username=session.get('username'))
 
+    # ========== CLI COMMANDS ==========
+
+    @app.cli.command('rebuild-user-stats')
+    def rebuild_user_stats():
+        """Recompute the user_stats rollup from the orders table."""
+        count, error = StatsService.rebuild()
+        if error:
+            raise click.ClickException(error)
+        click.echo(f"Rebuilt stats for {count} users")
+
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics():
+        """Rebuild the daily product_type rollups from posts and orders."""
+        count, error = AnalyticsService.rebuild()
+        if error:
+            raise click.ClickException(error)
+        click.echo(f"Rebuilt {count} product_type rollup rows")
+
+    @app.cli.command('run-maintenance')
+    def run_maintenance():
+        """Run the nightly maintenance job now: rollup rebuilds, pruning, ANALYZE and VACUUM."""
+        result, error = MaintenanceService.run_nightly()
+        if error:
+            raise click.ClickException(error)
+        click.echo(f"Rebuilt stats for {result['user_stats']} users and {result['analytics_rows']} rollup rows, "
+                   f"pruned {result['jobs_pruned']} jobs and {result['events_pruned']} events")
+
     return app
 
 
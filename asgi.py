@@ -0,0 +1,128 @@
+"""ASGI serving mode.
+
+    uvicorn --factory asgi:create_asgi_app --workers 4
+
+The hot read endpoints below are async and read through aiosqlite, so a
+worker keeps serving other connections while a query runs; every other route
+is the Flask view from app.py, run on the worker's thread pool.
+"""
+from flask import jsonify, request
+
+from app import create_app
+from config import Config
+from service import async_db, events, suggest_index
+from service.asgi import AsgiApp, run_sync
+from service.etag import feed_etag, not_modified, resource_etag, with_etag
+from service.pagination import page_payload, parse_page_args
+from service.post_service import PostService
+from service.search_service import SearchService, parse_search_args
+from service.serialization import POST_FIELDS, json_response
+
+
+def create_asgi_app(config_class=Config):
+    app = create_app(config_class)
+    async_db.init_app(app)
+    asgi = AsgiApp(app)
+
+    @asgi.route('/api/posts', methods=['GET'])
+    async def api_get_posts():
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+
+        posts = await PostService.get_all_posts_async(limit=limit, cursor=cursor)
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
+
+    @asgi.route('/api/posts/search', methods=['GET'])
+    async def api_search_posts():
+        search_type = request.args.get('type')
+        query = request.args.get('query')
+
+        try:
+            limit, cursor = parse_page_args(request.args)
+        except ValueError:
+            return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        etag = feed_etag()
+        response = not_modified(etag)
+        if response:
+            return response
+
+        if search_type is None:
+            try:
+                result = await SearchService.search_async(**parse_search_args(request.args), limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số tìm kiếm không hợp lệ"}), 400
+            return with_etag(json_response(result), etag), 200
+
+        # Tìm theo tên và theo giá dùng chỉ mục FTS5/giá trong bộ nhớ của bản đồng bộ, chạy trên thread pool
+        posts = []
+        if search_type == 'name' and query:
+            try:
+                posts = await run_sync(PostService.search_posts_by_product_name, query, limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+        elif search_type == 'price':
+            min_price = request.args.get('min_price')
+            max_price = request.args.get('max_price')
+
+            try:
+                min_price = float(min_price) if min_price else None
+                max_price = float(max_price) if max_price else None
+            except ValueError:
+                return jsonify({"error": "Giá phải là số"}), 400
+            try:
+                posts = await run_sync(PostService.search_posts_by_price_range, min_price, max_price,
+                                       limit=limit, cursor=cursor)
+            except ValueError:
+                return jsonify({"error": "Tham số phân trang không hợp lệ"}), 400
+
+        return with_etag(json_response(page_payload("posts", posts)), etag), 200
+
+    @asgi.route('/api/posts/suggest', methods=['GET'])
+    async def api_suggest_product_types():
+        try:
+            limit = int(request.args.get('limit', suggest_index.MAX_SUGGESTIONS))
+        except ValueError:
+            return jsonify({"error": "Số gợi ý phải là số nguyên"}), 400
+        if limit < 1:
+            return jsonify({"error": "Số gợi ý phải lớn hơn 0"}), 400
+
+        prefix = request.args.get('prefix', '')
+        index = suggest_index.get_index()
+        # Chỉ mục đã nạp thì trả lời ngay trên event loop; nạp lần đầu (đọc DB) thì chạy trên thread pool
+        if index is not None and not index.is_stale():
+            suggestions = suggest_index.suggest(prefix, limit)
+        else:
+            suggestions = await run_sync(suggest_index.suggest, prefix, limit)
+        return json_response({"suggestions": suggestions}), 200
+
+    @asgi.route('/api/posts/stream', methods=['GET'])
+    async def api_stream_posts():
+        # Mỗi kết nối chỉ là một coroutine chờ sự kiện, nên hàng nghìn client đang mở không chiếm luồng nào
+        hub = events.get_hub()
+        if not hub.started:
+            await run_sync(hub.start)
+        subscription = hub.subscribe(events.parse_last_event_id(request.headers.get('Last-Event-ID')))
+        return events.sse_response(events.stream_async(subscription, app.config.get('SSE_HEARTBEAT') or 15))
+
+    @asgi.route('/api/posts/<int:post_id>', methods=['GET'])
+    async def api_get_post(post_id):
+        row, error = await PostService.get_post_row_async(post_id)
+        if error:
+            return jsonify({"error": error}), 404
+
+        etag = resource_etag('post', row.id, row.updated_at)
+        response = not_modified(etag)
+        if response:
+            return response
+
+        return with_etag(jsonify({"post": POST_FIELDS.to_dict(row)}), etag), 200
+
+    return asgi
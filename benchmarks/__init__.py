@@ -0,0 +1,15 @@
+"""Benchmarks and stress harnesses for SwapClub.
+
+Each module is a standalone script, run from the repository root, e.g.::
+
+    python -m benchmarks.search_bench --posts 1000000
+
+The suite for comparing commits works on synthetic data from datagen and
+writes JSON that results compares::
+
+    python -m benchmarks.datagen --database /tmp/swapclub.db
+    python -m benchmarks.service_bench --database /tmp/swapclub.db --output before.json
+    python -m benchmarks.http_load --database /tmp/swapclub.db --accounts 10000 --output load-before.json
+    python -m benchmarks.startup_bench --output startup-before.json
+    python -m benchmarks.results before.json after.json
+"""
@@ -0,0 +1,113 @@
+"""Backfill time and report latency of the daily product_type rollups.
+
+    python -m benchmarks.analytics_bench --years 3 --product-types 200 --orders 300000
+
+Posts and orders are spread over the past years with random timestamps,
+the rollup is rebuilt from them in one pass, and the admin report is then
+timed over several date ranges.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from config import Config
+from sqlalchemy import func
+
+from models import db, Order
+from service.analytics_service import AnalyticsService, MAX_DAILY_SERIES_DAYS
+from service.user_service import UserService
+
+
+def seed(args):
+    now = datetime.utcnow()
+    span = int(timedelta(days=365 * args.years).total_seconds())
+    types = [f'Loại {i}' for i in range(args.product_types)]
+
+    def moment():
+        return (now - timedelta(seconds=random.randrange(span))).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+    seller, _ = UserService.create_user('seller', 'seller@example.com', 'secret')
+    buyer, _ = UserService.create_user('buyer', 'buyer@example.com', 'secret')
+    connection = db.session.connection()
+    posts = []
+    for post_id in range(1, args.posts + 1):
+        created = moment()
+        active = random.random() < 0.3
+        posts.append((post_id, seller.id, random.choice(types), 1 if active else 0, 100.0, '', '09',
+                      int(active), created, created if active else max(created, moment())))
+    connection.exec_driver_sql(
+        "INSERT INTO posts (id, user_id, product_type, quantity, price, description, contact_info, "
+        "is_active, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", posts
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO orders (post_id, seller_id, buyer_id, quantity, price, status, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+        [(random.randrange(1, args.posts + 1), seller.id, buyer.id, random.randint(1, 5),
+          random.choice((50000.0, 125000.0, 990000.0)), *(moment(),) * 2) for _ in range(args.orders)]
+    )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--product-types', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--orders', type=int, default=300_000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            seed(args)
+
+            started = time.perf_counter()
+            rows, error = AnalyticsService.rebuild()
+            if error:
+                raise SystemExit(error)
+            print(f"backfill: {rows} rollup rows from {args.posts} posts and {args.orders} orders "
+                  f"in {time.perf_counter() - started:.2f} s")
+
+            today = datetime.utcnow().date()
+            ranges = {
+                'last 30 days': (today - timedelta(days=29), today),
+                'last year': (today - timedelta(days=364), today),
+                'a month, 2 years ago': (today - timedelta(days=760), today - timedelta(days=730)),
+                f'all {args.years} years': (today - timedelta(days=365 * args.years), today),
+                'one type, all years': (today - timedelta(days=365 * args.years), today),
+            }
+            for name, (start, end) in ranges.items():
+                product_type = 'Loại 7' if name.startswith('one type') else None
+                granularity = 'day' if (end - start).days < MAX_DAILY_SERIES_DAYS else 'month'
+                timings = []
+                for _ in range(args.rounds):
+                    started = time.perf_counter()
+                    report = AnalyticsService.get_report(start, end, product_type, granularity)
+                    timings.append(time.perf_counter() - started)
+
+                if product_type is None:
+                    # Đối chiếu với bảng orders để chắc chắn cách gộp theo tháng không làm sai số liệu
+                    expected = db.session.query(func.count(Order.id)).filter(
+                        func.date(Order.created_at).between(start.isoformat(), end.isoformat())
+                    ).scalar()
+                    if report['totals']['order_count'] != expected:
+                        raise SystemExit(f"{name}: {report['totals']['order_count']} orders, expected {expected}")
+
+                print(f"  {name:22s} median {statistics.median(timings) * 1000:6.1f} ms  "
+                      f"max {max(timings) * 1000:6.1f} ms  ({granularity} series)")
+
+
+if __name__ == '__main__':
+    main()
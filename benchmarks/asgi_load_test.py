@@ -0,0 +1,210 @@
+"""Load test the WSGI build (gunicorn sync workers) against the ASGI build (uvicorn) side by side.
+
+    python -m benchmarks.asgi_load_test --posts 100000 --connections 1000 --workers 4
+
+Both servers serve the same SQLite file, one after the other. The client keeps
+--connections HTTP/1.1 connections open (reconnecting when a sync worker
+closes one) and sends requests back to back for --duration seconds per path,
+then reports requests per second, p50/p99 latency and failed requests. The
+response cache is off unless --cache is given, so every request reaches the
+database. --db-latency makes every SQLite statement in the servers sleep
+first, in the thread running it, standing in for a database across the
+network.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from app import create_app
+from benchmarks.search_bench import load_posts
+from config import Config
+from models import db
+from service import search_index
+
+# Nạp vào mọi tiến trình server (kể cả worker uvicorn được spawn) qua PYTHONPATH
+# (chỉ câu lệnh của ứng dụng; các câu lệnh nội bộ của FTS5 không bị làm chậm)
+SLOW_SQLITE = """
+import os, sqlite3, time
+
+_latency = float(os.environ['LOAD_TEST_DB_LATENCY'])
+_connect = sqlite3.connect
+
+
+class _SlowCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        time.sleep(_latency)
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        time.sleep(_latency)
+        return super().executemany(*args)
+
+
+class _SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=_SlowCursor):
+        return super().cursor(factory)
+
+
+def _slow_connect(*args, **kwargs):
+    kwargs.setdefault('factory', _SlowConnection)
+    return _connect(*args, **kwargs)
+
+
+sqlite3.connect = sqlite3.dbapi2.connect = _slow_connect
+"""
+
+PATHS = [
+    '/api/posts?limit=20',
+    '/api/posts/search?q=dong+ho&limit=20&facets=0',
+    '/api/posts/search?min_price=100&max_price=500&sort=price_asc&limit=20&facets=0',
+]
+
+
+def server_commands(port, workers):
+    return {
+        'wsgi': [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'sync',
+                 '--backlog', '4096', '--bind', f'127.0.0.1:{port}', 'app:create_app()'],
+        'asgi': [sys.executable, '-m', 'uvicorn', '--factory', 'asgi:create_asgi_app', '--workers', str(workers),
+                 '--backlog', '4096', '--no-access-log', '--log-level', 'warning', '--port', str(port)],
+    }
+
+
+async def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def read_response(reader):
+    """Read one response; returns (status, keep_alive)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(':', 1) for line in lines[1:] if ':' in line)
+    headers = {name.strip().lower(): value.strip().lower() for name, value in headers.items()}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection') != 'close'
+
+
+async def connection_loop(port, request, stop_at, latencies, counters):
+    reader = writer = None
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            counters['errors'] += 1
+            writer = None
+            await asyncio.sleep(0.05)
+            continue
+
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            counters['errors'] += 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(port, path, connections, duration, warmup):
+    request = (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: keep-alive\r\n\r\n").encode()
+    # Chạy nóng để các worker mở kết nối DB và biên dịch câu lệnh trước khi đo
+    await asyncio.gather(*[connection_loop(port, request, time.monotonic() + warmup, [], {'errors': 0})
+                           for _ in range(min(connections, 50))])
+
+    latencies, counters = [], {'errors': 0}
+    started = time.monotonic()
+    await asyncio.gather(*[connection_loop(port, request, started + duration, latencies, counters)
+                           for _ in range(connections)])
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    pick = lambda fraction: latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+    return {'rps': len(latencies) / elapsed, 'p50': pick(0.5), 'p99': pick(0.99), 'errors': counters['errors']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=15, help="seconds measured per path")
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache', action='store_true', help="keep the response cache on")
+    parser.add_argument('--db-latency', type=float, default=0, help="milliseconds added to every query")
+    parser.add_argument('--path', action='append', help="path to load (repeatable), default: feed and two searches")
+    parser.add_argument('--mode', action='append', choices=('wsgi', 'asgi'), help="server to test (repeatable)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, 'load.db')
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + database, SECRET_KEY='load-test',
+                   JWT_SECRET_KEY='load-test-secret-key-for-local-runs', PYTHONPATH=os.getcwd())
+        if not args.cache:
+            env['RESPONSE_CACHE_SIZE'] = '0'
+        if args.db_latency:
+            site_dir = os.path.join(workdir, 'site')
+            os.mkdir(site_dir)
+            with open(os.path.join(site_dir, 'sitecustomize.py'), 'w') as f:
+                f.write(SLOW_SQLITE)
+            env['PYTHONPATH'] = os.pathsep.join([site_dir, os.getcwd()])
+            env['LOAD_TEST_DB_LATENCY'] = str(args.db_latency / 1000)
+
+        class LoadConfig(Config):
+            SQLALCHEMY_DATABASE_URI = env['DATABASE_URL']
+            SECRET_KEY = env['SECRET_KEY']
+            JWT_SECRET_KEY = env['JWT_SECRET_KEY']
+
+        app = create_app(LoadConfig)
+        with app.app_context():
+            load_posts(args.posts)
+            search_index.get_backend().rebuild()
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            db.engine.dispose()
+        print(f"Loaded {args.posts} posts; {args.connections} connections, {args.workers} workers, "
+              f"{args.duration:.0f}s per path, db latency {args.db_latency} ms")
+
+        results = {}
+        for mode in args.mode or ('wsgi', 'asgi'):
+            command = server_commands(args.port, args.workers)[mode]
+            log = open(os.path.join(workdir, f'{mode}.log'), 'w')
+            server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+            try:
+                asyncio.run(wait_until_up(args.port))
+                for path in args.path or PATHS:
+                    results[mode, path] = asyncio.run(
+                        run_load(args.port, path, args.connections, args.duration, args.warmup)
+                    )
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait()
+                log.close()
+
+        print(f"{'path':<80}{'mode':<6}{'req/s':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'errors':>8}")
+        for (mode, path), result in results.items():
+            print(f"{path:<80}{mode:<6}{result['rps']:>9.0f}{result['p50']:>11.1f}{result['p99']:>11.1f}"
+                  f"{result['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Assert with EXPLAIN QUERY PLAN that each service query uses its index.
+
+    python -m benchmarks.check_query_plans
+
+Every service method below is called for real against a scratch database; the
+SELECTs it issues are captured from the engine and explained with the same
+parameters. Exits with status 1 if any query does not use the expected index.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from app import create_app
+from config import Config
+from models import db
+from service.order_service import OrderService
+from service.post_service import PostService
+from service.search_service import SearchService
+
+CURSOR = (datetime(2030, 1, 1), 1000)
+
+CHECKS = [
+    ('PostService.get_all_posts', 'ix_posts_is_active_created_at',
+     lambda: PostService.get_all_posts()),
+    ('PostService.get_all_posts (page)', 'ix_posts_is_active_created_at',
+     lambda: PostService.get_all_posts(limit=20, cursor=CURSOR)),
+    ('PostService.get_posts_by_user', 'ix_posts_user_id_created_at',
+     lambda: PostService.get_posts_by_user(1)),
+    ('PostService.get_posts_by_user (page)', 'ix_posts_user_id_created_at',
+     lambda: PostService.get_posts_by_user(1, limit=20, cursor=CURSOR)),
+    ('PostService.search_posts_by_price_range', 'ix_posts_is_active_price',
+     lambda: PostService.search_posts_by_price_range(10, 100)),
+    ('PostService.search_posts_by_product_name (like)', 'ix_posts_is_active_created_at',
+     lambda: PostService.search_posts_by_product_name('ca phe', limit=20)),
+    ('SearchService.search (newest page)', 'ix_posts_is_active_created_at',
+     lambda: SearchService.search(limit=20, facets=False)),
+    ('SearchService.search (price_asc page)', 'ix_posts_is_active_price',
+     lambda: SearchService.search(min_price=10, sort='price_asc', limit=20, facets=False)),
+    ('SearchService.search (product_type facet)', 'ix_posts_is_active_product_type_price',
+     lambda: SearchService.search(limit=20)),
+    ('OrderService.get_orders_by_buyer', 'ix_orders_buyer_id_created_at',
+     lambda: OrderService.get_orders_by_buyer(1)),
+    ('OrderService.get_orders_by_buyer (page)', 'ix_orders_buyer_id_created_at',
+     lambda: OrderService.get_orders_by_buyer(1, limit=20, cursor=CURSOR)),
+    ('OrderService.get_orders_by_seller', 'ix_orders_seller_id_created_at',
+     lambda: OrderService.get_orders_by_seller(1)),
+    ('OrderService.get_orders_by_seller (page)', 'ix_orders_seller_id_created_at',
+     lambda: OrderService.get_orders_by_seller(1, limit=20, cursor=CURSOR)),
+    ('OrderService.get_all_orders', 'ix_orders_created_at',
+     lambda: OrderService.get_all_orders()),
+    ('OrderService.get_all_orders (page)', 'ix_orders_created_at',
+     lambda: OrderService.get_all_orders(limit=20, cursor=CURSOR)),
+]
+
+
+@contextmanager
+def capture_selects(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(statement, parameters):
+    connection = db.session.connection().connection.driver_connection
+    return [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        class CheckConfig(Config):
+            SECRET_KEY = 'check'
+            JWT_SECRET_KEY = 'check-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'plans.db')
+            SEARCH_BACKEND = 'like'
+            RESPONSE_CACHE_SIZE = 0
+
+        app = create_app(CheckConfig)
+        failures = 0
+        with app.app_context():
+            db.session.execute(text('ANALYZE'))
+            for label, index_name, call in CHECKS:
+                with capture_selects(db.engine) as statements:
+                    call()
+
+                plans = [explain(statement, parameters) for statement, parameters in statements]
+                used = any(index_name in detail for plan in plans for detail in plan)
+                failures += not used
+                print(f"{'ok  ' if used else 'FAIL'} {label}: expected {index_name}")
+                if not used:
+                    for plan in plans:
+                        print('       ' + ' | '.join(plan))
+
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compare one cart checkout of N items with N sequential single-order requests.
+
+    python -m benchmarks.checkout_bench --items 10 --rounds 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app
+from config import Config
+from models import db, Post
+from service.user_service import UserService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            seller, _ = UserService.create_user('seller', 'seller@example.com', 'secret')
+            UserService.create_user('buyer', 'buyer@example.com', 'secret')
+            # Đủ hàng cho cả hai cách đặt trong mọi vòng
+            db.session.add_all([
+                Post(user_id=seller.id, product_type=f'Món {i}', quantity=args.rounds * 2, price=1000 + i,
+                     description='', contact_info='0900000000', is_active=True)
+                for i in range(args.items)
+            ])
+            db.session.commit()
+            post_ids = [post.id for post in Post.query.order_by(Post.id)]
+
+        client = app.test_client()
+        client.post('/api/login', json={'email': 'buyer@example.com', 'password': 'secret'})
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for post_id in post_ids:
+                response = client.post('/api/orders', json={'post_id': post_id, 'quantity': 1})
+                assert response.status_code == 201, response.get_json()
+        sequential = (time.perf_counter() - started) / args.rounds
+
+        items = [{'post_id': post_id, 'quantity': 1} for post_id in post_ids]
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            response = client.post('/api/orders/batch', json={'items': items})
+            assert response.status_code == 201, response.get_json()
+        batch = (time.perf_counter() - started) / args.rounds
+
+        print(f"cart of {args.items} items, mean of {args.rounds} rounds")
+        print(f"  {args.items} x POST /api/orders : {sequential * 1000:8.2f} ms")
+        print(f"  1 x POST /api/orders/batch: {batch * 1000:8.2f} ms ({sequential / batch:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
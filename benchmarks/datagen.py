@@ -0,0 +1,259 @@
+"""Fill a scratch database with synthetic users, posts and orders.
+
+    python -m benchmarks.datagen --users 10000 --posts 200000 --orders 300000 --database /tmp/swapclub.db
+
+Product types are a category, a brand and a model ("Điện thoại Samsung
+M12"), with categories, brands and models picked by Zipf-like popularity, so
+a few types are everywhere and most are rare. Prices are log-normal around a
+median per category, rounded to 1000 đ. About a third of the users sell, and
+posts per seller and orders per buyer are heavy-tailed. Posts are spread
+over --days days in id order; orders come after their post, favour popular
+posts, and take stock in time order, so a post that runs out is inactive
+from its last order on, like with OrderService.create_order (a buyer whose
+pick has sold out buys another post listed by then). The search
+index, user stats and analytics rollups are rebuilt at the end; the price
+and suggestion indexes load on first use.
+
+The same --seed gives the same database. Users are user<N> with email
+user<N>@example.com and password `secret`. The other benchmarks call
+scratch_database() to generate a fresh database or copy a generated one.
+"""
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from config import Config
+from models import db, Post
+from service import search_index
+from service.analytics_service import AnalyticsService
+from service.stats_service import StatsService
+
+# Mốc thời gian cố định để cùng seed cho ra cùng dữ liệu
+END = datetime(2026, 1, 1)
+PASSWORD = 'secret'
+BATCH_SIZE = 50000
+# Số bài khác người mua thử khi bài họ chọn đã hết hàng
+SUBSTITUTE_TRIES = 5
+
+# (loại, các hãng, giá trung vị tính bằng đồng), phổ biến nhất trước
+CATALOG = [
+    ('Điện thoại', ['Samsung', 'Apple', 'Xiaomi', 'Oppo', 'Vivo', 'Nokia'], 4_500_000),
+    ('Áo khoác', ['Uniqlo', 'Zara', 'Routine', 'Adidas'], 350_000),
+    ('Giày thể thao', ['Nike', 'Adidas', 'Bitis', 'Puma', 'Converse'], 900_000),
+    ('Laptop', ['Dell', 'Asus', 'Lenovo', 'HP', 'Apple', 'Acer'], 12_000_000),
+    ('Sách giáo khoa', ['NXB Giáo dục', 'NXB Trẻ', 'Kim Đồng'], 40_000),
+    ('Tai nghe', ['Sony', 'Apple', 'JBL', 'Xiaomi', 'Sennheiser'], 600_000),
+    ('Đồng hồ', ['Casio', 'Seiko', 'Citizen', 'Orient'], 1_500_000),
+    ('Balo', ['Mikkor', 'Samsonite', 'Adidas', 'Nike'], 450_000),
+    ('Xe đạp', ['Giant', 'Asama', 'Thống Nhất', 'Trinx'], 2_500_000),
+    ('Nồi cơm điện', ['Sunhouse', 'Panasonic', 'Toshiba', 'Cuckoo'], 800_000),
+    ('Quạt máy', ['Senko', 'Panasonic', 'Asia', 'Toshiba'], 400_000),
+    ('Cà phê', ['Trung Nguyên', 'Highlands', 'G7', 'Phúc Long'], 120_000),
+    ('Máy ảnh', ['Canon', 'Nikon', 'Sony', 'Fujifilm'], 9_000_000),
+    ('Bàn học', ['Hòa Phát', 'IKEA', 'Xuân Hòa'], 700_000),
+    ('Trà sữa', ['Phúc Long', 'Gong Cha', 'Koi'], 50_000),
+    ('Bánh mì', ['Huỳnh Hoa', 'Phượng', 'Hòa Mã'], 30_000),
+]
+MODELS_PER_BRAND = 60
+CONDITIONS = ['còn mới', 'đã qua sử dụng', 'còn bảo hành', 'chính hãng', 'giá rẻ', 'như mới', 'fullbox']
+PLACES = ['Hà Nội', 'TP.HCM', 'Đà Nẵng', 'Cần Thơ', 'Hải Phòng', 'Huế']
+
+
+def zipf_weights(count, exponent=1.0):
+    """Cumulative weights where the item of rank r is picked in proportion to 1 / r**exponent"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def heavy_tail_weights(rng, count, alpha=1.2):
+    """Cumulative Pareto weights: a few items get most of the picks"""
+    return list(itertools.accumulate(rng.paretovariate(alpha) for _ in range(count)))
+
+
+class ProductPicker:
+    """Draws product types and prices with catalog-driven popularity and prices"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.category_weights = zipf_weights(len(CATALOG), 0.8)
+        self.brand_weights = {category: zipf_weights(len(brands)) for category, brands, _ in CATALOG}
+        self.model_weights = zipf_weights(MODELS_PER_BRAND, 1.1)
+        self.models = range(1, MODELS_PER_BRAND + 1)
+
+    def pick(self, count):
+        """`count` (product_type, price, category) tuples"""
+        rng = self.rng
+        products = []
+        for (category, brands, median), model in zip(rng.choices(CATALOG, cum_weights=self.category_weights, k=count),
+                                                      rng.choices(self.models, cum_weights=self.model_weights, k=count)):
+            brand = rng.choices(brands, cum_weights=self.brand_weights[category])[0]
+            price = max(1000, round(rng.lognormvariate(math.log(median), 0.6), -3))
+            products.append((f"{category} {brand} M{model}", float(price), category))
+        return products
+
+    def description(self, category):
+        rng = self.rng
+        return f"{category} {rng.choice(CONDITIONS)}, {rng.choice(CONDITIONS)}, giao dịch tại {rng.choice(PLACES)}"
+
+
+def as_sql(at):
+    # Cùng định dạng SQLAlchemy lưu DateTime trong SQLite (luôn có micro giây), để so sánh chuỗi vẫn đúng
+    return at.isoformat(' ', 'microseconds')
+
+
+def _insert(connection, statement, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.exec_driver_sql(statement, rows[start:start + BATCH_SIZE])
+
+
+def generate(users, posts, orders, seed=0, days=365):
+    """Bulk-load users, posts and orders into the app's empty database and rebuild derived tables.
+
+    Must run in an app context. Returns the number of rows written per
+    table; fewer orders than asked are written if stock runs out.
+    """
+    if db.session.query(Post.id).first() is not None:
+        raise ValueError("The database already has posts")
+
+    rng = random.Random(seed)
+    connection = db.session.connection()
+    start = END - timedelta(days=days)
+    span = (END - start).total_seconds()
+
+    # Tài khoản được đăng ký trong khoảng thời gian trước bài đăng đầu tiên
+    first_user_id = connection.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM users").scalar() + 1
+    user_ids = list(range(first_user_id, first_user_id + users))
+    joined = sorted(start - timedelta(seconds=rng.uniform(0, span)) for _ in range(users))
+    _insert(connection,
+            "INSERT INTO users (id, username, email, password, is_admin, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 0, ?, ?)",
+            [(user_id, f'user{n}', f'user{n}@example.com', PASSWORD, as_sql(at), as_sql(at))
+             for n, (user_id, at) in enumerate(zip(user_ids, joined), start=1)])
+
+    sellers = rng.sample(user_ids, max(1, users // 3))
+    seller_weights = heavy_tail_weights(rng, len(sellers))
+    buyer_weights = heavy_tail_weights(rng, len(user_ids))
+
+    products = ProductPicker(rng)
+    post_times = sorted(start + timedelta(seconds=rng.uniform(0, span)) for _ in range(posts))
+    post_rows = []
+    for created_at, seller_id, (product_type, price, category) in zip(
+            post_times, rng.choices(sellers, cum_weights=seller_weights, k=posts), products.pick(posts)):
+        # Đồ cũ thường chỉ có một chiếc, một phần nhỏ là hàng bán số lượng
+        quantity = 1 if rng.random() < 0.7 else rng.randint(2, 20)
+        post_rows.append((seller_id, product_type, quantity, price, products.description(category),
+                          f"09{rng.randrange(10 ** 8):08d}", created_at))
+
+    candidates = []
+    if posts:
+        popularity = heavy_tail_weights(rng, posts, 1.5)
+        for index, buyer_id in zip(rng.choices(range(posts), cum_weights=popularity, k=orders),
+                                   rng.choices(user_ids, cum_weights=buyer_weights, k=orders)):
+            posted = post_rows[index][6]
+            at = posted + timedelta(seconds=rng.uniform(0, (END - posted).total_seconds()))
+            candidates.append((at, index, buyer_id))
+        candidates.sort()
+
+    first_post_id = connection.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM posts").scalar() + 1
+    stock = [row[2] for row in post_rows]
+    sold_out_at = {}
+    order_rows = []
+    for at, index, buyer_id in candidates:
+        # Bài đã hết hàng thì người mua chọn một bài khác đăng trước thời điểm đó
+        for _ in range(SUBSTITUTE_TRIES):
+            if stock[index] and post_rows[index][0] != buyer_id:
+                break
+            index = rng.randrange(bisect.bisect_right(post_times, at))
+        else:
+            continue
+        seller_id, price = post_rows[index][0], post_rows[index][3]
+        quantity = min(stock[index], 1 if rng.random() < 0.8 else rng.randint(2, 3))
+        stock[index] -= quantity
+        if stock[index] == 0:
+            sold_out_at[index] = at
+        order_rows.append((first_post_id + index, seller_id, buyer_id, quantity, price, as_sql(at), as_sql(at)))
+
+    _insert(connection,
+            "INSERT INTO posts (id, user_id, product_type, quantity, price, description, contact_info, "
+            "is_active, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(first_post_id + index, seller_id, product_type, stock[index], price, description, contact,
+              index not in sold_out_at, as_sql(created_at), as_sql(sold_out_at.get(index, created_at)))
+             for index, (seller_id, product_type, _, price, description, contact, created_at) in enumerate(post_rows)])
+    _insert(connection,
+            "INSERT INTO orders (post_id, seller_id, buyer_id, quantity, price, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)",
+            order_rows)
+    db.session.commit()
+
+    search_index.get_backend().rebuild()
+    for rebuild in (StatsService.rebuild, AnalyticsService.rebuild):
+        _, error = rebuild()
+        if error:
+            raise RuntimeError(error)
+
+    return {"users": users, "posts": posts, "orders": len(order_rows), "active_posts": posts - len(sold_out_at)}
+
+
+def scratch_config(database_uri, **settings):
+    """Config for a benchmark app on `database_uri`, with background jobs and metrics off"""
+    class BenchConfig(Config):
+        SECRET_KEY = 'bench'
+        JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+        SQLALCHEMY_DATABASE_URI = database_uri
+        JOB_WORKERS = 0
+        METRICS_ENABLED = False
+
+    for name, value in settings.items():
+        setattr(BenchConfig, name, value)
+    return BenchConfig
+
+
+def scratch_database(workdir, source=None, users=2000, posts=50000, orders=100000, seed=0):
+    """Path of a database in `workdir` to benchmark on: a copy of `source`, or freshly generated"""
+    path = os.path.join(workdir, 'bench.db')
+    if source:
+        # Dùng backup API để bản sao có cả các trang còn nằm trong WAL
+        with sqlite3.connect(source) as original, sqlite3.connect(path) as copy:
+            original.backup(copy)
+        return path
+
+    started = time.perf_counter()
+    with create_app(scratch_config('sqlite:///' + path)).app_context():
+        counts = generate(users, posts, orders, seed)
+    print(f"Generated {counts['users']} users, {counts['posts']} posts ({counts['active_posts']} active) and "
+          f"{counts['orders']} orders in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', required=True, help="SQLite file to create (must not exist yet)")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--orders', type=int, default=300000)
+    parser.add_argument('--days', type=int, default=365, help="time span of the posts and orders")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        raise SystemExit(f"{args.database} already exists")
+
+    started = time.perf_counter()
+    with create_app(scratch_config('sqlite:///' + os.path.abspath(args.database))).app_context():
+        counts = generate(args.users, args.posts, args.orders, args.seed, args.days)
+        # Gộp WAL vào file chính để có thể sao chép file một mình
+        db.session.execute(db.text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    elapsed = time.perf_counter() - started
+    rows = counts['users'] + counts['posts'] + counts['orders']
+    print(f"{counts['users']} users, {counts['posts']} posts ({counts['active_posts']} active), "
+          f"{counts['orders']} orders in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s, indexes and rollups included)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Time admin deletes of users and posts: the inline cascade against the request that defers it to a job.
+
+    python -m benchmarks.delete_bench --users 10 --posts 200 --orders 5
+
+Each seller has --posts posts with --orders orders each. Half the sellers are
+deleted with the cascade run inside the call (UserService.purge_user, what
+DELETE /api/admin/users/<id> used to do), the other half through
+DELETE /api/admin/users/<id>, which hides their posts and queues the purge.
+Then the same for single posts. The queued jobs run afterwards with
+`run_due()`, and their total time is reported too.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app import create_app
+from config import Config
+from models import db, Order, Post
+from service import jobs
+from service.post_service import PostService
+from service.user_service import UserService
+
+
+def load_sellers(count, posts, orders, buyer_id):
+    seller_ids = []
+    for i in range(count):
+        seller, _ = UserService.create_user(f'seller{i}', f'seller{i}@example.com', 'secret')
+        seller_ids.append(seller.id)
+        db.session.add_all([
+            Post(user_id=seller.id, product_type=f'Món {j % 50}', quantity=orders + 1, price=1000 + j,
+                 description='', contact_info='0900000000', is_active=True)
+            for j in range(posts)
+        ])
+    db.session.commit()
+
+    db.session.add_all([
+        Order(post_id=post_id, seller_id=user_id, buyer_id=buyer_id, quantity=1, price=price, status='completed')
+        for post_id, user_id, price in db.session.query(Post.id, Post.user_id, Post.price)
+        for _ in range(orders)
+    ])
+    db.session.commit()
+    return seller_ids
+
+
+def timed(calls):
+    timings = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10, help="sellers deleted (half inline, half deferred)")
+    parser.add_argument('--posts', type=int, default=200, help="posts per seller")
+    parser.add_argument('--orders', type=int, default=5, help="orders per post")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+            # Job chỉ chạy khi gọi run_due(), để đo riêng phần việc trong request
+            JOB_WORKERS = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            buyer, _ = UserService.create_user('buyer', 'buyer@example.com', 'secret')
+            seller_ids = load_sellers(args.users, args.posts, args.orders, buyer.id)
+            half = len(seller_ids) // 2
+            post_ids = [post_id for post_id, in db.session.query(Post.id).filter(Post.user_id == seller_ids[-1])]
+
+        client = app.test_client()
+        client.post('/api/login', json={'email': 'admin@example.com', 'password': 'admin123'})
+
+        def deferred(path):
+            response = client.delete(path)
+            assert response.status_code == 200, response.get_json()
+
+        with app.app_context():
+            results = {
+                'user, inline cascade': timed(lambda user_id=user_id: UserService.purge_user(user_id)
+                                              for user_id in seller_ids[:half]),
+                'user, deferred (request)': timed(lambda user_id=user_id: deferred(f'/api/admin/users/{user_id}')
+                                                  for user_id in seller_ids[half:-1]),
+            }
+            started = time.perf_counter()
+            ran = jobs.run_due()
+            results[f'user, deferred (job, {ran} total)'] = [(time.perf_counter() - started) * 1000]
+
+            results['post, inline cascade'] = timed(lambda post_id=post_id: PostService.purge_post(post_id)
+                                                    for post_id in post_ids[:len(post_ids) // 2])
+            results['post, deferred (request)'] = timed(lambda post_id=post_id: deferred(f'/api/admin/posts/{post_id}')
+                                                        for post_id in post_ids[len(post_ids) // 2:])
+            started = time.perf_counter()
+            ran = jobs.run_due()
+            results[f'post, deferred (job, {ran} total)'] = [(time.perf_counter() - started) * 1000]
+
+        print(f"{args.posts} posts x {args.orders} orders per seller")
+        print(f"{'':<34}{'calls':>7}{'mean (ms)':>12}{'max (ms)':>11}")
+        for name, timings in results.items():
+            print(f"{name:<34}{len(timings):>7}{statistics.mean(timings):>12.2f}{max(timings):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Time the combined search endpoint against fetching the feed and filtering it client-side.
+
+    python -m benchmarks.faceted_search_bench --posts 300000
+
+"client" is what the web UI had to do before: load every active post and
+filter, sort and count in the browser (simulated here in Python). "search" is
+one page from SearchService.search without facets, "+facets" adds the total
+and facet counts, and "uncached" is the same search with the per-shape
+statement cache cleared before every call.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from app import create_app
+from benchmarks.search_bench import load_posts
+from config import Config
+from models import db
+from service import search_index
+from service.post_service import PostService
+from service.search_index import fold_text
+from service.search_service import PRICE_BUCKETS, SearchService, _statements
+
+SCENARIOS = [
+    ('newest', {}),
+    ('price range', {'min_price': 1000, 'max_price': 1500, 'sort': 'price_asc'}),
+    ('type + price', {'product_type': 'Laptop Dell M42', 'min_price': 100}),
+    ('text', {'query': 'dong ho casio'}),
+    ('text + price', {'query': 'dong ho casio', 'min_price': 100, 'max_price': 500, 'sort': 'price_desc'}),
+]
+
+
+def client_side(filters, limit):
+    """Fetch the whole feed and filter, sort, count and page it the way the browser did"""
+    posts = PostService.get_all_posts()
+    words = fold_text(filters.get('query')).split()
+    min_price, max_price = filters.get('min_price'), filters.get('max_price')
+
+    def matches(post, check_price=True):
+        if words:
+            text_words = fold_text(f"{post['product_type']} {post['description']}").split()
+            if not all(any(word.startswith(prefix) for word in text_words) for prefix in words):
+                return False
+        if check_price and min_price is not None and post['price'] < min_price:
+            return False
+        if check_price and max_price is not None and post['price'] > max_price:
+            return False
+        return filters.get('product_type') in (None, post['product_type'])
+
+    found = [post for post in posts if matches(post)]
+    sort = filters.get('sort')
+    if sort in ('price_asc', 'price_desc'):
+        found.sort(key=lambda post: (post['price'], post['id']), reverse=sort == 'price_desc')
+
+    product_types, buckets = {}, [0] * len(PRICE_BUCKETS)
+    for post in found:
+        product_types[post['product_type']] = product_types.get(post['product_type'], 0) + 1
+    for post in posts:
+        if matches(post, check_price=False):
+            buckets[sum(post['price'] >= low for low in PRICE_BUCKETS) - 1] += 1
+    return found[:limit], len(found), product_types, buckets
+
+
+def median_ms(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=300000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--client-repeat', type=int, default=1, help="runs of the slow client-side baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            started = time.perf_counter()
+            load_posts(args.posts)
+            search_index.get_backend().rebuild()
+            db.session.execute(text('ANALYZE'))
+            print(f"Loaded and indexed {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+            print(f"{'scenario':<14}{'client (ms)':>13}{'search (ms)':>13}{'+facets (ms)':>14}{'uncached (ms)':>15}")
+            for label, filters in SCENARIOS:
+                client_ms = median_ms(lambda: client_side(filters, args.limit), args.client_repeat)
+                search_ms = median_ms(lambda: SearchService.search(**filters, facets=False, limit=args.limit),
+                                      args.repeat)
+                facets_ms = median_ms(lambda: SearchService.search(**filters, limit=args.limit), args.repeat)
+
+                def uncached():
+                    _statements.cache_clear()
+                    SearchService.search(**filters, facets=False, limit=args.limit)
+
+                uncached_ms = median_ms(uncached, args.repeat)
+                print(f"{label:<14}{client_ms:>13.1f}{search_ms:>13.2f}{facets_ms:>14.2f}{uncached_ms:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
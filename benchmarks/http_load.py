@@ -0,0 +1,278 @@
+"""Browse, search, buy and view-profile traffic against the HTTP API, timed per request type.
+
+    python -m benchmarks.http_load --users 2000 --posts 50000 --orders 100000 --clients 8 --duration 30
+    python -m benchmarks.http_load --url http://127.0.0.1:8000 --accounts 10000 --clients 64 --duration 60
+
+Each client logs in as one of the users of a benchmarks.datagen database and
+then runs visits back to back for --duration seconds, each one a scenario
+picked by weight (SCENARIOS): browsing the feed and opening a post, typing a
+search with suggestions and running it, buying a post seen before, or
+looking at one's own profile, stats, sales and purchases. Every request is
+timed under its step name; a refused order (sold out, own post) is a normal
+outcome, any other unexpected status counts as an error.
+
+Without --url, the clients are threads calling create_app() through Flask's
+test client on a copy of --database or a freshly generated database, so the
+WSGI stack and the services are measured without a network, all in this
+process. With --url, each client keeps an HTTP/1.1 connection to a running
+server, which must serve a datagen database with at least --accounts users.
+--output writes the results as JSON, for `python -m benchmarks.results`.
+"""
+import argparse
+import http.client
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote, urlencode, urlsplit
+
+from app import create_app
+from benchmarks import results
+from benchmarks.datagen import CATALOG, PASSWORD, scratch_config, scratch_database
+from service.search_index import fold_text
+
+PAGE_SIZE = 20
+
+
+class TestClient:
+    """Requests through Flask's test client, in this process"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Requests over one keep-alive HTTP/1.1 connection, carrying the session cookie"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.connection = None
+        self.cookies = {}
+
+    def request(self, method, path, body=None):
+        headers = {}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=data, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+            except (http.client.HTTPException, OSError):
+                # Máy chủ đã đóng kết nối giữ sống: mở lại và gửi lại một lần
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+                continue
+
+            for header in response.headers.get_all('Set-Cookie') or []:
+                name, _, rest = header.partition('=')
+                self.cookies[name.strip()] = rest.split(';', 1)[0]
+            if response.will_close:
+                self.connection.close()
+                self.connection = None
+            return response.status, payload
+
+
+class Visitor:
+    """One logged-in client: runs scenarios and records the time of each request"""
+
+    def __init__(self, client, rng, account):
+        self.client = client
+        self.rng = rng
+        self.user_id = None
+        self.account = account
+        # Bài đăng đã thấy khi xem bảng tin hoặc tìm kiếm, để mua sau đó
+        self.seen = []
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def call(self, step, method, path, body=None, expected=(200,)):
+        started = time.perf_counter()
+        try:
+            status, payload = self.client.request(method, path, body)
+        except (http.client.HTTPException, OSError):
+            status, payload = None, b''
+        self.timings[step].append(time.perf_counter() - started)
+        self.statuses[step][str(status)] += 1
+        if status not in expected:
+            self.errors[step] += 1
+            return None
+        return json.loads(payload) if payload else {}
+
+    def remember(self, page):
+        if page:
+            self.seen = (self.seen + [(post['id'], post['user_id']) for post in page.get('posts', [])])[-100:]
+
+    def login(self):
+        body = self.call('login', 'POST', '/api/login',
+                         {'email': f'user{self.account}@example.com', 'password': PASSWORD})
+        if body is None:
+            raise SystemExit(f"Login as user{self.account} failed; is the server's database from benchmarks.datagen?")
+        self.user_id = body['user']['id']
+
+
+def browse(visitor):
+    page = visitor.call('feed', 'GET', f'/api/posts?limit={PAGE_SIZE}')
+    visitor.remember(page)
+    for _ in range(visitor.rng.randint(0, 2)):
+        if not page or not page.get('next_cursor'):
+            break
+        page = visitor.call('feed next page', 'GET', f"/api/posts?limit={PAGE_SIZE}&cursor={page['next_cursor']}")
+        visitor.remember(page)
+    if visitor.seen:
+        post_id, _ = visitor.rng.choice(visitor.seen)
+        visitor.call('post detail', 'GET', f'/api/posts/{post_id}')
+
+
+def search(visitor):
+    rng = visitor.rng
+    category, brands, median = rng.choice(CATALOG)
+    text = f'{category} {rng.choice(brands)}' if rng.random() < 0.5 else category
+    # Phần lớn người dùng gõ không dấu
+    if rng.random() < 0.7:
+        text = fold_text(text)
+    for length in range(2, min(len(text), 5) + 1):
+        visitor.call('suggest', 'GET', f'/api/posts/suggest?prefix={quote(text[:length])}')
+
+    if rng.random() < 0.6:
+        page = visitor.call('search', 'GET', f'/api/posts/search?type=name&query={quote(text)}&limit={PAGE_SIZE}')
+    else:
+        params = {'query': text, 'min_price': round(median * 0.5), 'max_price': round(median * 2),
+                  'sort': rng.choice(['newest', 'price_asc', 'price_desc']), 'limit': PAGE_SIZE}
+        page = visitor.call('faceted search', 'GET', f'/api/posts/search?{urlencode(params)}')
+    visitor.remember(page)
+
+
+def buy(visitor):
+    candidates = [post_id for post_id, seller_id in visitor.seen if seller_id != visitor.user_id]
+    if not candidates:
+        browse(visitor)
+        return
+    post_id = visitor.rng.choice(candidates)
+    # 400: bài đã hết hàng hoặc đã bị gỡ, một kết quả bình thường khi nhiều người cùng mua
+    visitor.call('order', 'POST', '/api/orders', {'post_id': post_id, 'quantity': 1}, expected=(201, 400))
+    visitor.call('purchases', 'GET', f'/api/user/purchases?limit={PAGE_SIZE}')
+
+
+def view_profile(visitor):
+    visitor.call('profile', 'GET', '/api/user/profile')
+    visitor.call('stats', 'GET', '/api/user/stats')
+    visitor.call('sales', 'GET', f'/api/user/sales?limit={PAGE_SIZE}')
+    visitor.call('purchases', 'GET', f'/api/user/purchases?limit={PAGE_SIZE}')
+
+
+# (tên, trọng số, hàm)
+SCENARIOS = [
+    ('browse', 50, browse),
+    ('search', 30, search),
+    ('buy', 10, buy),
+    ('profile', 10, view_profile),
+]
+
+
+def run_client(make_client, seed, accounts, deadline, visitors):
+    rng = random.Random(seed)
+    visitor = Visitor(make_client(), rng, rng.randint(1, accounts))
+    visitors.append(visitor)
+    visitor.login()
+    names, weights, scenarios = zip(*SCENARIOS)
+    while time.perf_counter() < deadline:
+        index = rng.choices(range(len(SCENARIOS)), weights=weights)[0]
+        started = time.perf_counter()
+        scenarios[index](visitor)
+        visitor.timings[f'scenario {names[index]}'].append(time.perf_counter() - started)
+
+
+def run(make_client, args):
+    visitors = []
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=run_client, args=(make_client, args.seed + i, args.accounts, deadline, visitors))
+               for i in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return visitors, time.perf_counter() - started
+
+
+def report(visitors, elapsed):
+    timings, statuses, errors = defaultdict(list), defaultdict(Counter), Counter()
+    for visitor in visitors:
+        for name, values in visitor.timings.items():
+            timings[name].extend(values)
+        for name, counter in visitor.statuses.items():
+            statuses[name].update(counter)
+        errors.update(visitor.errors)
+
+    measurements = {}
+    requests = 0
+    for name in sorted(timings, key=lambda name: (name.startswith('scenario'), name)):
+        stats = results.summarize(timings[name])
+        if not name.startswith('scenario'):
+            stats['errors'] = errors[name]
+            stats['statuses'] = dict(statuses[name])
+            requests += stats['count']
+        measurements[name] = stats
+
+    width = max(len(name) for name in measurements)
+    print(f"{'step':<{width}} {'count':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in measurements.items():
+        print(f"{name:<{width}} {stats['count']:8d} {stats.get('errors', ''):>7} "
+              f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+    print(f"{requests} requests in {elapsed:.1f}s: {requests / elapsed:,.0f} requests/s, "
+          f"{sum(errors.values())} errors")
+    measurements['all requests'] = {"count": requests, "seconds": elapsed, "per_second": requests / elapsed,
+                                    "errors": sum(errors.values())}
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help="base URL of a running server; without it the test client is used")
+    parser.add_argument('--database', help="database made by benchmarks.datagen for the test client (copied)")
+    parser.add_argument('--users', type=int, default=2000, help="users to generate without --url or --database")
+    parser.add_argument('--posts', type=int, default=50000, help="posts to generate without --url or --database")
+    parser.add_argument('--orders', type=int, default=100000, help="orders to generate without --url or --database")
+    parser.add_argument('--accounts', type=int, help="users to log in as (default: --users)")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help="seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help="turn the response cache off (test client only)")
+    parser.add_argument('--output', help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+    args.accounts = args.accounts or args.users
+
+    if args.url:
+        visitors, elapsed = run(lambda: HttpClient(args.url), args)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_database(workdir, args.database, args.users, args.posts, args.orders, args.seed)
+            settings = {'RESPONSE_CACHE_SIZE': 0} if args.no_cache else {}
+            app = create_app(scratch_config('sqlite:///' + path, **settings))
+            visitors, elapsed = run(lambda: TestClient(app), args)
+
+    measurements = report(visitors, elapsed)
+    if args.output:
+        results.write(args.output, 'http_load', args, measurements)
+
+
+if __name__ == '__main__':
+    main()
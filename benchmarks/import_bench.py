@@ -0,0 +1,75 @@
+"""Measure bulk post import throughput through POST /api/posts/import.
+
+    python -m benchmarks.import_bench --rows 100000 --format csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+from config import Config
+from service.user_service import UserService
+
+PRODUCTS = ['Cà phê', 'Trà sữa', 'Bánh mì', 'Áo khoác', 'Giày thể thao', 'Đồng hồ', 'Điện thoại']
+CONTENT_TYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def make_rows(count):
+    rng = random.Random(7)
+    return [{
+        'product_type': f"{rng.choice(PRODUCTS)} M{rng.randint(1, 500)}",
+        'quantity': rng.randint(1, 50),
+        'price': round(rng.uniform(10, 5000), 2),
+        'description': 'Hàng còn mới, liên hệ để xem trực tiếp',
+        'contact_info': '0900000000',
+    } for _ in range(count)]
+
+
+def encode(rows, import_format):
+    if import_format == 'json':
+        return json.dumps(rows, ensure_ascii=False)
+    if import_format == 'ndjson':
+        return '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--format', choices=sorted(CONTENT_TYPES), default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            UserService.create_user('seller', 'seller@example.com', 'secret')
+
+        client = app.test_client()
+        client.post('/api/login', json={'email': 'seller@example.com', 'password': 'secret'})
+        body = encode(make_rows(args.rows), args.format)
+
+        started = time.perf_counter()
+        response = client.post('/api/posts/import', data=body, content_type=CONTENT_TYPES[args.format])
+        elapsed = time.perf_counter() - started
+
+        report = response.get_json()
+        print(f"status={response.status_code} created={report.get('created')} failed={report.get('failed')}")
+        print(f"{args.rows} rows ({args.format}) in {elapsed:.2f}s: {args.rows / elapsed:,.0f} rows/sec")
+
+
+if __name__ == '__main__':
+    main()
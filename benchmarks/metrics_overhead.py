@@ -0,0 +1,108 @@
+"""Measure what the request and SQL metrics cost on the feed endpoint.
+
+    python -m benchmarks.metrics_overhead --posts 2000 --requests 20000 --sample-every 10
+
+Two apps share one scratch database, one with METRICS_ENABLED and one
+without, and GET /api/posts is called on each through the WSGI interface
+(no HTTP server or test client, whose own cost would hide the difference).
+Calls alternate between the two apps request by request, so drift of the
+machine (other load, CPU frequency) hits both alike, and the median request
+time of each is compared. This is done with the response cache (the usual
+case, where a request costs the least and the overhead weighs the most) and
+without it (every request runs its query, so the engine events fire). The
+cached case runs twice, recording every request and recording one request
+in --sample-every (METRICS_SAMPLE_EVERY).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from werkzeug.test import EnvironBuilder
+
+from app import create_app
+from config import Config
+from models import db, Post
+from service.user_service import UserService
+
+
+def load_posts(count):
+    seller, _ = UserService.create_user('seller', 'seller@example.com', 'secret')
+    db.session.add_all([
+        Post(user_id=seller.id, product_type=f'Món {i % 50}', quantity=1, price=1000 + i,
+             description='', contact_info='0900000000', is_active=True)
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def start_response(status, headers, exc_info=None):
+    assert status.startswith('200'), status
+
+
+def timed_request(app, environ):
+    started = time.perf_counter()
+    body = app.wsgi_app(dict(environ), start_response)
+    b''.join(body)
+    if hasattr(body, 'close'):
+        body.close()
+    return time.perf_counter() - started
+
+
+def compare(database_uri, cache_size, requests, sample_every=1):
+    apps = {}
+    for enabled in (False, True):
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = database_uri
+            SECRET_KEY = 'metrics-bench'
+            JWT_SECRET_KEY = 'metrics-bench-secret-key-for-local-runs'
+            JOB_WORKERS = 0
+            RESPONSE_CACHE_SIZE = cache_size
+            METRICS_ENABLED = enabled
+            METRICS_SAMPLE_EVERY = sample_every
+        apps[enabled] = create_app(BenchConfig)
+
+    environ = EnvironBuilder(path='/api/posts', query_string='limit=20').get_environ()
+    timings = {False: [], True: []}
+    for app in apps.values():
+        for _ in range(200):
+            timed_request(app, environ)
+    for i in range(requests):
+        # Đổi thứ tự mỗi lượt để app nào cũng có lúc chạy trước
+        for enabled in ((False, True) if i % 2 else (True, False)):
+            timings[enabled].append(timed_request(apps[enabled], environ))
+
+    off, on = (statistics.median(timings[enabled]) for enabled in (False, True))
+    label = 'with response cache' if cache_size else 'without response cache'
+    if sample_every > 1:
+        label += f', recording 1 request in {sample_every}'
+    print(f"{label}: {off * 1e6:.0f} us/request without metrics, "
+          f"{on * 1e6:.0f} us/request with metrics ({(on - off) / off * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=20000, help="requests per app (a fifth without the cache)")
+    parser.add_argument('--sample-every', type=int, default=10, help="METRICS_SAMPLE_EVERY of the sampled run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_uri = 'sqlite:///' + os.path.join(workdir, 'metrics.db')
+
+        class LoadConfig(Config):
+            SQLALCHEMY_DATABASE_URI = database_uri
+            SECRET_KEY = 'metrics-bench'
+            JOB_WORKERS = 0
+
+        with create_app(LoadConfig).app_context():
+            load_posts(args.posts)
+
+        compare(database_uri, 1024, args.requests)
+        compare(database_uri, 1024, args.requests, args.sample_every)
+        compare(database_uri, 0, args.requests // 5)
+
+
+if __name__ == '__main__':
+    main()
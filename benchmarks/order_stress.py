@@ -0,0 +1,94 @@
+"""Hammer one post with concurrent buyers and check it is never oversold.
+
+    python -m benchmarks.order_stress --buyers 200 --stock 150
+
+Every buyer thread waits on a barrier and then calls OrderService.create_order
+for the same post. At the end the units sold plus the remaining stock must equal
+the starting stock, and no more orders may succeed than there were units.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func
+
+from app import create_app
+from config import Config
+from models import db, Order, Post, User
+from service.order_service import OrderService
+from service.post_service import PostService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--buyers', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=150)
+    parser.add_argument('--attempts', type=int, default=2, help='orders attempted per buyer')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class StressConfig(Config):
+            SECRET_KEY = 'stress'
+            JWT_SECRET_KEY = 'stress-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'stress.db')
+            SQLALCHEMY_ENGINE_OPTIONS = {
+                'pool_size': args.buyers,
+                'connect_args': {'timeout': 60},
+            }
+
+        app = create_app(StressConfig)
+        with app.app_context():
+            db.session.add(User(username='seller', email='seller@example.com', password='secret'))
+            db.session.add_all([
+                User(username=f'buyer{i}', email=f'buyer{i}@example.com', password='secret')
+                for i in range(args.buyers)
+            ])
+            db.session.commit()
+            seller_id = User.query.filter_by(username='seller').first().id
+            buyer_ids = [user.id for user in User.query.filter(User.username.like('buyer%'))]
+            post, _ = PostService.create_post(seller_id, 'Cà phê', args.stock, 50000, '', '0900000000')
+            post_id = post.id
+
+        barrier = threading.Barrier(len(buyer_ids))
+        results = Counter()
+        lock = threading.Lock()
+
+        def buy(buyer_id):
+            with app.app_context():
+                barrier.wait()
+                for _ in range(args.attempts):
+                    order, error = OrderService.create_order(post_id, buyer_id, 1)
+                    with lock:
+                        results['ok' if order else error] += 1
+
+        threads = [threading.Thread(target=buy, args=(buyer_id,)) for buyer_id in buyer_ids]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            post = db.session.get(Post, post_id)
+            sold = db.session.query(func.coalesce(func.sum(Order.quantity), 0)) \
+                .filter(Order.post_id == post_id).scalar()
+
+        attempts = len(buyer_ids) * args.attempts
+        print(f"buyers={len(buyer_ids)} attempts={attempts} stock={args.stock}")
+        print(f"results: {dict(results)}")
+        print(f"sold={sold} remaining={post.quantity} is_active={post.is_active}")
+        print(f"{attempts / elapsed:.0f} placements/sec, {results['ok'] / elapsed:.0f} orders/sec "
+              f"({elapsed:.2f}s)")
+
+        oversold = sold + post.quantity != args.stock or results['ok'] > args.stock or post.quantity < 0
+        print("OVERSOLD" if oversold else "no oversell")
+        sys.exit(1 if oversold else 0)
+
+
+if __name__ == '__main__':
+    main()
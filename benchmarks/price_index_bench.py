@@ -0,0 +1,106 @@
+"""Compare price range search on the in-memory price index against the SQL path.
+
+    python -m benchmarks.price_index_bench --posts 1000000
+
+Prices are uniform between 10 and 5000, so the ranges below select roughly
+0.1%, 1%, 10% and 50% of the active posts. The SQL path either walks the feed
+index and filters on price (wide ranges) or reads the price index and sorts
+every match by created_at (narrow ranges); the in-memory index binary
+searches the range and only sorts the rows that can make the page.
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from app import create_app
+from benchmarks.search_bench import load_posts
+from config import Config
+from models import db
+from service import price_index
+from service.pagination import decode_cursor
+from service.post_service import PostService
+
+# (nhãn, giá thấp nhất, giá cao nhất)
+RANGES = [
+    ('0.1%', 1000, 1005),
+    ('1%', 1000, 1050),
+    ('10%', 1000, 1500),
+    ('50%', 10, 2500),
+    ('min only', 4000, None),
+]
+
+
+@contextmanager
+def sql_path(app):
+    index = app.extensions.pop(price_index.EXTENSION_KEY)
+    try:
+        yield
+    finally:
+        app.extensions[price_index.EXTENSION_KEY] = index
+
+
+def time_search(min_price, max_price, limit, pages, repeat):
+    """Median time to read `pages` consecutive pages (or the full list when limit is None)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor = None
+        for _ in range(pages):
+            result = PostService.search_posts_by_price_range(min_price, max_price, limit, cursor)
+            if limit is None:
+                break
+            _, next_cursor = result
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=5, help="consecutive pages read per search")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-numpy', action='store_true', help="use the array + bisect fallback")
+    args = parser.parse_args()
+
+    if args.no_numpy:
+        price_index.USE_NUMPY = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+            PRICE_INDEX_ENABLED = True
+            PRICE_INDEX_MAX_AGE = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            started = time.perf_counter()
+            load_posts(args.posts)
+            print(f"Loaded {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+            index = price_index.get_index()
+            index.ensure_loaded()
+            stats = index.stats()
+            print(f"Loaded price index ({stats['backend']}, {stats['indexed']} posts) "
+                  f"in {stats['load_seconds']:.2f}s")
+            db.session.remove()
+
+            print(f"{'range':<10}{'mode':<12}{'sql (ms)':>12}{'index (ms)':>12}{'speedup':>10}")
+            for label, min_price, max_price in RANGES:
+                for mode, limit, pages in (('first page', args.limit, 1), (f'{args.pages} pages', args.limit, args.pages)):
+                    with sql_path(app):
+                        sql_ms = time_search(min_price, max_price, limit, pages, args.repeat)
+                    index_ms = time_search(min_price, max_price, limit, pages, args.repeat)
+                    print(f"{label:<10}{mode:<12}{sql_ms:>12.2f}{index_ms:>12.2f}{sql_ms / index_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
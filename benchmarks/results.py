@@ -0,0 +1,151 @@
+"""JSON results of benchmark runs, and the comparison of two runs.
+
+    python -m benchmarks.service_bench --output before.json
+    (check out another commit)
+    python -m benchmarks.service_bench --output after.json
+    python -m benchmarks.results before.json after.json --threshold 10
+
+A results file records the commit, the machine and the arguments of a run
+next to the timings of each benchmark, in milliseconds. The comparison
+matches benchmarks by name and prints the change of the chosen statistic;
+it exits with status 1 when one got slower by more than --threshold percent,
+so it can gate a change in CI. Only runs with the same arguments on the same
+machine compare meaningfully, and it warns otherwise.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import sqlalchemy
+
+FORMAT_VERSION = 1
+STATISTICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'min_ms')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(timings):
+    """Statistics of a list of durations in seconds, in milliseconds"""
+    values = sorted(timing * 1000 for timing in timings)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "mean_ms": total / len(values) if values else 0.0,
+        "min_ms": values[0] if values else 0.0,
+        "p50_ms": percentile(values, 0.5),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else 0.0,
+        "per_second": len(values) / total * 1000 if total else 0.0,
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_info():
+    """Where and on what code a run happened"""
+    return {
+        "commit": _git('rev-parse', 'HEAD'),
+        "dirty": bool(_git('status', '--porcelain', '--untracked-files=no')),
+        "started_at": datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write(path, suite, args, results, info=None):
+    """Write a run's results as JSON to `path` ('-' for stdout); `results` maps benchmark names to statistics"""
+    args = vars(args) if isinstance(args, argparse.Namespace) else dict(args)
+    document = {
+        "format": FORMAT_VERSION,
+        "suite": suite,
+        "run": info or run_info(),
+        # Tên file kết quả khác nhau giữa các lần chạy, không phải là một tham số của phép đo
+        "args": {name: value for name, value in args.items() if name != 'output'},
+        "results": results,
+    }
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported results format {document.get('format')}")
+    return document
+
+
+def compare(before, after, statistic='p50_ms', threshold=10.0):
+    """Rows of (name, before, after, change in percent, verdict) for the benchmarks of two runs"""
+    rows = []
+    for name in sorted(before['results'].keys() | after['results'].keys()):
+        old, new = before['results'].get(name), after['results'].get(name)
+        # Các mục tổng hợp (như số yêu cầu mỗi giây) không có phân vị
+        if (old is not None and statistic not in old) or (new is not None and statistic not in new):
+            continue
+        if old is None or new is None:
+            rows.append((name, old and old[statistic], new and new[statistic], None, 'only before' if new is None else 'new'))
+            continue
+
+        change = (new[statistic] - old[statistic]) / old[statistic] * 100 if old[statistic] else 0.0
+        verdict = 'slower' if change > threshold else 'faster' if change < -threshold else ''
+        rows.append((name, old[statistic], new[statistic], change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--statistic', choices=STATISTICS, default='p50_ms')
+    parser.add_argument('--threshold', type=float, default=10.0, help="percent change reported as slower or faster")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before['suite'] != after['suite']:
+        raise SystemExit(f"Cannot compare a {before['suite']} run with a {after['suite']} run")
+    if before['args'] != after['args']:
+        print("warning: the runs used different arguments", file=sys.stderr)
+    if before['run'].get('platform') != after['run'].get('platform') or before['run'].get('cpus') != after['run'].get('cpus'):
+        print("warning: the runs were on different machines", file=sys.stderr)
+
+    print(f"{before['suite']}: {(before['run'].get('commit') or '?')[:10]} -> {(after['run'].get('commit') or '?')[:10]}, "
+          f"{args.statistic}")
+    rows = compare(before, after, args.statistic, args.threshold)
+    width = max((len(name) for name, *_ in rows), default=10)
+    for name, old, new, change, verdict in rows:
+        old_text = f"{old:10.3f}" if old is not None else f"{'-':>10}"
+        new_text = f"{new:10.3f}" if new is not None else f"{'-':>10}"
+        change_text = f"{change:+7.1f}%" if change is not None else f"{'':>8}"
+        print(f"  {name:<{width}} {old_text} {new_text} {change_text}  {verdict}")
+
+    if any(verdict == 'slower' for *_, verdict in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Compare product-name search on the FTS5 index against the old LIKE '%q%' scan.
+
+    python -m benchmarks.search_bench --posts 1000000
+
+LIKE is given the accented query a user would have to type for it to match at
+all; FTS5 gets the unaccented form. Broad one-word queries match a large share
+of the table and have to be scored in full, so the gap is largest on specific
+queries and on queries with no match at all.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import create_app
+from config import Config
+from models import db
+from service import search_index
+from service.post_service import PostService
+
+PRODUCTS = [
+    'Cà phê', 'Trà sữa', 'Bánh mì', 'Áo khoác', 'Giày thể thao', 'Đồng hồ', 'Điện thoại',
+    'Tai nghe', 'Sách giáo khoa', 'Xe đạp', 'Nồi cơm điện', 'Quạt máy', 'Balo', 'Laptop',
+]
+BRANDS = [
+    'Casio', 'Seiko', 'Nike', 'Adidas', 'Bitis', 'Samsung', 'Apple', 'Xiaomi', 'Sony', 'Asus',
+    'Dell', 'Lenovo', 'Sunhouse', 'Panasonic', 'Trung Nguyên', 'Highlands', 'Kinh Đô', 'Uniqlo',
+]
+ADJECTIVES = ['cũ', 'mới', 'đẹp', 'giá rẻ', 'chính hãng', 'còn bảo hành', 'đã qua sử dụng']
+# (truy vấn cho FTS5, truy vấn tương ứng cho LIKE)
+QUERIES = [
+    ('dong ho', 'Đồng hồ'),
+    ('dong ho casio', 'Đồng hồ Casio'),
+    ('laptop dell m42', 'Laptop Dell M42'),
+    ('trung nguyen', 'Trung Nguyên'),
+    ('may anh canon', 'Máy ảnh Canon'),
+]
+
+
+def load_posts(count, batch_size=50000):
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1)
+    db.session.execute(text(
+        "INSERT INTO users (username, email, password, is_admin, created_at, updated_at) "
+        "VALUES ('seller', 'seller@example.com', 'secret', 0, :now, :now)"
+    ), {"now": start})
+    seller_id = db.session.execute(text("SELECT id FROM users WHERE username = 'seller'")).scalar()
+
+    for offset in range(0, count, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, count)):
+            created_at = start + timedelta(seconds=i)
+            rows.append({
+                "user_id": seller_id,
+                "product_type": f"{rng.choice(PRODUCTS)} {rng.choice(BRANDS)} M{rng.randint(1, 200)}",
+                "quantity": rng.randint(1, 20),
+                "price": round(rng.uniform(10, 5000), 2),
+                "description": f"{rng.choice(PRODUCTS)} {rng.choice(ADJECTIVES)} liên hệ để xem hàng",
+                "contact_info": "0900000000",
+                "created_at": created_at,
+            })
+        db.session.execute(text(
+            "INSERT INTO posts (user_id, product_type, quantity, price, description, contact_info, "
+            "is_active, created_at, updated_at) VALUES (:user_id, :product_type, :quantity, :price, "
+            ":description, :contact_info, 1, :created_at, :created_at)"
+        ), rows)
+    db.session.commit()
+
+
+def time_search(app, backend, query, limit, repeat):
+    app.config['SEARCH_BACKEND'] = backend
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        PostService.search_posts_by_product_name(query, limit=limit)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            started = time.perf_counter()
+            load_posts(args.posts)
+            print(f"Loaded {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            search_index.get_backend().rebuild()
+            print(f"Built FTS5 index in {time.perf_counter() - started:.1f}s")
+
+            print(f"{'query':<22}{'like (ms)':>12}{'fts5 (ms)':>12}{'speedup':>10}")
+            for query, like_query in QUERIES:
+                like_ms = time_search(app, 'like', like_query, args.limit, args.repeat)
+                fts_ms = time_search(app, 'fts5', query, args.limit, args.repeat)
+                print(f"{query:<22}{like_ms:>12.2f}{fts_ms:>12.2f}{like_ms / fts_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
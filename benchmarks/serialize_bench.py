@@ -0,0 +1,82 @@
+"""Rows/sec of the feed serialization: ORM + to_dict() + jsonify against column projection + orjson.
+
+    python -m benchmarks.serialize_bench --posts 100000
+
+Both paths serialize every active post, with its seller's username, into a
+JSON response body; the script checks that they decode to the same list
+before timing them.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from flask import jsonify
+from sqlalchemy.orm import joinedload
+
+from app import create_app
+from config import Config
+from models import db, Post
+from service.post_service import PostService
+from service.serialization import json_response, orjson
+from service.user_service import UserService
+
+
+def current_path():
+    # joinedload: tên người bán đi cùng câu truy vấn, không phải một truy vấn cho mỗi post.author
+    posts = Post.query.options(joinedload(Post.author)).filter_by(is_active=True).order_by(Post.created_at.desc()).all()
+    return jsonify({"posts": [dict(post.to_dict(), seller=post.author.username) for post in posts]}).get_data()
+
+
+def projected_path():
+    return json_response({"posts": PostService.get_all_posts()}).get_data()
+
+
+def measure(func, rounds):
+    best = None
+    for _ in range(rounds):
+        db.session.remove()
+        started = time.perf_counter()
+        body = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+
+        app = create_app(BenchConfig)
+        with app.test_request_context():
+            seller, _ = UserService.create_user('seller', 'seller@example.com', 'secret')
+            PostService.bulk_create_posts(seller.id, [
+                {'product_type': f'Điện thoại {i}', 'quantity': 1 + i % 7, 'price': 100000 + i * 1.5,
+                 'description': 'Máy đẹp, pin tốt' if i % 3 else None, 'contact_info': '0900000000'}
+                for i in range(args.posts)
+            ])
+
+            if json.loads(current_path()) != json.loads(projected_path()):
+                raise SystemExit("projected serialization does not match to_dict()")
+
+            print(f"{args.posts} posts, best of {args.rounds} rounds, encoder: {'orjson' if orjson else 'flask json'}")
+            baseline = None
+            for name, func in (('ORM + to_dict + jsonify', current_path), ('projection + json_response', projected_path)):
+                elapsed, body = measure(func, args.rounds)
+                baseline = baseline or elapsed
+                print(f"  {name:28s} {elapsed * 1000:8.0f} ms  {args.posts / elapsed:10,.0f} rows/s  "
+                      f"{len(body) / 1e6:6.1f} MB  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
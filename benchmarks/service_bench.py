@@ -0,0 +1,373 @@
+"""Microbenchmarks of every public PostService, OrderService and UserService method.
+
+    python -m benchmarks.service_bench --users 2000 --posts 50000 --orders 100000 --output run.json
+    python -m benchmarks.service_bench --database /tmp/swapclub.db --repeat 500 --filter search
+
+Runs on a copy of a database made by benchmarks.datagen (--database) or on
+one generated for the run. Each method is called --warmup times untimed and
+then --repeat times timed, with arguments drawn from the data by a seeded
+RNG; every call starts with an empty session, like a request does. The
+response cache is off unless --cache is given, so reads reach the database.
+Reads run first, then writes, then deletes, which each take rows no other
+benchmark uses. A public service method without a benchmark below makes the
+script fail, so new methods get one. --output writes the results as JSON,
+for `python -m benchmarks.results` to compare runs.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from app import create_app
+from benchmarks import results
+from benchmarks.datagen import PASSWORD, scratch_config, scratch_database
+from models import db, Order, Post, User
+from service import async_db
+from service.order_service import OrderService
+from service.post_service import PostService
+from service.user_service import UserService
+
+SERVICES = (PostService, OrderService, UserService)
+PAGE_SIZE = 20
+# Số dòng đọc từ các hàm iter_all_* (xuất dữ liệu) mỗi lần gọi
+EXPORT_ROWS = 1000
+BULK_ROWS = 100
+CART_ITEMS = 3
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register `prepare(fixture)`, which returns the zero-argument call to time, under `name`.
+
+    The name is the service method, optionally followed by a variant in
+    parentheses: "PostService.get_all_posts (deep page)".
+    """
+    def register(prepare):
+        BENCHMARKS.append((name, prepare))
+        return prepare
+    return register
+
+
+class Fixture:
+    """Rows of the benchmark database to draw service arguments from"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.loop = asyncio.new_event_loop()
+        self.posts = db.session.execute(
+            select(Post.id, Post.user_id, Post.product_type, Post.price, Post.created_at).where(Post.is_active == True)
+        ).all()
+        self.users = db.session.execute(select(User.id, User.username).where(User.is_admin == False)).all()
+        self.seller_ids = db.session.scalars(select(Post.user_id).distinct()).all()
+        self.buyer_ids = db.session.scalars(select(Order.buyer_id).distinct()).all()
+        self.max_order_id = db.session.scalar(select(func.max(Order.id))) or 0
+        self._counter = itertools.count(1)
+
+        # Các bài đăng và người dùng sẽ bị xóa, tách riêng để không benchmark nào gặp lại chúng
+        self._spare_posts = self.rng.sample(self.posts, len(self.posts))
+        self._spare_users = self.rng.sample(self.users, len(self.users))
+
+    def post(self):
+        return self.rng.choice(self.posts)
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def buyer_for(self, post):
+        while True:
+            user = self.user()
+            if user.id != post.user_id:
+                return user.id
+
+    def take_post(self):
+        if not self._spare_posts:
+            raise SystemExit("Not enough active posts for --repeat; generate more posts")
+        return self._spare_posts.pop()
+
+    def take_user(self):
+        if not self._spare_users:
+            raise SystemExit("Not enough users for --repeat; generate more users")
+        return self._spare_users.pop()
+
+    def unique(self):
+        return next(self._counter)
+
+    def search_text(self):
+        """What a user would type: the first one to three words of a listed product type"""
+        words = self.post().product_type.split()
+        return ' '.join(words[:self.rng.randint(1, 3)])
+
+    def price_range(self):
+        price = self.post().price
+        return price * 0.9, price * 1.1
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+# ---------- Đọc ----------
+
+@benchmark('PostService.get_all_posts')
+def get_all_posts(f):
+    return lambda: PostService.get_all_posts(limit=PAGE_SIZE)
+
+
+@benchmark('PostService.get_all_posts (deep page)')
+def get_all_posts_deep_page(f):
+    post = f.post()
+    return lambda: PostService.get_all_posts(limit=PAGE_SIZE, cursor=(post.created_at, post.id))
+
+
+@benchmark('PostService.get_all_posts_async')
+def get_all_posts_async(f):
+    return lambda: f.run(PostService.get_all_posts_async(limit=PAGE_SIZE))
+
+
+@benchmark('PostService.get_posts_by_user')
+def get_posts_by_user(f):
+    seller_id = f.rng.choice(f.seller_ids)
+    return lambda: PostService.get_posts_by_user(seller_id, limit=PAGE_SIZE)
+
+
+@benchmark('PostService.get_post_by_id')
+def get_post_by_id(f):
+    post_id = f.post().id
+    return lambda: PostService.get_post_by_id(post_id)
+
+
+@benchmark('PostService.get_post_row_async')
+def get_post_row_async(f):
+    post_id = f.post().id
+    return lambda: f.run(PostService.get_post_row_async(post_id))
+
+
+@benchmark('PostService.search_posts_by_product_name')
+def search_posts_by_product_name(f):
+    text = f.search_text()
+    return lambda: PostService.search_posts_by_product_name(text, limit=PAGE_SIZE)
+
+
+@benchmark('PostService.search_posts_by_price_range')
+def search_posts_by_price_range(f):
+    low, high = f.price_range()
+    return lambda: PostService.search_posts_by_price_range(low, high, limit=PAGE_SIZE)
+
+
+@benchmark('PostService.iter_all_posts')
+def iter_all_posts(f):
+    return lambda: list(itertools.islice(PostService.iter_all_posts(), EXPORT_ROWS))
+
+
+@benchmark('OrderService.get_orders_by_buyer')
+def get_orders_by_buyer(f):
+    buyer_id = f.rng.choice(f.buyer_ids)
+    return lambda: OrderService.get_orders_by_buyer(buyer_id, limit=PAGE_SIZE)
+
+
+@benchmark('OrderService.get_orders_by_seller')
+def get_orders_by_seller(f):
+    seller_id = f.rng.choice(f.seller_ids)
+    return lambda: OrderService.get_orders_by_seller(seller_id, limit=PAGE_SIZE)
+
+
+@benchmark('OrderService.get_all_orders')
+def get_all_orders(f):
+    return lambda: OrderService.get_all_orders(limit=PAGE_SIZE)
+
+
+@benchmark('OrderService.iter_all_orders')
+def iter_all_orders(f):
+    return lambda: list(itertools.islice(OrderService.iter_all_orders(), EXPORT_ROWS))
+
+
+@benchmark('OrderService.get_order')
+def get_order(f):
+    order_id = f.rng.randint(1, f.max_order_id)
+    return lambda: OrderService.get_order(order_id)
+
+
+@benchmark('OrderService.get_order_by_id')
+def get_order_by_id(f):
+    order_id = f.rng.randint(1, f.max_order_id)
+    return lambda: OrderService.get_order_by_id(order_id)
+
+
+@benchmark('UserService.get_user_by_id')
+def get_user_by_id(f):
+    user_id = f.user().id
+    return lambda: UserService.get_user_by_id(user_id)
+
+
+@benchmark('UserService.authenticate')
+def authenticate(f):
+    username = f.user().username
+    return lambda: UserService.authenticate(username, PASSWORD)
+
+
+@benchmark('UserService.get_all_users')
+def get_all_users(f):
+    return UserService.get_all_users
+
+
+@benchmark('UserService.iter_all_users')
+def iter_all_users(f):
+    return lambda: list(itertools.islice(UserService.iter_all_users(), EXPORT_ROWS))
+
+
+# ---------- Ghi ----------
+
+@benchmark('PostService.withdraw_posts')
+def withdraw_posts(f):
+    post_id = f.post().id
+
+    def call():
+        # Không commit: rollback để bài đăng vẫn còn cho các benchmark khác
+        PostService.withdraw_posts(Post.id == post_id)
+        db.session.rollback()
+    return call
+
+
+@benchmark('PostService.create_post')
+def create_post(f):
+    post = f.post()
+    return lambda: PostService.create_post(post.user_id, post.product_type, 1, post.price, 'Hàng mới về', '0900000000')
+
+
+@benchmark('PostService.bulk_create_posts')
+def bulk_create_posts(f):
+    seller_id = f.post().user_id
+    rows = [{'product_type': post.product_type, 'quantity': 1, 'price': post.price,
+             'description': 'Nhập hàng loạt', 'contact_info': '0900000000'}
+            for post in (f.post() for _ in range(BULK_ROWS))]
+    return lambda: PostService.bulk_create_posts(seller_id, rows)
+
+
+@benchmark('PostService.update_post')
+def update_post(f):
+    post = f.post()
+    price = round(post.price * f.rng.uniform(0.9, 1.1), -3) or post.price
+    return lambda: PostService.update_post(post.id, post.user_id, {'price': price})
+
+
+@benchmark('OrderService.create_order')
+def create_order(f):
+    post = f.post()
+    buyer_id = f.buyer_for(post)
+    return lambda: OrderService.create_order(post.id, buyer_id, 1)
+
+
+@benchmark('OrderService.create_orders')
+def create_orders(f):
+    posts = [f.post() for _ in range(CART_ITEMS)]
+    buyer_id = f.buyer_for(posts[0])
+    return lambda: OrderService.create_orders(buyer_id, [(post.id, 1) for post in posts])
+
+
+@benchmark('UserService.create_user')
+def create_user(f):
+    n = f.unique()
+    return lambda: UserService.create_user(f'bench{n}', f'bench{n}@example.com', PASSWORD)
+
+
+@benchmark('UserService.update_user')
+def update_user(f):
+    user_id, n = f.user().id, f.unique()
+    return lambda: UserService.update_user(user_id, {'email': f'renamed{n}@example.com'})
+
+
+# ---------- Xóa ----------
+
+@benchmark('PostService.delete_post')
+def delete_post(f):
+    post_id = f.take_post().id
+    return lambda: PostService.delete_post(post_id)
+
+
+@benchmark('PostService.purge_post')
+def purge_post(f):
+    post_id = f.take_post().id
+    return lambda: PostService.purge_post(post_id)
+
+
+@benchmark('UserService.delete_user')
+def delete_user(f):
+    user_id = f.take_user().id
+    return lambda: UserService.delete_user(user_id)
+
+
+@benchmark('UserService.purge_user')
+def purge_user(f):
+    user_id = f.take_user().id
+    return lambda: UserService.purge_user(user_id)
+
+
+def missing_benchmarks():
+    """Public service methods that no benchmark calls"""
+    covered = {name.split(' ')[0] for name, _ in BENCHMARKS}
+    return [f'{service.__name__}.{name}' for service in SERVICES for name, value in vars(service).items()
+            if isinstance(value, staticmethod) and not name.startswith('_')
+            and f'{service.__name__}.{name}' not in covered]
+
+
+def measure(prepare, fixture, repeat, warmup):
+    timings = []
+    for i in range(warmup + repeat):
+        call = prepare(fixture)
+        db.session.remove()
+        started = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - started
+        if i >= warmup:
+            timings.append(elapsed)
+    db.session.remove()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', help="database made by benchmarks.datagen (copied, not changed)")
+    parser.add_argument('--users', type=int, default=2000, help="users to generate without --database")
+    parser.add_argument('--posts', type=int, default=50000, help="posts to generate without --database")
+    parser.add_argument('--orders', type=int, default=100000, help="orders to generate without --database")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', action='store_true', help="keep the response cache on")
+    parser.add_argument('--filter', help="only benchmarks whose name contains this")
+    parser.add_argument('--output', help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    missing = missing_benchmarks()
+    if missing:
+        raise SystemExit(f"No benchmark for: {', '.join(missing)}")
+
+    selected = [(name, prepare) for name, prepare in BENCHMARKS if not args.filter or args.filter in name]
+    measurements = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = scratch_database(workdir, args.database, args.users, args.posts, args.orders, args.seed)
+        settings = {} if args.cache else {'RESPONSE_CACHE_SIZE': 0}
+        app = create_app(scratch_config('sqlite:///' + path, **settings))
+        async_db.init_app(app)
+
+        with app.app_context():
+            fixture = Fixture(args.seed)
+            width = max(len(name) for name, _ in selected)
+            print(f"{'benchmark':<{width}} {'p50 ms':>9} {'p95 ms':>9} {'calls/s':>10}")
+            for name, prepare in selected:
+                stats = results.summarize(measure(prepare, fixture, args.repeat, args.warmup))
+                measurements[name] = stats
+                print(f"{name:<{width}} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} {stats['per_second']:10,.0f}")
+            fixture.run(async_db.dispose(app))
+            fixture.loop.close()
+
+    if args.output:
+        results.write(args.output, 'service_bench', args, measurements)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Concurrent feed reads during order writes, default SQLite settings vs the tuned profile.
+
+    python -m benchmarks.sqlite_profile_bench --readers 4 --writers 2 --seconds 5
+
+Readers and writers run in separate processes, like gunicorn workers sharing
+one database file. Readers page through the post feed; writers place orders
+through OrderService.create_order. Each profile gets a fresh database.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from config import Config
+
+PROFILES = ('default', 'tuned')
+
+
+def make_config(profile, path):
+    class BenchConfig(Config):
+        SECRET_KEY = 'bench'
+        JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        RESPONSE_CACHE_SIZE = 0
+
+    if profile == 'default':
+        # Giữ nguyên cấu hình mặc định của SQLite và SQLAlchemy
+        for key in ('SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT', 'SQLITE_MMAP_SIZE',
+                    'SQLITE_CACHE_SIZE', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT'):
+            setattr(BenchConfig, key, None)
+    return BenchConfig
+
+
+def seed(config, posts, buyers):
+    from app import create_app
+    from models import db, Post, User
+
+    app = create_app(config)
+    with app.app_context():
+        db.session.add(User(username='seller', email='seller@example.com', password='secret'))
+        db.session.add_all([
+            User(username=f'buyer{i}', email=f'buyer{i}@example.com', password='secret')
+            for i in range(buyers)
+        ])
+        db.session.flush()
+        seller_id = User.query.filter_by(username='seller').first().id
+        db.session.add_all([
+            Post(user_id=seller_id, product_type=f'Món {i}', quantity=1_000_000, price=1000 + i,
+                 description='Hàng mới, còn bảo hành', contact_info='0900000000', is_active=True)
+            for i in range(posts)
+        ])
+        db.session.commit()
+        post_ids = [post_id for post_id, in db.session.query(Post.id)]
+        buyer_ids = [user.id for user in User.query.filter(User.username.like('buyer%'))]
+        db.engine.dispose()
+    return post_ids, buyer_ids
+
+
+def worker(role, config, seconds, post_ids, buyer_ids, results):
+    from app import create_app
+    from models import db
+    from service.order_service import OrderService
+    from service.post_service import PostService
+
+    app = create_app(config)
+    latencies, errors = [], 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if role == 'reader':
+                PostService.get_all_posts(limit=20)
+                error = None
+            else:
+                _, error = OrderService.create_order(random.choice(post_ids), random.choice(buyer_ids), 1)
+            db.session.remove()
+            if error:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+    results.put((role, latencies, errors))
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        config = make_config(profile, os.path.join(workdir, 'bench.db'))
+        post_ids, buyer_ids = seed(config, args.posts, args.buyers)
+
+        results = multiprocessing.Queue()
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        processes = [
+            multiprocessing.Process(target=worker, args=(role, config, args.seconds, post_ids, buyer_ids, results))
+            for role in roles
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    print(f"{profile} profile")
+    for role in ('reader', 'writer'):
+        latencies = [value for name, values, _ in collected if name == role for value in values]
+        errors = sum(count for name, _, count in collected if name == role)
+        if not latencies:
+            print(f"  {role}s: no successful operations, {errors} errors")
+            continue
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if len(latencies) >= 100 else latencies[-1]
+        print(f"  {role}s: {len(latencies) / args.seconds:8.0f} ops/s  "
+              f"p50 {statistics.median(latencies) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  "
+              f"errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--buyers', type=int, default=50)
+    parser.add_argument('--profile', choices=PROFILES, action='append', help='default: both')
+    args = parser.parse_args()
+
+    for profile in args.profile or PROFILES:
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
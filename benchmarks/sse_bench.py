@@ -0,0 +1,149 @@
+"""Hold thousands of idle /api/posts/stream subscribers on the ASGI server and time event fan-out.
+
+    python -m benchmarks.sse_bench --subscribers 5000 --events 20
+
+Starts uvicorn with --workers processes on a scratch database and opens
+--subscribers SSE connections, spread over the workers by the kernel. Once
+they are all connected (and idle, apart from keep-alive comments), this
+process creates --events posts through PostService, one every --interval
+seconds. Each post is a row in the events table, which every worker's hub
+picks up within SSE_POLL_INTERVAL. Reports the server's memory per open
+stream and, per event, the delay from commit to receipt by the subscribers
+(p50/p99 over all deliveries), plus how many deliveries went missing. A last
+client reconnects with Last-Event-ID to check that it gets the events it
+missed.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import create_app
+from benchmarks.asgi_load_test import wait_until_up
+from config import Config
+from service.post_service import PostService
+from service.user_service import UserService
+
+
+def server_memory(pid):
+    """Resident memory (bytes) of a process and its children"""
+    pids = [str(pid)] + subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout.split()
+    total = 0
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/status') as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS'))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+async def subscriber(port, ready, received, last_event_id=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    resume = f"Last-Event-ID: {last_event_id}\r\n" if last_event_id is not None else ""
+    writer.write(f"GET /api/posts/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n{resume}\r\n".encode())
+    await reader.readuntil(b'\r\n\r\n')
+    ready.append(1)
+    try:
+        while True:
+            # Mỗi sự kiện là một khối "id: ...\nevent: ...\ndata: ...\n\n" (có thể nằm trong các chunk HTTP)
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'id: '):
+                received.append((int(line[4:]), time.perf_counter()))
+    except asyncio.CancelledError:
+        writer.close()
+        raise
+
+
+async def run(port, args, app):
+    ready, received = [], []
+    tasks = []
+    for start in range(0, args.subscribers, 500):
+        tasks += [asyncio.ensure_future(subscriber(port, ready, received)) for _ in range(start, min(start + 500, args.subscribers))]
+        await asyncio.sleep(0.2)
+    while len(ready) < args.subscribers:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(args.interval)
+
+    published = {}
+    with app.app_context():
+        seller, _ = UserService.create_user('seller', 'seller@example.com', 'secret')
+        for i in range(args.events):
+            post, error = await asyncio.to_thread(PostService.create_post, seller.id, f'Món {i}', 1, 1000 + i, '', '0900000000')
+            assert error is None, error
+            published[len(published) + 1] = time.perf_counter()
+            await asyncio.sleep(args.interval)
+    await asyncio.sleep(2)
+
+    # Client kết nối lại với Last-Event-ID nhận lại các sự kiện sau id đó
+    resumed = []
+    late = asyncio.ensure_future(subscriber(port, [], resumed, last_event_id=args.events // 2))
+    await asyncio.sleep(1.5)
+    late.cancel()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, late, return_exceptions=True)
+    return published, received, resumed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help="seconds between published events")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(workdir, 'sse.db'), SECRET_KEY='sse-bench',
+                   JWT_SECRET_KEY='sse-bench-secret-key-for-local-runs', PYTHONPATH=os.getcwd())
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = env['DATABASE_URL']
+            SECRET_KEY = env['SECRET_KEY']
+            JWT_SECRET_KEY = env['JWT_SECRET_KEY']
+            JOB_WORKERS = 0
+
+        app = create_app(BenchConfig)
+        command = [sys.executable, '-m', 'uvicorn', '--factory', 'asgi:create_asgi_app', '--workers', str(args.workers),
+                   '--backlog', '4096', '--no-access-log', '--log-level', 'warning', '--port', str(args.port)]
+        log = open(os.path.join(workdir, 'server.log'), 'w')
+        server = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            asyncio.run(wait_until_up(args.port))
+            idle_memory = server_memory(server.pid)
+
+            async def measured():
+                watcher = asyncio.ensure_future(run(args.port, args, app))
+                peak = 0
+                while not watcher.done():
+                    peak = max(peak, server_memory(server.pid))
+                    await asyncio.sleep(0.5)
+                return watcher.result(), peak
+
+            (published, received, resumed), peak_memory = asyncio.run(measured())
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+            log.close()
+
+    delays = sorted(at - published[event_id] for event_id, at in received if event_id in published)
+    pick = lambda fraction: delays[min(len(delays) - 1, int(len(delays) * fraction))] * 1000 if delays else 0
+    expected = args.subscribers * args.events
+    print(f"{args.subscribers} subscribers on {args.workers} workers, {args.events} events")
+    print(f"  server memory: {idle_memory / 2**20:.0f} MiB idle, {peak_memory / 2**20:.0f} MiB with subscribers "
+          f"({(peak_memory - idle_memory) / args.subscribers / 1024:.1f} KiB per stream)")
+    print(f"  deliveries: {len(delays)} of {expected} ({expected - len(delays)} missing)")
+    print(f"  commit to receipt: p50 {pick(0.5):.1f} ms, p99 {pick(0.99):.1f} ms, max {pick(1.0):.1f} ms")
+    print(f"  resume after id {args.events // 2}: got ids {sorted(event_id for event_id, _ in resumed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Import and boot time of the app, each sample in a fresh interpreter like a booting worker.
+
+    python -m benchmarks.startup_bench --repeat 10
+    python -m benchmarks.startup_bench --database /tmp/swapclub.db --importtime --output startup.json
+
+Every sample runs a new Python process that imports an entry point (app for
+WSGI, asgi for ASGI) and then calls its factory, timing both, and the
+process is timed from spawn to exit. Three boots are measured:
+
+- first boot: create_app() on an empty database, which creates the schema,
+  stamps its revision and creates the admin user;
+- boot: create_app() on a database already at the head revision, the path
+  every worker takes after `flask init-db`;
+- asgi boot: create_asgi_app() on that database.
+
+The boots run on a copy of --database (from benchmarks.datagen) or on a
+small empty one. --importtime also lists the packages that take longest to
+import, from `python -X importtime`. --output writes the results as JSON,
+for `python -m benchmarks.results` to compare runs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Chạy trong tiến trình con; in thời gian import và thời gian dựng app dưới dạng JSON
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+from benchmarks.datagen import scratch_config
+config = scratch_config(sys.argv[1])
+factory_started = time.perf_counter()
+{module}.{factory}(config)
+print(json.dumps({{"import": imported - started, "factory": time.perf_counter() - factory_started}}))
+"""
+
+# (tên, module, hàm dựng app, chạy trên cơ sở dữ liệu rỗng mới)
+BOOTS = [
+    ('first boot', 'app', 'create_app', True),
+    ('boot', 'app', 'create_app', False),
+    ('asgi boot', 'asgi', 'create_asgi_app', False),
+]
+
+
+def run_child(module, factory, database_uri):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', CHILD.format(module=module, factory=factory), database_uri],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise SystemExit(f"Booting {module}.{factory} failed:\n{completed.stderr}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['process'] = elapsed
+    return timings
+
+
+def slowest_imports(module, count):
+    """Packages taking longest to import with `module`, by their own import time in seconds"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True)
+    packages = Counter()
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(own) / 1e6
+    return packages.most_common(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database', help="database made by benchmarks.datagen to boot on (copied)")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--importtime', action='store_true', help="list the packages slowest to import")
+    parser.add_argument('--output', help="write the results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.database:
+            from benchmarks.datagen import scratch_database
+            path = scratch_database(workdir, args.database)
+        else:
+            path = os.path.join(workdir, 'bench.db')
+        # Lần dựng đầu không tính giờ: đưa cơ sở dữ liệu lên phiên bản mới nhất
+        run_child('app', 'create_app', 'sqlite:///' + path)
+
+        for sample in range(args.repeat):
+            for name, module, factory, empty in BOOTS:
+                uri = 'sqlite:///' + (os.path.join(workdir, f'empty-{sample}.db') if empty else path)
+                for phase, value in run_child(module, factory, uri).items():
+                    timings.setdefault(f'{name}: {phase}', []).append(value)
+
+    measurements = {name: results.summarize(values) for name, values in timings.items()}
+    width = max(len(name) for name in measurements)
+    print(f"{'step':<{width}} {'p50 ms':>9} {'min ms':>9} {'max ms':>9}")
+    for name, stats in measurements.items():
+        print(f"{name:<{width}} {stats['p50_ms']:9.1f} {stats['min_ms']:9.1f} {stats['max_ms']:9.1f}")
+
+    if args.importtime:
+        for module in ('app', 'asgi'):
+            print(f"Slowest imports of {module}:")
+            for package, seconds in slowest_imports(module, 12):
+                print(f"  {package:<24} {seconds * 1000:8.1f} ms")
+
+    if args.output:
+        results.write(args.output, 'startup', args, measurements)
+
+
+if __name__ == '__main__':
+    main()
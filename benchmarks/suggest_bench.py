@@ -0,0 +1,118 @@
+"""Time product type suggestions per keystroke, with listings changing in between.
+
+    python -m benchmarks.suggest_bench --posts 300000
+
+The generated posts have about 50k distinct product types. Each simulated user
+types a product type one character at a time and asks for suggestions after
+every keystroke; every --write-every keystrokes a post is created, deleted or
+retyped through PostService, so the remembered top lists are being updated
+while they are read. "sql" is the GROUP BY the endpoint would need without the
+index (LIKE is not accent-folded, so it only approximates the same answer).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from app import create_app
+from benchmarks.search_bench import BRANDS, PRODUCTS, load_posts
+from config import Config
+from models import db, Post
+from service import suggest_index
+from service.post_service import PostService
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda fraction: timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+    return pick(0.5), pick(0.99), timings[-1] * 1000
+
+
+def sql_suggest(prefix):
+    count = func.count()
+    return db.session.execute(
+        select(Post.product_type, count)
+        .where(Post.is_active == True, Post.product_type.like(f"{prefix}%"))
+        .group_by(Post.product_type)
+        .order_by(count.desc(), Post.product_type)
+        .limit(suggest_index.MAX_SUGGESTIONS)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=300000)
+    parser.add_argument('--users', type=int, default=300, help="simulated users typing a product type")
+    parser.add_argument('--write-every', type=int, default=5, help="keystrokes between two writes")
+    parser.add_argument('--sql-samples', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        class BenchConfig(Config):
+            SECRET_KEY = 'bench'
+            JWT_SECRET_KEY = 'bench-secret-key-for-local-runs-only'
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+            RESPONSE_CACHE_SIZE = 0
+            SUGGEST_INDEX_MAX_AGE = 0
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            started = time.perf_counter()
+            load_posts(args.posts)
+            print(f"Loaded {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+            index = suggest_index.get_index()
+            started = time.perf_counter()
+            index.ensure_loaded()
+            print(f"Loaded suggest index ({index.stats()['product_types']} product types) "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+            rng = random.Random(7)
+            seller_id = db.session.execute(select(Post.user_id).limit(1)).scalar()
+            post_ids = db.session.execute(select(Post.id)).scalars().all()
+            client = app.test_client()
+            index_timings, endpoint_timings, sql_timings = [], [], []
+            keystrokes = writes = 0
+
+            for _ in range(args.users):
+                typed = f"{rng.choice(PRODUCTS)} {rng.choice(BRANDS)} M{rng.randint(1, 200)}"
+                for length in range(1, len(typed) + 1):
+                    prefix = typed[:length]
+
+                    started = time.perf_counter()
+                    suggest_index.suggest(prefix)
+                    index_timings.append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    client.get('/api/posts/suggest', query_string={'prefix': prefix})
+                    endpoint_timings.append(time.perf_counter() - started)
+
+                    if len(sql_timings) < args.sql_samples and length <= 3:
+                        started = time.perf_counter()
+                        sql_suggest(prefix)
+                        sql_timings.append(time.perf_counter() - started)
+
+                    keystrokes += 1
+                    if keystrokes % args.write_every == 0:
+                        writes += 1
+                        action = rng.random()
+                        if action < 0.4:
+                            PostService.create_post(seller_id, typed, 1, 100, 'bench', '0900000000')
+                        elif action < 0.7:
+                            PostService.delete_post(post_ids.pop(rng.randrange(len(post_ids))))
+                        else:
+                            PostService.update_post(rng.choice(post_ids), seller_id, {'product_type': typed})
+
+            print(f"{keystrokes} keystrokes, {writes} writes, {index.stats()['cached_prefixes']} cached prefixes")
+            print(f"{'path':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}")
+            for label, timings in (('index', index_timings), ('endpoint', endpoint_timings),
+                                   ('sql (1-3 chars)', sql_timings)):
+                p50, p99, worst = percentiles(timings)
+                print(f"{label:<22}{p50:>10.3f}{p99:>10.3f}{worst:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
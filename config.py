@@ -2,7 +2,60 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///marketplace.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///marketplace.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create the schema and the admin user at startup when the database is not at the head revision;
+    # off leaves it to `flask init-db`, run once per deploy
+    DB_INIT_ON_STARTUP = os.environ.get('DB_INIT_ON_STARTUP', '1').lower() in ('1', 'true', 'yes')
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'fts5')  # fts5 or like
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))  # 0 disables the cache
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))  # seconds
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 4096))
+    IDENTITY_CACHE_TTL = float(os.environ.get('IDENTITY_CACHE_TTL', 60))  # seconds
+    # SQLite engine profile applied to every new connection; None keeps SQLite's default
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024))  # negative means KiB
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds
+    # Optional read-only replica for list and search queries; None reads everything from the primary
+    REPLICA_DATABASE_URI = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_SYNC_INTERVAL = float(os.environ.get('REPLICA_SYNC_INTERVAL', 0))  # seconds, 0 syncs only on demand
+    # In-memory price index for price range search (uses numpy when installed); loaded on first use
+    PRICE_INDEX_ENABLED = os.environ.get('PRICE_INDEX_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PRICE_INDEX_MAX_AGE = float(os.environ.get('PRICE_INDEX_MAX_AGE', 300))  # seconds before a lazy reload, 0 never reloads
+    SUGGEST_INDEX_MAX_AGE = float(os.environ.get('SUGGEST_INDEX_MAX_AGE', 300))  # seconds before a lazy reload, 0 never reloads
+    # Threads per ASGI worker for the Flask views and blocking service calls; None uses asyncio's default
+    ASGI_THREADS = int(os.environ['ASGI_THREADS']) if os.environ.get('ASGI_THREADS') else None
+    # Async reads running at once per ASGI worker; None uses DB_POOL_SIZE
+    ASYNC_DB_CONCURRENCY = int(os.environ['ASYNC_DB_CONCURRENCY']) if os.environ.get('ASYNC_DB_CONCURRENCY') else None
+    # Background jobs (service/jobs.py): workers per process, 0 leaves jobs to `flask run-jobs`
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_WORKER_MODE = os.environ.get('JOB_WORKER_MODE', 'thread')  # thread or process
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))  # seconds
+    JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 900))  # a running job older than this is run again
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5))  # seconds before the first retry, doubled each time
+    JOB_RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', 3600))  # seconds
+    JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))  # finished jobs kept this long
+    MAINTENANCE_HOUR = int(os.environ.get('MAINTENANCE_HOUR', 3))  # UTC hour of the nightly maintenance job
+    MAINTENANCE_VACUUM = os.environ.get('MAINTENANCE_VACUUM', '1').lower() in ('1', 'true', 'yes')
+    # Listing event stream (/api/posts/stream)
+    SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', 1000))  # events a reconnecting client can resume from
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 0.5))  # seconds before events of other processes are seen
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))  # seconds between keep-alive comments
+    SSE_EVENT_RETENTION_HOURS = float(os.environ.get('SSE_EVENT_RETENTION_HOURS', 24))
+    # Prometheus metrics at /metrics (per process); statements slower than SLOW_QUERY_MS are logged, 0 never
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    # Record one request in N in the request histograms (each counted N times); 1 records every request
+    METRICS_SAMPLE_EVERY = int(os.environ.get('METRICS_SAMPLE_EVERY', 1))
+    # Bearer token a Prometheus scraper sends to read /metrics; without it only a logged-in admin can
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # SQL statement budgets (service/query_budget.py): off, log (staging) or raise (tests)
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
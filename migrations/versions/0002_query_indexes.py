@@ -0,0 +1,47 @@
+"""composite indexes for feed, search, purchases and sales
+
+Revision ID: 0002_query_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_query_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_posts_is_active_created_at', 'posts', ['is_active', 'created_at']),
+    ('ix_posts_is_active_price', 'posts', ['is_active', 'price']),
+    ('ix_posts_user_id_created_at', 'posts', ['user_id', 'created_at']),
+    ('ix_orders_buyer_id_created_at', 'orders', ['buyer_id', 'created_at']),
+    ('ix_orders_seller_id_created_at', 'orders', ['seller_id', 'created_at']),
+    ('ix_orders_post_id', 'orders', ['post_id']),
+    ('ix_orders_created_at', 'orders', ['created_at']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # db.create_all() đã tạo sẵn các index này trên database mới
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+    # Cập nhật thống kê để SQLite chọn đúng index ngay sau khi nâng cấp
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
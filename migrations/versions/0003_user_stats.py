@@ -0,0 +1,56 @@
+"""user_stats rollup of order totals per seller and buyer
+
+Revision ID: 0003_user_stats
+Revises: 0002_query_indexes
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_user_stats'
+down_revision = '0002_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'user_stats' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'user_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('sales_count', sa.Integer(), nullable=False),
+            sa.Column('units_sold', sa.Integer(), nullable=False),
+            sa.Column('gross_revenue', sa.Float(), nullable=False),
+            sa.Column('last_sale_at', sa.DateTime(), nullable=True),
+            sa.Column('purchase_count', sa.Integer(), nullable=False),
+            sa.Column('units_bought', sa.Integer(), nullable=False),
+            sa.Column('gross_spent', sa.Float(), nullable=False),
+            sa.Column('last_purchase_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id')
+        )
+
+    # Tính lại toàn bộ từ bảng orders, giống lệnh `flask rebuild-user-stats`
+    op.execute("DELETE FROM user_stats")
+    op.execute(
+        "INSERT INTO user_stats (user_id, sales_count, units_sold, gross_revenue, last_sale_at, "
+        "purchase_count, units_bought, gross_spent) "
+        "SELECT seller_id, COUNT(id), SUM(quantity), SUM(quantity * price), MAX(created_at), 0, 0, 0 "
+        "FROM orders GROUP BY seller_id"
+    )
+    op.execute(
+        "INSERT INTO user_stats (user_id, sales_count, units_sold, gross_revenue, "
+        "purchase_count, units_bought, gross_spent, last_purchase_at) "
+        "SELECT buyer_id, 0, 0, 0, COUNT(id), SUM(quantity), SUM(quantity * price), MAX(created_at) "
+        "FROM orders WHERE true GROUP BY buyer_id "
+        "ON CONFLICT (user_id) DO UPDATE SET purchase_count = excluded.purchase_count, "
+        "units_bought = excluded.units_bought, gross_spent = excluded.gross_spent, "
+        "last_purchase_at = excluded.last_purchase_at"
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
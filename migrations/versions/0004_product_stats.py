@@ -0,0 +1,68 @@
+"""product_type rollups per day and month for admin analytics
+
+Revision ID: 0004_product_stats
+Revises: 0003_user_stats
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_product_stats'
+down_revision = '0003_user_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'product_stats' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'product_stats',
+            sa.Column('period', sa.String(length=5), nullable=False),
+            sa.Column('starts_on', sa.Date(), nullable=False),
+            sa.Column('product_type', sa.String(length=100), nullable=False),
+            sa.Column('order_count', sa.Integer(), nullable=False),
+            sa.Column('units_sold', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.Column('listings_opened', sa.Integer(), nullable=False),
+            sa.Column('listings_closed', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('period', 'starts_on', 'product_type'),
+            sqlite_with_rowid=False
+        )
+        op.create_index('ix_product_stats_period_product_type', 'product_stats',
+                        ['period', 'product_type', 'starts_on'], unique=False)
+
+    # Tính lại toàn bộ từ posts và orders, giống lệnh `flask rebuild-analytics`: các thay đổi
+    # sau đó chỉ cộng dồn phần chênh lệch, nên bảng phải khớp với dữ liệu đang có ngay từ đầu
+    op.execute("DELETE FROM product_stats")
+    op.execute(
+        "INSERT INTO product_stats (period, starts_on, product_type, order_count, units_sold, revenue, "
+        "listings_opened, listings_closed) "
+        "SELECT 'day', starts_on, product_type, SUM(order_count), SUM(units_sold), SUM(revenue), "
+        "SUM(listings_opened), SUM(listings_closed) FROM ("
+        "SELECT date(orders.created_at) AS starts_on, posts.product_type AS product_type, 1 AS order_count, "
+        "orders.quantity AS units_sold, orders.quantity * orders.price AS revenue, "
+        "0 AS listings_opened, 0 AS listings_closed "
+        "FROM orders JOIN posts ON posts.id = orders.post_id "
+        "UNION ALL SELECT date(created_at), product_type, 0, 0, 0, 1, 0 FROM posts "
+        "UNION ALL SELECT date(updated_at), product_type, 0, 0, 0, 0, 1 FROM posts WHERE NOT is_active"
+        ") AS events GROUP BY starts_on, product_type"
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "CAST(date_trunc('month', starts_on) AS DATE)"
+    else:
+        month = "date(starts_on, 'start of month')"
+    op.execute(
+        "INSERT INTO product_stats (period, starts_on, product_type, order_count, units_sold, revenue, "
+        "listings_opened, listings_closed) "
+        f"SELECT 'month', {month}, product_type, SUM(order_count), SUM(units_sold), SUM(revenue), "
+        "SUM(listings_opened), SUM(listings_closed) "
+        f"FROM product_stats WHERE period = 'day' GROUP BY {month}, product_type"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_stats_period_product_type', table_name='product_stats')
+    op.drop_table('product_stats')
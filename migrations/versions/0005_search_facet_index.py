@@ -0,0 +1,37 @@
+"""index for product_type facet counts and product_type + price filters
+
+Revision ID: 0005_search_facet_index
+Revises: 0004_product_stats
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_search_facet_index'
+down_revision = '0004_product_stats'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_posts_is_active_product_type_price'
+
+
+def _index_exists():
+    return INDEX_NAME in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('posts')}
+
+
+def upgrade():
+    # db.create_all() đã tạo sẵn index này trên database mới
+    if not _index_exists():
+        op.create_index(INDEX_NAME, 'posts', ['is_active', 'product_type', 'price'], unique=False)
+
+    # Index chưa có thống kê thì SQLite có thể chọn nó cho cả truy vấn trang chủ
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    if _index_exists():
+        op.drop_index(INDEX_NAME, table_name='posts')
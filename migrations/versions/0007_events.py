@@ -0,0 +1,37 @@
+"""listing change events for the server-sent events stream
+
+Revision ID: 0007_events
+Revises: 0006_jobs
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_events'
+down_revision = '0006_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'events' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=30), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_events_created_at', 'events', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_events_created_at', table_name='events')
+    op.drop_table('events')
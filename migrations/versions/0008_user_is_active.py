@@ -0,0 +1,29 @@
+"""users.is_active, cleared when an admin deletes an account ahead of the purge job
+
+Revision ID: 0008_user_is_active
+Revises: 0007_events
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_user_is_active'
+down_revision = '0007_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'is_active' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}:
+        return
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_active')
@@ -12,6 +12,8 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(100), nullable=False)  # Would be hashed in production
     is_admin = db.Column(db.Boolean, default=False)
+    # Cleared when an admin deletes the account; purge_user deletes the row unless the user has purchases
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -19,6 +21,7 @@ class User(db.Model):
     posts = db.relationship('Post', backref='author', lazy=True, cascade="all, delete-orphan")
     sales = db.relationship('Order', backref='seller', lazy=True, foreign_keys="Order.seller_id")
     purchases = db.relationship('Order', backref='buyer', lazy=True, foreign_keys="Order.buyer_id")
+    stats = db.relationship('UserStats', uselist=False, lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -33,6 +36,12 @@ class User(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        db.Index('ix_posts_is_active_created_at', 'is_active', 'created_at'),  # feed
+        db.Index('ix_posts_is_active_price', 'is_active', 'price'),  # price range search
+        db.Index('ix_posts_is_active_product_type_price', 'is_active', 'product_type', 'price'),  # search facets
+        db.Index('ix_posts_user_id_created_at', 'user_id', 'created_at'),  # posts of a user
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -65,6 +74,12 @@ class Post(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_buyer_id_created_at', 'buyer_id', 'created_at'),  # purchases
+        db.Index('ix_orders_seller_id_created_at', 'seller_id', 'created_at'),  # sales
+        db.Index('ix_orders_post_id', 'post_id'),  # cascade when a post is deleted
+        db.Index('ix_orders_created_at', 'created_at'),  # admin order list
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
@@ -88,4 +103,127 @@ class Order(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class UserStats(db.Model):
+    """Per-user order totals, kept up to date in the same transaction as each order"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # Phía người bán
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    gross_revenue = db.Column(db.Float, nullable=False, default=0.0)
+    last_sale_at = db.Column(db.DateTime)
+    # Phía người mua
+    purchase_count = db.Column(db.Integer, nullable=False, default=0)
+    units_bought = db.Column(db.Integer, nullable=False, default=0)
+    gross_spent = db.Column(db.Float, nullable=False, default=0.0)
+    last_purchase_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'sales': {
+                'order_count': self.sales_count,
+                'units': self.units_sold,
+                'gross_revenue': self.gross_revenue,
+                'last_order_at': self.last_sale_at.isoformat() if self.last_sale_at else None
+            },
+            'purchases': {
+                'order_count': self.purchase_count,
+                'units': self.units_bought,
+                'gross_spent': self.gross_spent,
+                'last_order_at': self.last_purchase_at.isoformat() if self.last_purchase_at else None
+            }
+        }
+
+
+class ProductStats(db.Model):
+    """Order and listing totals per product type, for each UTC day and each month.
+
+    Every change is written to both the day row and the month row, so long
+    date ranges are summed mostly from month rows. Listing counters are
+    opened/closed deltas; the number of active listings at the end of a day
+    is the sum of (opened - closed) up to that day.
+    """
+    __tablename__ = 'product_stats'
+    __table_args__ = (
+        db.Index('ix_product_stats_period_product_type', 'period', 'product_type', 'starts_on'),  # one type
+        # Lưu theo khóa chính để quét một khoảng ngày đọc luôn các cột số liệu
+        {'sqlite_with_rowid': False},
+    )
+
+    period = db.Column(db.String(5), primary_key=True)  # 'day' hoặc 'month'
+    starts_on = db.Column(db.Date, primary_key=True)
+    product_type = db.Column(db.String(100), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    listings_opened = db.Column(db.Integer, nullable=False, default=0)
+    listings_closed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """A unit of deferred or periodic work, run by the background job runner (service/jobs.py).
+
+    Jobs are written in the same transaction as the change that asks for them,
+    so they are neither lost nor run for a rolled back change, and survive a
+    restart. A running job whose lease ran out (its worker died) is claimed
+    again by the next free worker.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),  # claiming due jobs
+        # Mỗi khóa chỉ có một job đang chờ hoặc đang chạy (job định kỳ không bị xếp trùng giữa các worker)
+        db.Index('ux_jobs_unique_key', 'unique_key', unique=True,
+                 sqlite_where=db.text("status IN ('pending', 'running')"),
+                 postgresql_where=db.text("status IN ('pending', 'running')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments of the handler
+    unique_key = db.Column(db.String(100))
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class Event(db.Model):
+    """A change to the listings, pushed to /api/posts/stream subscribers (service/events.py).
+
+    Written in the same transaction as the change; every process tails the
+    table, so it also carries events between server workers. AUTOINCREMENT
+    keeps ids increasing after old rows are pruned, since clients resume from
+    the last id they saw.
+    """
+    __tablename__ = 'events'
+    __table_args__ = (
+        db.Index('ix_events_created_at', 'created_at'),  # pruning
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(30), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
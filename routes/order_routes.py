@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify, render_template
 from service.order_service import OrderService
+from service.analytics_service import AnalyticsService, parse_report_args
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from service.user_service import UserService
+from service.identity import current_principal
 from service.post_service import PostService
+from service.pagination import parse_page_args, page_payload
+from service.etag import feed_etag, not_modified, resource_etag, with_etag
+from service.export import EXPORT_FORMATS, export_response
+from service.serialization import json_response
 
 order_bp = Blueprint('order', __name__, url_prefix='/api/orders')
 
@@ -37,20 +42,59 @@ def create_order():
     return jsonify({"message": "Order placed successfully", "order": order.to_dict()}), 201
 
 
+@order_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_orders():
+    current_user_id = get_jwt_identity()
+    data = request.get_json()
+
+    try:
+        items = [(int(item['post_id']), int(item['quantity'])) for item in data.get('items')]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Items must be a list of post_id and quantity integers"}), 400
+
+    orders, failures = OrderService.create_orders(current_user_id, items)
+
+    if failures:
+        return jsonify({"error": "Could not place orders", "items": failures}), 400
+
+    return jsonify({"message": "Orders placed successfully", "orders": [order.to_dict() for order in orders]}), 201
+
+
 @order_bp.route('/purchases', methods=['GET'])
 @jwt_required()
 def get_purchases():
     current_user_id = get_jwt_identity()
-    orders = OrderService.get_orders_by_buyer(current_user_id)
-    return jsonify({"purchases": orders}), 200
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    etag = feed_etag(current_user_id)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    orders = OrderService.get_orders_by_buyer(current_user_id, limit=limit, cursor=cursor)
+    return with_etag(json_response(page_payload("purchases", orders)), etag), 200
 
 
 @order_bp.route('/sales', methods=['GET'])
 @jwt_required()
 def get_sales():
     current_user_id = get_jwt_identity()
-    orders = OrderService.get_orders_by_seller(current_user_id)
-    return jsonify({"sales": orders}), 200
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    etag = feed_etag(current_user_id)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    orders = OrderService.get_orders_by_seller(current_user_id, limit=limit, cursor=cursor)
+    return with_etag(json_response(page_payload("sales", orders)), etag), 200
 
 
 @order_bp.route('/', methods=['GET'])
@@ -58,33 +102,73 @@ def get_sales():
 def get_all_orders():
     # Kiểm tra quyền admin trước khi cho phép xem tất cả đơn hàng
     current_user_id = get_jwt_identity()
-    user, error = UserService.get_user_by_id(current_user_id)
+    principal = current_principal()
+
+    if principal is None or not principal.is_admin:
+        return jsonify({"error": "Unauthorized access"}), 403
 
-    if error or not user or not user.is_admin:
+    export_format = request.args.get('format', 'json')
+    if export_format != 'json':
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported export format"}), 400
+        return export_response(OrderService.iter_all_orders(), export_format, 'orders')
+
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    etag = feed_etag(current_user_id)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    orders = OrderService.get_all_orders(limit=limit, cursor=cursor)
+    return with_etag(json_response(page_payload("orders", orders)), etag), 200
+
+
+@order_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    principal = current_principal()
+
+    if principal is None or not principal.is_admin:
         return jsonify({"error": "Unauthorized access"}), 403
 
-    orders = OrderService.get_all_orders()
-    return jsonify({"orders": orders}), 200
+    try:
+        start, end, granularity = parse_report_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid report parameters"}), 400
+
+    etag = feed_etag()
+    response = not_modified(etag)
+    if response:
+        return response
+
+    report = AnalyticsService.get_report(start, end, request.args.get('product_type'), granularity)
+    return with_etag(json_response({"analytics": report}), etag), 200
 
 
 @order_bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
 def get_order_details(order_id):
-    current_user_id = get_jwt_identity()
-
     # Lấy thông tin đơn hàng từ database
-    # (Giả định có phương thức này trong OrderService)
-    order = OrderService.get_order_by_id(order_id)
-
-    if not order:
-        return jsonify({"error": "Order not found"}), 404
+    order, error = OrderService.get_order(order_id)
 
-    # Kiểm tra quyền truy cập: admin, người mua hoặc người bán
-    user, error = UserService.get_user_by_id(current_user_id)
     if error:
         return jsonify({"error": error}), 404
 
-    if not user.is_admin and order.get('buyer_id') != current_user_id and order.get('seller_id') != current_user_id:
+    # Kiểm tra quyền truy cập: admin, người mua hoặc người bán
+    principal = current_principal()
+    if principal is None:
+        return jsonify({"error": "User not found"}), 404
+
+    if not principal.is_admin and principal.id not in (order.buyer_id, order.seller_id):
         return jsonify({"error": "Unauthorized access"}), 403
 
-    return jsonify({"order": order}), 200
\ No newline at end of file
+    etag = resource_etag('order', order.id, order.updated_at)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    return with_etag(jsonify({"order": order.to_dict()}), etag), 200
\ No newline at end of file
@@ -1,5 +1,11 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, current_app
 from service.post_service import PostService
+from service.search_service import SearchService, parse_search_args
+from service.pagination import parse_page_args, page_payload
+from service.etag import feed_etag, not_modified, resource_etag, with_etag
+from service.bulk_import import read_post_rows
+from service.serialization import json_response
+from service import events, suggest_index
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 post_bp = Blueprint('post', __name__, url_prefix='/api/posts')
@@ -39,18 +45,56 @@ def create_post():
     return jsonify({"message": "Post created successfully", "post": post.to_dict()}), 201
 
 
+@post_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_posts():
+    current_user_id = get_jwt_identity()
+
+    try:
+        rows = read_post_rows(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Invalid import file: {e}"}), 400
+
+    report, error = PostService.bulk_create_posts(current_user_id, rows)
+    if error:
+        # Các lô trước lô lỗi đã được lưu: trả kèm báo cáo để client gửi tiếp từ resume_from_row
+        return jsonify({"error": error, **(report or {})}), 400
+
+    return jsonify({"message": f"Imported {report['created']} posts", **report}), 200
+
+
 @post_bp.route('/get', methods=['GET'])
 def get_all_posts():
-    posts = PostService.get_all_posts()
-    return jsonify({"posts": posts}), 200
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    etag = feed_etag()
+    response = not_modified(etag)
+    if response:
+        return response
+
+    posts = PostService.get_all_posts(limit=limit, cursor=cursor)
+    return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
 
 @post_bp.route('/user', methods=['GET'])
 @jwt_required()
 def get_user_posts():
     current_user_id = get_jwt_identity()
-    posts = PostService.get_posts_by_user(current_user_id)
-    return jsonify({"posts": posts}), 200
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    etag = feed_etag(current_user_id)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    posts = PostService.get_posts_by_user(current_user_id, limit=limit, cursor=cursor)
+    return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
 
 @post_bp.route('/<int:post_id>', methods=['GET'])
@@ -60,14 +104,64 @@ def get_post(post_id):
     if error:
         return jsonify({"error": error}), 404
 
-    return jsonify({"post": post.to_dict()}), 200
+    etag = resource_etag('post', post.id, post.updated_at)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    return with_etag(jsonify({"post": post.to_dict()}), etag), 200
+
+
+@post_bp.route('/search', methods=['GET'])
+def search():
+    etag = feed_etag()
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        limit, cursor = parse_page_args(request.args)
+        result = SearchService.search(**parse_search_args(request.args), limit=limit, cursor=cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid search parameters"}), 400
+
+    return with_etag(json_response(result), etag), 200
+
+
+@post_bp.route('/suggest', methods=['GET'])
+def suggest():
+    try:
+        limit = int(request.args.get('limit', suggest_index.MAX_SUGGESTIONS))
+    except ValueError:
+        return jsonify({"error": "Limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "Limit must be positive"}), 400
+
+    suggestions = suggest_index.suggest(request.args.get('prefix', ''), limit)
+    return json_response({"suggestions": suggestions}), 200
+
+
+@post_bp.route('/stream', methods=['GET'])
+def stream():
+    subscription = events.get_hub().subscribe(events.parse_last_event_id(request.headers.get('Last-Event-ID')))
+    return events.sse_response(events.stream(subscription, current_app.config.get('SSE_HEARTBEAT') or 15))
 
 
 @post_bp.route('/search/name', methods=['GET'])
 def search_by_name():
     product_name = request.args.get('name', '')
-    posts = PostService.search_posts_by_product_name(product_name)
-    return jsonify({"posts": posts}), 200
+    etag = feed_etag()
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        limit, cursor = parse_page_args(request.args)
+        posts = PostService.search_posts_by_product_name(product_name, limit=limit, cursor=cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    return with_etag(json_response(page_payload("posts", posts)), etag), 200
 
 
 @post_bp.route('/search/price', methods=['GET'])
@@ -76,8 +170,21 @@ def search_by_price():
     max_price = request.args.get('max')
 
     # Convert to float if not None
-    min_price = float(min_price) if min_price else None
-    max_price = float(max_price) if max_price else None
-
-    posts = PostService.search_posts_by_price_range(min_price, max_price)
-    return jsonify({"posts": posts}), 200
\ No newline at end of file
+    try:
+        min_price = float(min_price) if min_price else None
+        max_price = float(max_price) if max_price else None
+    except ValueError:
+        return jsonify({"error": "Prices must be numbers"}), 400
+
+    etag = feed_etag()
+    response = not_modified(etag)
+    if response:
+        return response
+
+    try:
+        limit, cursor = parse_page_args(request.args)
+        posts = PostService.search_posts_by_price_range(min_price, max_price, limit=limit, cursor=cursor)
+    except ValueError:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+
+    return with_etag(json_response(page_payload("posts", posts)), etag), 200
\ No newline at end of file
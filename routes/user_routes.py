@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from service.user_service import UserService
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from service.stats_service import StatsService
+from flask_jwt_extended import jwt_required
+from service.identity import current_principal
+from service.export import EXPORT_FORMATS, export_response
+from service.serialization import json_response
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/users')
 
@@ -41,41 +45,55 @@ def login():
 @user_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def profile():
-    current_user_id = get_jwt_identity()
-    user, error = UserService.get_user_by_id(current_user_id)
+    principal = current_principal()
 
-    if error:
-        return jsonify({"error": error}), 404
+    if principal is None:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({"user": principal.to_dict()}), 200
 
-    return jsonify({"user": user.to_dict()}), 200
+
+@user_bp.route('/stats', methods=['GET'])
+@jwt_required()
+def stats():
+    principal = current_principal()
+
+    if principal is None:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({"stats": StatsService.get_user_stats(principal.id)}), 200
 
 
 @user_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_all_users():
     # Kiểm tra nếu user hiện tại là admin
-    current_user_id = get_jwt_identity()
-    user, error = UserService.get_user_by_id(current_user_id)
+    principal = current_principal()
 
-    if error or not user or not user.is_admin:
+    if principal is None or not principal.is_admin:
         return jsonify({"error": "Unauthorized access"}), 403
 
+    export_format = request.args.get('format', 'json')
+    if export_format != 'json':
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported export format"}), 400
+        return export_response(UserService.iter_all_users(), export_format, 'users')
+
     users = UserService.get_all_users()
-    return jsonify({"users": users}), 200
+    return json_response({"users": users}), 200
 
 
 @user_bp.route('/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 def delete_user(user_id):
     # Kiểm tra nếu user hiện tại là admin
-    current_user_id = get_jwt_identity()
-    user, error = UserService.get_user_by_id(current_user_id)
+    principal = current_principal()
 
-    if error or not user or not user.is_admin:
+    if principal is None or not principal.is_admin:
         return jsonify({"error": "Unauthorized access"}), 403
 
     # Không cho phép xóa chính mình
-    if user_id == current_user_id:
+    if user_id == principal.id:
         return jsonify({"error": "Cannot delete your own account"}), 400
 
     success, error = UserService.delete_user(user_id)
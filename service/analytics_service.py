@@ -0,0 +1,328 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import cast, delete, func, literal, not_, select, union_all
+
+from models import db, Order, Post, ProductStats
+from service.upsert import upsert_insert
+
+DEFAULT_REPORT_DAYS = 30
+# Khoảng dài hơn thì chuỗi thời gian được gom theo tháng
+MAX_DAILY_SERIES_DAYS = 92
+GRANULARITIES = ('day', 'month')
+
+COUNTERS = ('order_count', 'units_sold', 'revenue', 'listings_opened', 'listings_closed')
+ORDER_COUNT, UNITS_SOLD, REVENUE, LISTINGS_OPENED, LISTINGS_CLOSED = range(len(COUNTERS))
+
+
+def parse_report_args(args):
+    """Read from/to (YYYY-MM-DD) and granularity of a report, raising ValueError on bad input.
+
+    Defaults to the last DEFAULT_REPORT_DAYS days, today (UTC) included, with
+    a daily series up to MAX_DAILY_SERIES_DAYS and a monthly one beyond.
+    """
+    end = date.fromisoformat(args['to']) if args.get('to') else datetime.utcnow().date()
+    start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if start > end:
+        raise ValueError("Start date is after end date")
+
+    granularity = args.get('granularity')
+    if granularity is None:
+        granularity = 'day' if (end - start).days < MAX_DAILY_SERIES_DAYS else 'month'
+    elif granularity not in GRANULARITIES:
+        raise ValueError("Unknown granularity")
+
+    return start, end, granularity
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _periods(start, end):
+    """Cover [start, end] with whole months and the leftover days at either edge.
+
+    Returns (period, first start, last start) triples to sum rows over.
+    """
+    first_month = start if start.day == 1 else _next_month(start)
+    after_months = _next_month(end) if _next_month(end) - timedelta(days=1) == end else _month_start(end)
+    if first_month >= after_months:
+        return [('day', start, end)]
+
+    periods = [('month', first_month, _month_start(after_months - timedelta(days=1)))]
+    if start < first_month:
+        periods.append(('day', start, first_month - timedelta(days=1)))
+    if after_months <= end:
+        periods.append(('day', after_months, end))
+    return periods
+
+
+def _for_product_type(statement, product_type):
+    """Restrict a rollup query to one product type when given"""
+    if not product_type:
+        return statement
+    return statement.where(ProductStats.product_type == product_type)
+
+
+def _sql_month_start(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return cast(func.date_trunc('month', column), db.Date)
+    return func.date(column, 'start of month')
+
+
+def _bump(deltas, day, product_type, counter, value):
+    deltas.setdefault((day, product_type), [0, 0, 0.0, 0, 0])[counter] += value
+
+
+class AnalyticsService:
+    """Daily rollups by product type, maintained in the same transaction as each write.
+
+    The rollup is always a function of the current posts and orders tables:
+    a post counts as opened on the day it was created and, once inactive, as
+    closed on the day it was last updated; orders count under their post's
+    current product type. Writes apply the difference they make, and
+    rebuild() recomputes the same thing from scratch.
+    """
+
+    @staticmethod
+    def _apply(deltas, sign=1):
+        # Mỗi thay đổi được ghi vào cả dòng của ngày và dòng của tháng
+        periods = {}
+        for (day, product_type), values in deltas.items():
+            for key in (('day', day, product_type), ('month', _month_start(day), product_type)):
+                current = periods.setdefault(key, [0, 0, 0.0, 0, 0])
+                for counter, value in enumerate(values):
+                    current[counter] += sign * value
+
+        rows = [
+            {'period': period, 'starts_on': starts_on, 'product_type': product_type, **dict(zip(COUNTERS, values))}
+            for (period, starts_on, product_type), values in periods.items()
+            if any(values)
+        ]
+        if not rows:
+            return
+
+        stmt = upsert_insert(ProductStats)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductStats.period, ProductStats.starts_on, ProductStats.product_type],
+            set_={counter: getattr(ProductStats, counter) + stmt.excluded[counter] for counter in COUNTERS}
+        )
+        # Chạy ở tầng Core, không qua bulk persistence của ORM (đắt khi nhập hàng loạt nhiều loại sản phẩm)
+        db.session.connection().execute(stmt, rows)
+
+    @staticmethod
+    def footprint(post_ids, include_orders=True):
+        """What the given posts, and optionally their orders, contribute to the rollup"""
+        deltas = {}
+        post_ids = list(post_ids)
+        if not post_ids:
+            return deltas
+
+        product_types = {}
+        posts = db.session.execute(
+            select(Post.id, Post.product_type, Post.is_active, Post.created_at, Post.updated_at)
+            .where(Post.id.in_(post_ids))
+        )
+        for post_id, product_type, is_active, created_at, updated_at in posts:
+            product_types[post_id] = product_type
+            _bump(deltas, created_at.date(), product_type, LISTINGS_OPENED, 1)
+            if not is_active:
+                _bump(deltas, updated_at.date(), product_type, LISTINGS_CLOSED, 1)
+
+        if include_orders:
+            orders = db.session.execute(
+                select(Order.post_id, Order.created_at, Order.quantity, Order.price)
+                .where(Order.post_id.in_(post_ids))
+            )
+            for post_id, created_at, quantity, price in orders:
+                day = created_at.date()
+                _bump(deltas, day, product_types[post_id], ORDER_COUNT, 1)
+                _bump(deltas, day, product_types[post_id], UNITS_SOLD, quantity)
+                _bump(deltas, day, product_types[post_id], REVENUE, quantity * price)
+
+        return deltas
+
+    @staticmethod
+    def record_listings(day, product_types):
+        """Count newly created active posts"""
+        deltas = {}
+        for product_type in product_types:
+            _bump(deltas, day, product_type, LISTINGS_OPENED, 1)
+        AnalyticsService._apply(deltas)
+
+    @staticmethod
+    def record_orders(orders):
+        """Add flushed orders, and the listings they sold out, to the rollup"""
+        posts = db.session.execute(
+            select(Post.id, Post.product_type, Post.is_active, Post.updated_at)
+            .where(Post.id.in_({order.post_id for order in orders}))
+        ).all()
+        product_types = {post_id: product_type for post_id, product_type, _, _ in posts}
+
+        deltas = {}
+        for order in orders:
+            day, product_type = order.created_at.date(), product_types[order.post_id]
+            _bump(deltas, day, product_type, ORDER_COUNT, 1)
+            _bump(deltas, day, product_type, UNITS_SOLD, order.quantity)
+            _bump(deltas, day, product_type, REVENUE, order.quantity * order.price)
+
+        # Bài đăng chỉ có thể bị tắt trong giao dịch này, vì câu UPDATE trừ kho yêu cầu is_active
+        for _, product_type, is_active, updated_at in posts:
+            if not is_active:
+                _bump(deltas, updated_at.date(), product_type, LISTINGS_CLOSED, 1)
+
+        AnalyticsService._apply(deltas)
+
+    @staticmethod
+    def remove_posts(post_ids):
+        """Take posts and their orders out of the rollup; call before deleting them"""
+        AnalyticsService._apply(AnalyticsService.footprint(post_ids), sign=-1)
+
+    @staticmethod
+    def replace(before, after):
+        """Apply the change between two footprints of the same posts"""
+        deltas = {key: [-value for value in values] for key, values in before.items()}
+        for key, values in after.items():
+            current = deltas.setdefault(key, [0, 0, 0.0, 0, 0])
+            for counter, value in enumerate(values):
+                current[counter] += value
+        AnalyticsService._apply(deltas)
+
+    @staticmethod
+    def rebuild():
+        """Recompute the rollup from scratch with one pass over posts and orders.
+
+        Day rows are built by a single INSERT ... SELECT over both tables, and
+        month rows are then summed from the day rows.
+        """
+        zero = literal(0)
+        events = union_all(
+            select(
+                func.date(Order.created_at).label('starts_on'), Post.product_type.label('product_type'),
+                literal(1).label('order_count'), Order.quantity.label('units_sold'),
+                (Order.quantity * Order.price).label('revenue'),
+                zero.label('listings_opened'), zero.label('listings_closed')
+            ).join(Post, Post.id == Order.post_id),
+            select(func.date(Post.created_at), Post.product_type, zero, zero, zero, literal(1), zero),
+            select(func.date(Post.updated_at), Post.product_type, zero, zero, zero, zero, literal(1))
+            .where(not_(Post.is_active)),
+        ).subquery()
+
+        days = select(
+            literal('day'), events.c.starts_on, events.c.product_type,
+            *(func.sum(events.c[counter]) for counter in COUNTERS)
+        ).group_by(events.c.starts_on, events.c.product_type)
+
+        month = _sql_month_start(ProductStats.starts_on)
+        months = select(
+            literal('month'), month, ProductStats.product_type,
+            *(func.sum(getattr(ProductStats, counter)) for counter in COUNTERS)
+        ).where(ProductStats.period == 'day').group_by(month, ProductStats.product_type)
+
+        columns = ['period', 'starts_on', 'product_type', *COUNTERS]
+        try:
+            db.session.execute(delete(ProductStats))
+            db.session.execute(ProductStats.__table__.insert().from_select(columns, days))
+            db.session.execute(ProductStats.__table__.insert().from_select(columns, months))
+            db.session.commit()
+            return db.session.query(func.count()).select_from(ProductStats).scalar(), None
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+
+    @staticmethod
+    def _sum(group_by, period, start, end, product_type):
+        """Order totals per `group_by` over the rows of one period kind between two starts"""
+        return db.session.execute(_for_product_type(
+            select(
+                group_by,
+                func.sum(ProductStats.order_count),
+                func.sum(ProductStats.units_sold),
+                func.sum(ProductStats.revenue)
+            )
+            .where(ProductStats.period == period, ProductStats.starts_on.between(start, end))
+            .group_by(group_by),
+            product_type
+        )).all()
+
+    @staticmethod
+    def _sum_over(group_by, start, end, product_type, key=None):
+        """Totals per `group_by` over [start, end], read from month rows where whole months fit"""
+        totals = {}
+        for period, part_start, part_end in _periods(start, end):
+            for group, order_count, units_sold, revenue in AnalyticsService._sum(
+                    group_by, period, part_start, part_end, product_type):
+                group = key(group) if key else group
+                current = totals.setdefault(group, [0, 0, 0.0])
+                current[0] += order_count
+                current[1] += units_sold
+                current[2] += revenue
+        return totals
+
+    @staticmethod
+    def get_report(start, end, product_type=None, granularity='day'):
+        """Totals per product type and a day or month series between two dates, both included.
+
+        Active listings are counted at the end of `end`.
+        """
+        by_type = {
+            name: _totals(*values, product_type=name, active_listings=0)
+            for name, values in AnalyticsService._sum_over(ProductStats.product_type, start, end, product_type).items()
+        }
+
+        # Số bài đăng còn mở = tổng (mở - đóng) từ đầu đến hết ngày `end`
+        for period, part_start, part_end in _periods(date.min, end):
+            active = db.session.execute(_for_product_type(
+                select(
+                    ProductStats.product_type,
+                    func.sum(ProductStats.listings_opened - ProductStats.listings_closed)
+                )
+                .where(ProductStats.period == period, ProductStats.starts_on.between(part_start, part_end))
+                .group_by(ProductStats.product_type),
+                product_type
+            ))
+            for name, count in active:
+                if name not in by_type:
+                    by_type[name] = _totals(0, 0, 0.0, product_type=name, active_listings=0)
+                by_type[name]['active_listings'] += count
+
+        if granularity == 'day':
+            series = {
+                day: values for day, *values in AnalyticsService._sum(ProductStats.starts_on, 'day', start, end, product_type)
+            }
+        else:
+            series = AnalyticsService._sum_over(ProductStats.starts_on, start, end, product_type, key=_month_start)
+
+        product_types = sorted(
+            (row for row in by_type.values() if row['order_count'] or row['active_listings']),
+            key=lambda row: (-row['revenue'], row['product_type'])
+        )
+        totals = _totals(
+            sum(row['order_count'] for row in product_types),
+            sum(row['units_sold'] for row in product_types),
+            sum(row['revenue'] for row in product_types),
+            active_listings=sum(row['active_listings'] for row in product_types)
+        )
+        return {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'granularity': granularity,
+            'totals': totals,
+            'product_types': product_types,
+            'series': [
+                _totals(*series[starts_on], starts_on=starts_on.isoformat()) for starts_on in sorted(series)
+            ],
+        }
+
+
+def _totals(order_count, units_sold, revenue, **fields):
+    return {
+        **fields,
+        'order_count': order_count or 0,
+        'units_sold': units_sold or 0,
+        'revenue': revenue or 0.0,
+        'average_price': revenue / units_sold if units_sold else None,
+    }
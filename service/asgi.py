@@ -0,0 +1,168 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from service import async_db, jobs, metrics
+
+
+class _ThreadedWsgiInstance(WsgiToAsgiInstance):
+    # asgiref chạy mọi request WSGI trên cùng một luồng (thread_sensitive); ở đây dùng cả thread pool
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+def _closing(application):
+    """`application` with its response body closed once sent, which asgiref never does itself"""
+    def closing_application(environ, start_response):
+        body = application(environ, start_response)
+        try:
+            yield from body
+        finally:
+            # close() chạy các hàm call_on_close của Flask và ghi request vào metrics
+            if hasattr(body, 'close'):
+                body.close()
+    return closing_application
+
+
+class AsgiApp:
+    """ASGI entry point in front of a Flask app.
+
+    Routes registered with route() are async handlers run on the event loop,
+    inside a Flask request context, so they use request, session, the response
+    cache and the same response helpers as the Flask views; they read through
+    the async engine (service/async_db.py). Every other request goes to the
+    Flask app itself, run on a thread pool of ASGI_THREADS threads. Blocking
+    service code called from an async handler goes through run_sync(), on the
+    same pool. A handler can return a response whose body is an async
+    iterator (server-sent events); it is sent chunk by chunk until the
+    client disconnects.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = _closing(app)
+        self.url_map = Map()
+        self.handlers = {}
+
+    def route(self, rule, methods=('GET',)):
+        def decorator(handler):
+            self.url_map.add(Rule(rule, endpoint=handler.__name__, methods=methods))
+            self.handlers[handler.__name__] = handler
+            return handler
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        adapter = self.url_map.bind(self.app.config.get('SERVER_NAME') or 'localhost', url_scheme=scope.get('scheme', 'http'))
+        try:
+            endpoint, view_args = adapter.match(scope['path'], scope['method'])
+        except HTTPException:
+            # Không có handler async (kể cả 404/405 và chuyển hướng dấu /): để Flask xử lý như bản WSGI
+            await _ThreadedWsgiInstance(self.wsgi_app)(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        response = await self._dispatch(scope, body, self.handlers[endpoint], view_args)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()],
+        })
+        if hasattr(response.response, '__aiter__') and scope['method'] != 'HEAD':
+            await self._stream(response.response, receive, send)
+            return
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else response.get_data()})
+
+    @staticmethod
+    async def _stream(chunks, receive, send):
+        # Body là async iterator (SSE): gửi từng phần, dừng ngay khi client ngắt kết nối
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        watcher = asyncio.ensure_future(disconnected())
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({next_chunk, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    next_chunk.cancel()
+                    await asyncio.wait({next_chunk})
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            await iterator.aclose()
+
+    async def _dispatch(self, scope, body, handler, view_args):
+        # Dựng environ như bản WSGI để request, session, ETag... hoạt động y hệt trong handler async
+        builder = WsgiToAsgiInstance(self.app)
+        builder.scope = scope
+        context = self.app.request_context(builder.build_environ(scope, io.BytesIO(body)))
+        context.push()
+        # Handler async không qua before/after_request của Flask, nên metrics được ghi ở đây
+        registry = self.app.extensions.get(metrics.EXTENSION_KEY)
+        stats = registry.start_request() if registry is not None else None
+        error = None
+        try:
+            try:
+                result = await handler(**view_args)
+            except Exception as e:
+                try:
+                    result = self.app.handle_user_exception(e)
+                except Exception as unhandled:
+                    error = unhandled
+                    result = self.app.handle_exception(unhandled)
+            response = self.app.finalize_request(result)
+            if stats is not None:
+                registry.finish_request(stats, handler.__name__, scope['method'], str(response.status_code))
+            return response
+        finally:
+            context.pop(error)
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                threads = self.app.config.get('ASGI_THREADS') or None
+                asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads, 'asgi-worker'))
+                # Các route async không qua before_request của Flask, nên runner được khởi động ở đây
+                self.app.extensions[jobs.EXTENSION_KEY].start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await run_sync(self.app.extensions[jobs.EXTENSION_KEY].stop)
+                await async_db.dispose(self.app)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run blocking service code on the thread pool, inside the caller's app and request context"""
+    return await asyncio.to_thread(func, *args, **kwargs)
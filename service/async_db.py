@@ -0,0 +1,116 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from flask import current_app, jsonify
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models import db
+from service import metrics, query_budget, replica, sqlite_profile, startup
+
+EXTENSION_KEY = 'async_db'
+
+# Driver async tương ứng với từng driver đồng bộ
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_url(url):
+    """The same database URL with the async driver of its backend"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """Async engine plus a first-come first-served gate in front of its pool.
+
+    At most `concurrency` reads run at once; the others wait in arrival order
+    for up to `timeout` seconds. Waiting on the pool itself is not fair (a new
+    request can take a connection freed just before an older waiter wakes up),
+    which under overload left some requests waiting far longer than the rest.
+    """
+
+    def __init__(self, engine, concurrency, timeout):
+        self.engine = engine
+        self.timeout = timeout
+        self._gate = asyncio.Semaphore(concurrency)
+
+    async def fetch_all(self, statement, params=None):
+        async with self._slot(), self.engine.connect() as connection:
+            result = await connection.execute(statement, params or {})
+            return result.all()
+
+    async def fetch_one(self, statement, params=None):
+        async with self._slot(), self.engine.connect() as connection:
+            result = await connection.execute(statement, params or {})
+            return result.first()
+
+    @asynccontextmanager
+    async def _slot(self):
+        try:
+            await asyncio.wait_for(self._gate.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            # Cùng loại lỗi với khi pool hết kết nối, để cùng được trả về 503
+            raise exc.TimeoutError(f"Timed out after {self.timeout}s waiting for the async database") from None
+        try:
+            yield
+        finally:
+            self._gate.release()
+
+
+def init_app(app):
+    """Attach the async database the ASGI app reads through.
+
+    The engine points at the read replica when one is configured, like
+    read_session(), and otherwise at the primary, with the primary's resolved
+    URL, pool options and SQLite PRAGMA profile. Writes keep going through
+    db.session. ASYNC_DB_CONCURRENCY (default DB_POOL_SIZE) reads run at once;
+    a request that waits longer than DB_POOL_TIMEOUT gets a 503.
+    """
+    replica_engine = app.extensions.get(replica.EXTENSION_KEY)
+    with app.app_context():
+        url = (replica_engine or db.engine).url
+
+    engine = create_async_engine(async_url(url), **(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}))
+    # Bản sao chỉ đọc (query_only) không đặt được journal_mode, chỉ áp profile cho primary
+    if replica_engine is None:
+        sqlite_profile.apply_profile(app, engine.sync_engine)
+    registry = app.extensions.get(metrics.EXTENSION_KEY)
+    if registry is not None:
+        registry.instrument_engine(engine.sync_engine, 'async', app.logger)
+    query_budget.instrument_engine(app, engine.sync_engine)
+    startup.dispose_after_fork(engine.sync_engine)
+
+    concurrency = app.config.get('ASYNC_DB_CONCURRENCY') or app.config.get('DB_POOL_SIZE') or 10
+    app.extensions[EXTENSION_KEY] = AsyncDatabase(engine, concurrency, app.config.get('DB_POOL_TIMEOUT') or 30)
+
+    @app.errorhandler(exc.TimeoutError)
+    def database_busy(error):
+        response = jsonify({"error": "Máy chủ đang quá tải, vui lòng thử lại sau"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+
+def get_database():
+    return current_app.extensions[EXTENSION_KEY]
+
+
+async def fetch_all(statement, params=None):
+    """Run a read statement on a pooled async connection and return all of its rows"""
+    return await get_database().fetch_all(statement, params)
+
+
+async def fetch_one(statement, params=None):
+    """Like fetch_all(), returning the first row or None"""
+    return await get_database().fetch_one(statement, params)
+
+
+async def dispose(app):
+    database = app.extensions.get(EXTENSION_KEY)
+    if database is not None:
+        await database.engine.dispose()
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+IMPORT_FORMATS = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+EXTENSIONS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+
+def _detect_format(mimetype, filename=None):
+    if filename:
+        for extension, import_format in EXTENSIONS.items():
+            if filename.lower().endswith(extension):
+                return import_format
+    return IMPORT_FORMATS.get(mimetype)
+
+
+def parse_rows(text, import_format):
+    """Parse an upload into a list of row dicts, raising ValueError if it is malformed"""
+    if import_format == 'json':
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e.msg}") from e
+        if not isinstance(rows, list):
+            raise ValueError("JSON upload must be an array of posts")
+        return rows
+
+    if import_format == 'ndjson':
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e.msg}") from e
+        return rows
+
+    if import_format == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+
+    raise ValueError("Unsupported import format, use JSON array, NDJSON or CSV")
+
+
+def read_post_rows(request):
+    """Read the rows of a bulk import from a request body or a 'file' upload"""
+    upload = request.files.get('file')
+    if upload is not None:
+        import_format = _detect_format(upload.mimetype, upload.filename)
+        text = upload.read().decode('utf-8-sig')
+    else:
+        import_format = _detect_format(request.mimetype)
+        text = request.get_data(as_text=True)
+
+    return parse_rows(text, import_format)
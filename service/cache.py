@@ -0,0 +1,172 @@
+import functools
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+
+EXTENSION_KEY = 'response_cache'
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache for read results, invalidated by a generation counter.
+
+    Every key embeds the generation current when the read started. Write paths
+    call invalidate(), which bumps the generation, so older entries are never
+    served again and simply age out of the LRU. The generation is per process:
+    with several gunicorn workers, the TTL bounds how stale another worker's
+    entries can get.
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        # Phân biệt generation của các lần khởi động khác nhau (dùng trong ETag)
+        self.epoch = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value) for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def init_app(app):
+    """Attach a response cache to the app unless RESPONSE_CACHE_SIZE is 0"""
+    max_size = app.config.get('RESPONSE_CACHE_SIZE', 1024)
+    if max_size > 0:
+        app.extensions[EXTENSION_KEY] = ResponseCache(max_size, app.config.get('RESPONSE_CACHE_TTL', 30))
+
+
+def get_cache():
+    """Response cache of the current app, or None when caching is disabled"""
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def invalidate():
+    """Bump the generation after a committed write to posts or orders"""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate()
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, tuple):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def cached(func):
+    """Cache a read method by its name and normalized arguments.
+
+    Arguments are bound to the signature with defaults applied, so
+    get_all_posts() and get_all_posts(limit=None) share an entry, and
+    whitespace in search text is collapsed. Coroutine functions (the async
+    reads of the ASGI app) are cached the same way, by their awaited result.
+    """
+    signature = inspect.signature(func)
+    name = func.__qualname__
+
+    def make_key(cache, args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return (cache.generation, name) + tuple(
+            (arg, _normalize(value)) for arg, value in bound.arguments.items()
+        )
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return await func(*args, **kwargs)
+
+            key = make_key(cache, args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+
+            value = await func(*args, **kwargs)
+            cache.set(key, value)
+            return value
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = get_cache()
+        if cache is None:
+            return func(*args, **kwargs)
+
+        key = make_key(cache, args, kwargs)
+        found, value = cache.get(key)
+        if found:
+            return value
+
+        value = func(*args, **kwargs)
+        cache.set(key, value)
+        return value
+
+    return wrapper
@@ -0,0 +1,50 @@
+import hashlib
+import os
+import time
+
+from flask import make_response, request
+
+from service.cache import get_cache
+
+
+def resource_etag(kind, row_id, updated_at):
+    """Strong ETag for a single row, changing whenever updated_at changes"""
+    version = updated_at.isoformat() if updated_at else 'none'
+    return f"{kind}-{row_id}-{version}"
+
+
+def feed_etag(user_id=None):
+    """Strong ETag for a list response, derived from the cache generation.
+
+    The generation is bumped by every post/order write in this process. The
+    process id and cache epoch keep tags from different workers or restarts
+    apart, and the TTL bucket bounds staleness from writes made by other
+    workers. Returns None when the response cache is disabled.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+
+    scope = repr((request.path, sorted(request.args.items(multi=True)), user_id))
+    digest = hashlib.sha1(scope.encode()).hexdigest()[:16]
+    bucket = int(time.time() // cache.ttl)
+    return f"{cache.epoch}-{os.getpid()}-{cache.generation}-{bucket}-{digest}"
+
+
+def not_modified(etag):
+    """Return a 304 response if the request's If-None-Match matches `etag`, else None.
+
+    Routes call this before loading or serializing anything, so a match skips
+    the query behind a list and every to_dict() call.
+    """
+    if etag is None or not request.if_none_match.contains(etag):
+        return None
+    return with_etag(make_response('', 304), etag)
+
+
+def with_etag(response, etag):
+    """Attach `etag` to a response and make browsers revalidate it on every fetch"""
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from datetime import datetime
+
+from flask import Response, current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, select
+
+from models import db, Event
+
+EXTENSION_KEY = 'event_hub'
+PENDING_KEY = 'events_published'
+# Số sự kiện đọc tối đa mỗi lần quét bảng events
+POLL_BATCH = 1000
+RETRY_MILLISECONDS = 3000
+
+_session_hooks_installed = False
+
+
+def publish(event_type, data):
+    """Write a listing event in the current transaction; subscribers get it after the commit. Does not commit."""
+    db.session.execute(insert(Event).values(
+        type=event_type,
+        data=json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+        created_at=datetime.utcnow(),
+    ))
+    db.session.info[PENDING_KEY] = True
+
+
+def prune(older_than):
+    """Delete events written before `older_than`, always keeping the newest one; returns how many. Does not commit."""
+    newest = select(func.max(Event.id)).scalar_subquery()
+    return db.session.execute(
+        delete(Event).where(Event.created_at < older_than, Event.id < newest)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _frame(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n".encode()
+
+
+class _LoopSignal:
+    """Wakes every async subscriber of one event loop; fire() must run on that loop"""
+
+    def __init__(self):
+        self.event = asyncio.Event()
+
+    def fire(self):
+        fired, self.event = self.event, asyncio.Event()
+        fired.set()
+
+
+class EventHub:
+    """Per-process fan-out of listing events to stream subscribers.
+
+    A poller thread tails the events table, which every process writes to,
+    so subscribers of each server worker see the events of all of them;
+    commits in this process wake it at once, others are seen within
+    SSE_POLL_INTERVAL seconds. The newest SSE_BUFFER_SIZE events are kept as
+    ready-made SSE frames in a ring buffer shared by all subscribers, which
+    is what a reconnecting client resumes from (Last-Event-ID). A client that
+    fell behind the buffer gets a `reset` event and reloads the feed.
+    """
+
+    def __init__(self, app, buffer_size, poll_interval):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._buffer = deque(maxlen=buffer_size)
+        # Id nhỏ nhất mà client còn tiếp tục được từ bộ đệm (mọi sự kiện sau nó đều còn trong bộ đệm)
+        self._floor = None
+        self._last_id = 0
+        self._changed = threading.Condition()
+        self._signals = {}
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.subscribers = 0
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            with self.app.app_context():
+                self._load()
+            self._thread = threading.Thread(target=self._poll_forever, name='event-hub', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def subscribe(self, last_event_id=None):
+        """A new subscription, resuming after `last_event_id` when given, else starting from now"""
+        self.start()
+        return Subscription(self, last_event_id)
+
+    def _load(self):
+        # Nạp các sự kiện mới nhất vào bộ đệm, để client kết nối lại sau khi worker khởi động lại vẫn tiếp tục được
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(Event.id, Event.type, Event.data).order_by(Event.id.desc()).limit(self._buffer.maxlen)
+            ).all()
+        with self._changed:
+            self._buffer.extend((event_id, _frame(event_id, event_type, data))
+                                for event_id, event_type, data in reversed(rows))
+            if rows:
+                self._last_id = rows[0].id
+                self._floor = self._buffer[0][0] - 1
+
+    def _poll_forever(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context(), db.engine.connect() as connection:
+                    rows = connection.execute(
+                        select(Event.id, Event.type, Event.data)
+                        .where(Event.id > self._last_id).order_by(Event.id).limit(POLL_BATCH)
+                    ).all()
+            except Exception as e:
+                self.app.logger.warning("Reading events failed: %s", e)
+                continue
+            if rows:
+                self._append(rows)
+            if len(rows) == POLL_BATCH:
+                self._wake.set()
+
+    def _append(self, rows):
+        with self._changed:
+            self._buffer.extend((event_id, _frame(event_id, event_type, data)) for event_id, event_type, data in rows)
+            self._last_id = rows[-1].id
+            if self._floor is None or len(self._buffer) == self._buffer.maxlen:
+                self._floor = self._buffer[0][0] - 1
+            self._changed.notify_all()
+            signals = list(self._signals.items())
+
+        for loop, signal in signals:
+            try:
+                loop.call_soon_threadsafe(signal.fire)
+            except RuntimeError:
+                # Event loop đã đóng (worker ASGI đã tắt)
+                with self._changed:
+                    self._signals.pop(loop, None)
+
+    def _signal(self, loop):
+        with self._changed:
+            if loop not in self._signals:
+                self._signals[loop] = _LoopSignal()
+            return self._signals[loop]
+
+    def _take(self, subscription):
+        """Frames after the subscription's last id (or a reset frame), advancing it; call with the lock held"""
+        last_id = subscription.last_id
+        if last_id >= self._last_id:
+            return b''
+        if self._floor is None or last_id < self._floor:
+            subscription.last_id = self._last_id
+            return _frame(self._last_id, 'reset', '{}')
+
+        frames = []
+        for event_id, frame in reversed(self._buffer):
+            if event_id <= last_id:
+                break
+            frames.append(frame)
+        subscription.last_id = self._last_id
+        return b''.join(reversed(frames))
+
+
+class Subscription:
+    """One stream client's position in the hub; wait() for sync servers, wait_async() on an event loop"""
+
+    def __init__(self, hub, last_event_id=None):
+        self.hub = hub
+        self.last_id = hub._last_id if last_event_id is None else last_event_id
+
+    def __enter__(self):
+        # Chỉ đếm khi body thực sự được gửi (HEAD không bao giờ chạy generator)
+        with self.hub._changed:
+            self.hub.subscribers += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.hub._changed:
+            self.hub.subscribers -= 1
+
+    def wait(self, timeout):
+        """Block until there are new events or `timeout` seconds passed; returns their frames, or b''"""
+        with self.hub._changed:
+            data = self.hub._take(self)
+            if not data:
+                self.hub._changed.wait(timeout)
+                data = self.hub._take(self)
+            return data
+
+    async def wait_async(self, timeout):
+        """Like wait(), without blocking the event loop"""
+        signal = self.hub._signal(asyncio.get_running_loop())
+        fired = signal.event
+        with self.hub._changed:
+            data = self.hub._take(self)
+        if data:
+            return data
+        try:
+            await asyncio.wait_for(fired.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.hub._changed:
+            return self.hub._take(self)
+
+
+def sse_response(body):
+    """Streaming text/event-stream response for stream() or stream_async()"""
+    # X-Accel-Buffering: nginx chuyển tiếp từng sự kiện ngay thay vì gom lại
+    return Response(body, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def parse_last_event_id(value):
+    """The Last-Event-ID a client resumes from, or None to start from now"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def stream(subscription, heartbeat):
+    """SSE body for a sync server: one worker thread is held per open stream"""
+    with subscription:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        while True:
+            # Dòng chú thích giữ kết nối qua proxy và phát hiện client đã ngắt
+            yield subscription.wait(heartbeat) or b': keep-alive\n\n'
+
+
+async def stream_async(subscription, heartbeat):
+    """SSE body for the ASGI server: an open stream costs no thread"""
+    with subscription:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        while True:
+            yield await subscription.wait_async(heartbeat) or b': keep-alive\n\n'
+
+
+def init_app(app):
+    """Attach the listing event hub; it starts with the first stream subscriber"""
+    global _session_hooks_installed
+
+    app.extensions[EXTENSION_KEY] = EventHub(app, app.config.get('SSE_BUFFER_SIZE') or 1000,
+                                             app.config.get('SSE_POLL_INTERVAL') or 0.5)
+
+    if not _session_hooks_installed:
+        event.listen(db.session, 'after_commit', _wake_hub)
+        event.listen(db.session, 'after_rollback', _discard_pending)
+        _session_hooks_installed = True
+
+
+def get_hub():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _wake_hub(session):
+    if session.info.pop(PENDING_KEY, False):
+        hub = get_hub()
+        if hub is not None:
+            hub.wake()
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Số dòng được gom lại trước khi gửi một chunk cho client
+CHUNK_ROWS = 500
+
+
+def _ndjson_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = None
+    pending = 0
+    for row in rows:
+        if writer is None:
+            # Tiêu đề lấy theo thứ tự khóa của to_dict()
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(rows, export_format, name):
+    """Stream an iterable of row dicts as NDJSON or CSV.
+
+    Rows are pulled lazily while the response is being sent, so memory stays
+    flat however many rows the iterable yields.
+    """
+    chunks = _csv_chunks(rows) if export_format == 'csv' else _ndjson_chunks(rows)
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{export_format}'
+    return response
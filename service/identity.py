@@ -0,0 +1,88 @@
+from flask import current_app, g, session
+from flask_jwt_extended import get_jwt_identity
+
+from models import db, User
+from service.cache import ResponseCache
+
+EXTENSION_KEY = 'identity_cache'
+
+
+class Principal:
+    """The authenticated user of a request, built from a cached user row"""
+    __slots__ = ('_profile',)
+
+    def __init__(self, profile):
+        self._profile = profile
+
+    @property
+    def id(self):
+        return self._profile['id']
+
+    @property
+    def username(self):
+        return self._profile['username']
+
+    @property
+    def email(self):
+        return self._profile['email']
+
+    @property
+    def is_admin(self):
+        return bool(self._profile['is_admin'])
+
+    def to_dict(self):
+        return dict(self._profile)
+
+
+def init_app(app):
+    """Attach the process-wide user LRU, keyed by user id"""
+    app.extensions[EXTENSION_KEY] = ResponseCache(
+        app.config.get('IDENTITY_CACHE_SIZE', 4096),
+        app.config.get('IDENTITY_CACHE_TTL', 60)
+    )
+
+
+def load_principal(user_id):
+    """Principal for a user id, read from the LRU or from the database; None if the user is gone or disabled"""
+    cache = current_app.extensions[EXTENSION_KEY]
+    found, principal = cache.get(user_id)
+    if found:
+        return principal
+
+    user = db.session.get(User, user_id)
+    if not user or not user.is_active:
+        # Không cache kết quả rỗng: SQLite có thể cấp lại id này cho người dùng mới
+        return None
+
+    principal = Principal(user.to_dict())
+    cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_user(user_id):
+    """Drop a user from the LRU after it was updated or deleted"""
+    current_app.extensions[EXTENSION_KEY].discard(int(user_id))
+
+
+def _request_user_id():
+    # Route có @jwt_required() dùng identity trong token, các route còn lại dùng session
+    try:
+        user_id = get_jwt_identity()
+    except RuntimeError:
+        user_id = None
+
+    if user_id is None:
+        user_id = session.get('user_id')
+
+    try:
+        return int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def current_principal():
+    """Principal of the current request, resolved at most once per request"""
+    if 'principal' not in g:
+        user_id = _request_user_id()
+        g.principal = load_principal(user_id) if user_id is not None else None
+    return g.principal
@@ -0,0 +1,404 @@
+import json
+import multiprocessing
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, event, or_, select, update
+
+from models import db, Job
+from service.pagination import keyset_page
+from service.upsert import upsert_insert
+
+EXTENSION_KEY = 'jobs'
+PENDING_KEY = 'jobs_enqueued'
+WORKER_MODES = ('thread', 'process')
+STATUSES = ('pending', 'running', 'done', 'failed')
+
+_handlers = {}
+_schedules = {}
+_session_hooks_installed = False
+# App của tiến trình con khi JOB_WORKER_MODE = 'process'
+_process_app = None
+
+
+class JobError(Exception):
+    """Raised by a handler to fail its job (it is retried until max_attempts)"""
+
+
+def job(name, schedule=None):
+    """Register the decorated function as the handler of jobs called `name`.
+
+    The handler gets the job's payload as keyword arguments and runs inside
+    an app context. It must be safe to run again: a job is retried when its
+    handler raises, and run again when its worker dies mid-way. With
+    `schedule`, a function from the current UTC time to the next run time,
+    it is also a periodic job that the runner keeps queued.
+    """
+    def decorator(func):
+        _handlers[name] = func
+        if schedule is not None:
+            _schedules[name] = schedule
+        return func
+    return decorator
+
+
+def next_daily(now, hour, minute=0):
+    """The next time of day hour:minute (UTC) after `now`"""
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return run_at if run_at > now else run_at + timedelta(days=1)
+
+
+def retry_delay(attempt, base, cap):
+    """Seconds before retrying after the given failed attempt: exponential, capped, with jitter"""
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def enqueue(name, payload=None, run_at=None, unique_key=None, max_attempts=None):
+    """Queue a job in the current transaction; it becomes visible to workers when the caller commits.
+
+    Returns the job id, or None when `unique_key` is given and a pending or
+    running job already has it. Does not commit.
+    """
+    if name not in _handlers:
+        raise ValueError(f"Unknown job: {name}")
+
+    stmt = upsert_insert(Job).values(
+        name=name,
+        payload=json.dumps(payload or {}),
+        unique_key=unique_key,
+        status='pending',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS') or 5,
+        run_at=run_at or datetime.utcnow(),
+    ).on_conflict_do_nothing().returning(Job.id)
+    job_id = db.session.execute(stmt).scalar()
+    if job_id is not None:
+        db.session.info[PENDING_KEY] = True
+    return job_id
+
+
+def schedule_periodic(names=None):
+    """Queue the next run of each periodic job that is not queued yet. Does not commit."""
+    now = datetime.utcnow()
+    for name in names or list(_schedules):
+        enqueue(name, run_at=_schedules[name](now), unique_key=name)
+
+
+def claim(limit, lease):
+    """Mark up to `limit` due jobs as running and return their ids.
+
+    A job is due when it is pending and its run_at has passed, or when it has
+    been running for longer than `lease` seconds (its worker is presumed
+    dead). The conditional UPDATE makes each job go to one worker only, also
+    across processes. Commits.
+    """
+    now = datetime.utcnow()
+    due = or_(
+        and_(Job.status == 'pending', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_at < now - timedelta(seconds=lease)),
+    )
+    candidates = (
+        select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(limit)
+        # Trên PostgreSQL các worker bỏ qua dòng đang bị khóa thay vì chờ nhau; SQLite bỏ qua mệnh đề này
+        .with_for_update(skip_locked=True)
+    )
+    try:
+        job_ids = db.session.scalars(
+            update(Job)
+            .where(Job.id.in_(candidates), due)
+            .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+            .returning(Job.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return job_ids
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def run_job(job_id):
+    """Run a claimed job and record its outcome; returns the new status, or None if it was not running"""
+    row = db.session.execute(
+        select(Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        .where(Job.id == job_id, Job.status == 'running')
+    ).first()
+    if row is None:
+        return None
+
+    config = current_app.config
+    try:
+        if row.name not in _handlers:
+            raise JobError(f"No handler registered for {row.name}")
+        _handlers[row.name](**json.loads(row.payload))
+        outcome = {'status': 'done', 'last_error': None}
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning("Job %s (%s) failed on attempt %s: %s", job_id, row.name, row.attempts, e)
+        outcome = {'status': 'failed', 'last_error': f"{type(e).__name__}: {e}"}
+        # Job không có handler thì chạy lại cũng không thành công
+        if row.attempts < row.max_attempts and row.name in _handlers:
+            delay = retry_delay(row.attempts, config.get('JOB_RETRY_DELAY') or 1, config.get('JOB_RETRY_MAX_DELAY') or 3600)
+            outcome.update(status='pending', run_at=datetime.utcnow() + timedelta(seconds=delay))
+
+    try:
+        # attempts đổi nghĩa là job đã bị worker khác nhận lại sau khi hết lease: kết quả của lần chạy này bị bỏ
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'running', Job.attempts == row.attempts)
+            .values(locked_at=None, **outcome)
+            .execution_options(synchronize_session=False)
+        )
+        if outcome['status'] != 'pending' and row.name in _schedules:
+            schedule_periodic([row.name])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return outcome['status']
+
+
+def run_due(lease=None):
+    """Claim and run due jobs one by one in the current context until none is left; returns how many ran"""
+    lease = lease or current_app.config.get('JOB_LEASE_SECONDS') or 900
+    count = 0
+    while True:
+        job_ids = claim(1, lease)
+        if not job_ids:
+            return count
+        run_job(job_ids[0])
+        count += 1
+
+
+def prune(older_than):
+    """Delete jobs that finished successfully before `older_than`; returns how many. Does not commit."""
+    return db.session.execute(
+        delete(Job).where(Job.status == 'done', Job.updated_at < older_than)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def get_jobs(status=None, limit=None, cursor=None):
+    """Jobs newest first, optionally of one status (admin function)"""
+    query = Job.query
+    if status:
+        query = query.filter(Job.status == status)
+    if limit is None:
+        return [job.to_dict() for job in query.order_by(Job.created_at.desc(), Job.id.desc())]
+
+    jobs, next_cursor = keyset_page(query, Job, limit, cursor)
+    return [job.to_dict() for job in jobs], next_cursor
+
+
+class JobRunner:
+    """Runs due jobs from the jobs table on a pool of JOB_WORKERS workers.
+
+    A dispatcher thread claims as many due jobs as there are idle workers and
+    hands their ids to a thread pool or, with JOB_WORKER_MODE = 'process', to
+    a process pool whose workers each build their own app. It polls every
+    JOB_POLL_INTERVAL seconds, and is woken as soon as a commit in this
+    process queues a job or a worker becomes idle. Several processes (the
+    workers of a server, `flask run-jobs`) can run against one database:
+    claim() hands each job to one of them.
+    """
+
+    def __init__(self, app, workers, mode, poll_interval, lease):
+        self.app = app
+        self.workers = workers
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._busy = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None or self.workers <= 0:
+                return
+            self._executor = self._make_executor()
+            self._thread = threading.Thread(target=self._dispatch_forever, name='job-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop claiming jobs; with `wait`, return once the running ones are done"""
+        self._stopped.set()
+        self._wake.set()
+        with self._idle:
+            self._idle.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def join(self):
+        """Block until the runner is stopped"""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(1)
+
+    def wake(self):
+        self._wake.set()
+
+    def _make_executor(self):
+        if self.mode == 'process':
+            config = dict(self.app.config, JOB_WORKERS=0)
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_process, initargs=(config,))
+        return ThreadPoolExecutor(self.workers, thread_name_prefix='job-worker')
+
+    def _dispatch_forever(self):
+        with self.app.app_context():
+            try:
+                schedule_periodic()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning("Scheduling periodic jobs failed: %s", e)
+
+        while not self._stopped.is_set():
+            with self._idle:
+                while self._busy >= self.workers and not self._stopped.is_set():
+                    self._idle.wait()
+                free = self.workers - self._busy
+
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    job_ids = claim(free, self.lease)
+            except Exception as e:
+                self.app.logger.warning("Claiming jobs failed: %s", e)
+                job_ids = []
+
+            for job_id in job_ids:
+                self._submit(job_id)
+            if len(job_ids) < free:
+                self._wake.wait(self.poll_interval)
+
+    def _submit(self, job_id):
+        with self._idle:
+            self._busy += 1
+        try:
+            if self.mode == 'process':
+                future = self._executor.submit(_run_in_process, job_id)
+            else:
+                future = self._executor.submit(self._run_in_thread, job_id)
+        except RuntimeError:
+            # Executor đã tắt (tiến trình đang thoát); job sẽ được nhận lại khi hết lease
+            self._release()
+            return
+        future.add_done_callback(self._finished)
+
+    def _run_in_thread(self, job_id):
+        with self.app.app_context():
+            return run_job(job_id)
+
+    def _finished(self, future):
+        error = future.exception()
+        if error is not None:
+            self.app.logger.warning("Job worker failed: %s", error)
+            if isinstance(error, BrokenProcessPool) and not self._stopped.is_set():
+                # Một tiến trình con chết làm hỏng cả pool: tạo pool mới, job đang chạy được nhận lại khi hết lease
+                with self._lock:
+                    if self._executor._broken:
+                        self._executor = self._make_executor()
+        self._release()
+
+    def _release(self):
+        with self._idle:
+            self._busy -= 1
+            self._idle.notify()
+        self._wake.set()
+
+
+def _init_process(config):
+    global _process_app
+    # Import muộn: tiến trình con dựng app riêng (nạp mọi service, tức là mọi handler) từ cấu hình của cha
+    from app import create_app
+    _process_app = create_app(type('JobProcessConfig', (), config))
+
+
+def _run_in_process(job_id):
+    with _process_app.app_context():
+        return run_job(job_id)
+
+
+def init_app(app):
+    """Attach the background job runner.
+
+    The runner starts with the first request a process serves (or from
+    `flask run-jobs`), so CLI commands and migrations never run jobs.
+    JOB_WORKERS = 0 leaves jobs queued for a dedicated `flask run-jobs`.
+    """
+    global _session_hooks_installed
+
+    mode = app.config.get('JOB_WORKER_MODE') or 'thread'
+    if mode not in WORKER_MODES:
+        raise ValueError(f"Unknown job worker mode: {mode}")
+
+    runner = JobRunner(app, app.config.get('JOB_WORKERS') or 0, mode,
+                       app.config.get('JOB_POLL_INTERVAL') or 1, app.config.get('JOB_LEASE_SECONDS') or 900)
+    app.extensions[EXTENSION_KEY] = runner
+
+    if not _session_hooks_installed:
+        event.listen(db.session, 'after_commit', _wake_runner)
+        event.listen(db.session, 'after_rollback', _discard_pending)
+        _session_hooks_installed = True
+
+    app.cli.add_command(run_jobs_command)
+
+    if runner.workers > 0:
+        @app.before_request
+        def start_job_runner():
+            if not runner.started:
+                runner.start()
+
+
+def get_runner():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _wake_runner(session):
+    if session.info.pop(PENDING_KEY, False):
+        runner = get_runner()
+        if runner is not None:
+            runner.wake()
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+@click.command('run-jobs')
+@click.option('--once', is_flag=True, help="Run the jobs that are due now, then exit.")
+@with_appcontext
+def run_jobs_command(once):
+    """Run background jobs in the foreground, as a dedicated worker process."""
+    if once:
+        click.echo(f"Ran {run_due()} jobs")
+        return
+
+    runner = current_app.extensions[EXTENSION_KEY]
+    if runner.workers <= 0:
+        raise click.ClickException("JOB_WORKERS must be greater than 0")
+    runner.start()
+    click.echo(f"Running jobs on {runner.workers} {runner.mode} workers, press Ctrl+C to stop")
+    try:
+        runner.join()
+    except KeyboardInterrupt:
+        runner.stop()
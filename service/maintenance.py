@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+from service import events, jobs
+from service.analytics_service import AnalyticsService
+from service.stats_service import StatsService
+
+
+def _nightly_run_at(now):
+    return jobs.next_daily(now, current_app.config.get('MAINTENANCE_HOUR') or 0)
+
+
+class MaintenanceService:
+    @staticmethod
+    def run_nightly():
+        """Rebuild the rollups, prune finished jobs and old events, then ANALYZE and VACUUM the database.
+
+        Returns a dict of what was done, or (None, error) when a step fails.
+        """
+        config = current_app.config
+        try:
+            # Sửa mọi sai lệch tích lũy của các bảng tổng hợp được cập nhật dần theo từng thao tác
+            users, error = StatsService.rebuild()
+            if error:
+                return None, error
+            rollup_rows, error = AnalyticsService.rebuild()
+            if error:
+                return None, error
+
+            pruned = jobs.prune(datetime.utcnow() - timedelta(days=config.get('JOB_RETENTION_DAYS') or 7))
+            events_pruned = events.prune(datetime.utcnow() - timedelta(hours=config.get('SSE_EVENT_RETENTION_HOURS') or 24))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+
+        # VACUUM không chạy được trong một transaction, nên dùng kết nối riêng ở chế độ autocommit
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text('ANALYZE'))
+            if config.get('MAINTENANCE_VACUUM'):
+                connection.execute(text('VACUUM'))
+
+        return {'user_stats': users, 'analytics_rows': rollup_rows, 'jobs_pruned': pruned,
+                'events_pruned': events_pruned}, None
+
+
+@jobs.job('nightly_maintenance', schedule=_nightly_run_at)
+def nightly_maintenance_job():
+    _, error = MaintenanceService.run_nightly()
+    if error:
+        raise jobs.JobError(error)
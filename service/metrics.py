@@ -0,0 +1,369 @@
+import contextvars
+import hmac
+import itertools
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from flask import Response, current_app, jsonify, request
+from sqlalchemy import event, func, select
+
+from models import db, Job
+from service import cache, events, identity, replica
+
+EXTENSION_KEY = 'metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Giây; đủ mịn ở vùng 1-100 ms, nơi phần lớn request rơi vào
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_LABELS = ('endpoint', 'method', 'status')
+# Số request ghi tạm trước khi được cộng dồn vào histogram (và mỗi lần /metrics được đọc)
+FLUSH_EVERY = 1000
+# Câu lệnh chậm được ghi log cắt ngắn, không kèm tham số (có thể chứa mật khẩu)
+MAX_LOGGED_STATEMENT = 500
+
+# Số câu lệnh và thời gian DB của request đang chạy (luồng hoặc task async hiện tại)
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'statements', 'db_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+class _MeteredRequest(RequestStats):
+    """A WSGI request being measured: its start_response and its response body.
+
+    The request is recorded when the server closes the body rather than when
+    the status is sent, so the duration and the SQL counts include a streamed
+    body (exports read with yield_per) that runs its queries while the server
+    iterates it.
+    """
+
+    __slots__ = ('metrics', 'environ', 'start_response', 'weight', 'endpoint', 'status', 'body')
+
+    def __init__(self, metrics, environ, start_response, weight):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.metrics = metrics
+        self.environ = environ
+        self.start_response = start_response
+        self.weight = weight
+        self.endpoint = None
+        self.status = '500'
+        self.body = ()
+
+    def __call__(self, status, headers, exc_info=None):
+        # Đối tượng này được truyền cho app thay cho start_response, khỏi dựng closure mỗi request.
+        # Flask gọi start_response khi request context còn mở; tới close() nó đã xóa request khỏi environ
+        rule = self.environ['werkzeug.request'].url_rule
+        self.endpoint = rule and rule.endpoint
+        self.status = status
+        return self.start_response(status, headers, exc_info)
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            # Body của Flask luôn có close() (ClosingIterator chạy teardown của request)
+            self.body.close()
+        finally:
+            self.metrics.finish_request(self, self.endpoint, self.environ['REQUEST_METHOD'], self.status[:3],
+                                        self.weight)
+
+
+class _RequestSeries:
+    """Duration histogram plus SQL statement and time totals of one endpoint, method and status"""
+
+    __slots__ = ('duration', 'duration_sum', 'statements', 'db_seconds')
+
+    def __init__(self):
+        self.duration = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+class _EngineTotals:
+    __slots__ = ('statements', 'seconds', 'slow')
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.slow = 0
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _metric(name, documentation, samples, kind='gauge'):
+    """Render a metric from (labels dict, value) pairs"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        lines.append(f'{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}')
+    return lines
+
+
+def _histogram(name, documentation, label_names, buckets, series):
+    """Render a histogram from (label values, bucket counts, sum) triples; counts are per bucket, not cumulative"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} histogram']
+    for labels, counts, total in series:
+        cumulative = 0
+        for bound, count in zip(buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(label_names + ("le",), labels + (bound,))} {cumulative}')
+        label_text = _format_labels(label_names, labels)
+        lines.append(f'{name}_sum{label_text} {_format_value(total)}')
+        lines.append(f'{name}_count{label_text} {cumulative}')
+    return lines
+
+
+def _summary(name, documentation, label_names, series):
+    """Render a summary without quantiles from (label values, sum, count) triples"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} summary']
+    for labels, total, count in series:
+        label_text = _format_labels(label_names, labels)
+        lines.append(f'{name}_sum{label_text} {_format_value(total)}')
+        lines.append(f'{name}_count{label_text} {count}')
+    return lines
+
+
+class Metrics:
+    """Request, SQL, cache and pool metrics of one process, in the Prometheus text format.
+
+    Every request records its duration, and how many SQL statements it ran
+    and for how long, by endpoint, method and status. Statements are counted
+    by engine events into a context variable, so this also works for async
+    handlers and the thread pool they call into. Statements slower than
+    SLOW_QUERY_MS are logged. Cache, pool, job and stream figures are read
+    when /metrics is scraped. Values are per process: with several server
+    workers each one reports its own.
+    """
+
+    def __init__(self, slow_query_seconds):
+        self.slow_query_seconds = slow_query_seconds
+        self.engines = {}
+        self._requests = {}
+        self._pending = deque()
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def instrument_engine(self, engine, name, logger):
+        """Count and time every statement run on `engine` (a sync engine, or the sync_engine of an async one)"""
+        self.engines[name] = engine
+        totals = self._totals[name] = _EngineTotals()
+
+        def record(statement, elapsed):
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.statements += 1
+                stats.db_seconds += elapsed
+            slow = self.slow_query_seconds and elapsed >= self.slow_query_seconds
+            with self._lock:
+                totals.statements += 1
+                totals.seconds += elapsed
+                if slow:
+                    totals.slow += 1
+            if slow:
+                logger.warning("Slow query on %s (%.1f ms): %s", name, elapsed * 1000,
+                               ' '.join(statement.split())[:MAX_LOGGED_STATEMENT])
+
+        # Sự kiện của dialect thay cho before/after_cursor_execute: sự kiện của engine buộc mỗi
+        # Connection dựng bộ dispatch riêng và kiểm tra sự kiện ở mọi begin/commit, tốn gấp nhiều lần
+        @event.listens_for(engine, 'do_execute')
+        def timed_execute(cursor, statement, parameters, context):
+            started = time.perf_counter()
+            try:
+                context.dialect.do_execute(cursor, statement, parameters, context)
+            finally:
+                record(statement, time.perf_counter() - started)
+            return True
+
+        @event.listens_for(engine, 'do_execute_no_params')
+        def timed_execute_no_params(cursor, statement, context):
+            started = time.perf_counter()
+            try:
+                context.dialect.do_execute_no_params(cursor, statement, context)
+            finally:
+                record(statement, time.perf_counter() - started)
+            return True
+
+        @event.listens_for(engine, 'do_executemany')
+        def timed_executemany(cursor, statement, parameters, context):
+            started = time.perf_counter()
+            try:
+                context.dialect.do_executemany(cursor, statement, parameters, context)
+            finally:
+                record(statement, time.perf_counter() - started)
+            return True
+
+    def start_request(self):
+        stats = RequestStats()
+        _request_stats.set(stats)
+        return stats
+
+    def finish_request(self, stats, endpoint, method, status, weight=1):
+        """Record a finished request; `weight` is how many requests it stands for when sampling"""
+        # Chỉ ghi tạm (deque.append an toàn giữa các luồng, không cần khóa); cộng dồn theo lô ở _flush()
+        self._pending.append(((endpoint or 'none', method, status), time.perf_counter() - stats.started,
+                              stats.statements, stats.db_seconds, weight))
+        if len(self._pending) >= FLUSH_EVERY:
+            self._flush()
+
+    def _flush(self):
+        pending = self._pending
+        requests = self._requests
+        # Tên cục bộ: vòng lặp chạy một lần cho mỗi request
+        popleft, find, buckets = pending.popleft, requests.get, DURATION_BUCKETS
+        with self._lock:
+            for _ in range(len(pending)):
+                key, duration, statements, db_seconds, weight = popleft()
+                series = find(key)
+                if series is None:
+                    series = requests[key] = _RequestSeries()
+                series.duration[bisect_left(buckets, duration)] += weight
+                series.duration_sum += duration * weight
+                series.statements += statements * weight
+                series.db_seconds += db_seconds * weight
+
+    def render(self, app):
+        self._flush()
+        with self._lock:
+            requests = sorted((labels, series.duration[:], series.duration_sum, series.statements, series.db_seconds)
+                              for labels, series in self._requests.items())
+            totals = [({'engine': name}, (t.statements, t.seconds, t.slow)) for name, t in self._totals.items()]
+
+        lines = _histogram('http_request_duration_seconds', 'Time spent handling a request.', REQUEST_LABELS,
+                           DURATION_BUCKETS, [(row[0], row[1], row[2]) for row in requests])
+        # Tổng theo endpoint; chia cho http_request_duration_seconds_count ra trung bình mỗi request
+        lines += _summary('http_request_db_statements', 'SQL statements run by requests.', REQUEST_LABELS,
+                          [(row[0], row[3], sum(row[1])) for row in requests])
+        lines += _summary('http_request_db_seconds', 'Time requests spent in SQL statements.', REQUEST_LABELS,
+                          [(row[0], row[4], sum(row[1])) for row in requests])
+        lines += _metric('db_statements_total', 'SQL statements run.',
+                         [(labels, values[0]) for labels, values in totals], kind='counter')
+        lines += _metric('db_statement_seconds_total', 'Time spent in SQL statements.',
+                         [(labels, values[1]) for labels, values in totals], kind='counter')
+        lines += _metric('db_slow_statements_total', 'SQL statements slower than SLOW_QUERY_MS.',
+                         [(labels, values[2]) for labels, values in totals], kind='counter')
+        lines += self._cache_metrics(app)
+        lines += self._pool_metrics()
+        lines += self._runtime_metrics(app)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _cache_metrics(app):
+        caches = [('response', app.extensions.get(cache.EXTENSION_KEY)),
+                  ('identity', app.extensions.get(identity.EXTENSION_KEY))]
+        stats = [({'cache': name}, instance.stats()) for name, instance in caches if instance is not None]
+        lines = _metric('cache_entries', 'Entries held by an in-process cache.',
+                        [(labels, values['size']) for labels, values in stats])
+        lines += _metric('cache_max_entries', 'Capacity of an in-process cache.',
+                         [(labels, values['max_size']) for labels, values in stats])
+        for key, documentation in (('hits', 'Cache lookups that found a fresh entry.'),
+                                   ('misses', 'Cache lookups that found nothing or an expired entry.'),
+                                   ('evictions', 'Entries dropped to stay within capacity.'),
+                                   ('expirations', 'Entries dropped after their TTL.')):
+            lines += _metric(f'cache_{key}_total', documentation,
+                             [(labels, values[key]) for labels, values in stats], kind='counter')
+        return lines
+
+    def _pool_metrics(self):
+        pools = [(name, engine.pool) for name, engine in self.engines.items() if hasattr(engine.pool, 'checkedout')]
+        lines = _metric('db_pool_size', 'Connections the pool keeps open.',
+                        [({'engine': name}, pool.size()) for name, pool in pools])
+        lines += _metric('db_pool_checked_out', 'Connections in use.',
+                         [({'engine': name}, pool.checkedout()) for name, pool in pools])
+        lines += _metric('db_pool_idle', 'Open connections waiting in the pool.',
+                         [({'engine': name}, pool.checkedin()) for name, pool in pools])
+        lines += _metric('db_pool_overflow', 'Connections opened beyond the pool size (negative while below it).',
+                         [({'engine': name}, pool.overflow()) for name, pool in pools])
+        return lines
+
+    @staticmethod
+    def _runtime_metrics(app):
+        counts = dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+        lines = _metric('jobs', 'Background jobs by status.',
+                        [({'status': status}, counts.get(status, 0)) for status in ('pending', 'running', 'failed')])
+        hub = app.extensions.get(events.EXTENSION_KEY)
+        if hub is not None:
+            lines += _metric('event_stream_subscribers', 'Open /api/posts/stream connections.', [({}, hub.subscribers)])
+        return lines
+
+
+def init_app(app):
+    """Instrument requests and the database engines, and serve /metrics.
+
+    With METRICS_SAMPLE_EVERY = N above 1, one WSGI request in N is recorded
+    and counts N times in the request histograms and SQL summaries; the
+    per-engine statement totals still count every statement.
+
+    /metrics exposes traffic, SQL timings, pool state and job failures, so it
+    answers only a logged-in admin, or a scraper sending METRICS_TOKEN as
+    `Authorization: Bearer <token>` (bearer_token in a Prometheus scrape
+    config). Must run in an app context, after the replica engine (if any)
+    is attached. Does nothing when METRICS_ENABLED is off.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    metrics = Metrics((app.config.get('SLOW_QUERY_MS') or 0) / 1000)
+    app.extensions[EXTENSION_KEY] = metrics
+    metrics.instrument_engine(db.engine, 'primary', app.logger)
+    replica_engine = app.extensions.get(replica.EXTENSION_KEY)
+    if replica_engine is not None:
+        metrics.instrument_engine(replica_engine, 'replica', app.logger)
+
+    # Middleware WSGI thay cho before/after_request: hook và proxy của Flask tốn vài µs mỗi request.
+    # Ghi mọi request tốn khoảng +2.5% với request trúng cache (~7 µs trên ~290 µs); ghi 1 trên
+    # METRICS_SAMPLE_EVERY request đưa mức đó xuống dưới 2% (benchmarks/metrics_overhead.py)
+    wsgi_app = app.wsgi_app
+    set_stats = _request_stats.set
+    sample_every = max(int(app.config.get('METRICS_SAMPLE_EVERY') or 1), 1)
+    requests = itertools.count()
+
+    def wsgi_app_with_metrics(environ, start_response):
+        if next(requests) % sample_every:
+            # Không ghi request này; câu lệnh của nó vẫn được tính vào tổng theo engine
+            set_stats(None)
+            return wsgi_app(environ, start_response)
+        request = _MeteredRequest(metrics, environ, start_response, sample_every)
+        set_stats(request)
+        request.body = wsgi_app(environ, request)
+        return request
+
+    app.wsgi_app = wsgi_app_with_metrics
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        if not _may_read_metrics(app.config.get('METRICS_TOKEN')):
+            return jsonify({"error": "Admin access or the metrics token is required"}), 403
+        return Response(metrics.render(app), content_type=CONTENT_TYPE)
+
+
+def _may_read_metrics(token):
+    """Whether the request carries METRICS_TOKEN as a bearer token, or comes from a logged-in admin"""
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode()):
+        return True
+    principal = identity.current_principal()
+    return principal is not None and principal.is_admin
+
+
+def get_metrics(app=None):
+    return (app or current_app).extensions.get(EXTENSION_KEY)
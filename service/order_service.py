@@ -1,69 +1,198 @@
 from models import db, Order, Post, User
+from sqlalchemy import update
+from service import cache, events, price_index, search_index, suggest_index
+from service.analytics_service import AnalyticsService
+from service.pagination import keyset_page
+from service.query_budget import query_budget
+from service.replica import read_query
+from service.serialization import ORDER_FIELDS
+from service.stats_service import StatsService
 
 
 class OrderService:
+    @staticmethod
+    def _take_stock(post_id, buyer_id, quantity):
+        """Decrement a post's stock with one conditional UPDATE.
+
+        Returns an unsaved Order on success, or None if the post is missing,
+        inactive, owned by the buyer or short of stock. The post is deactivated
+        in the same statement when it sells out.
+        """
+        # Trừ số lượng và tắt bài đăng khi hết hàng trong cùng một câu lệnh
+        taken = db.session.execute(
+            update(Post)
+            .where(
+                Post.id == post_id,
+                Post.user_id != buyer_id,
+                Post.is_active == True,
+                Post.quantity >= quantity
+            )
+            .values(quantity=Post.quantity - quantity, is_active=Post.quantity > quantity)
+            .returning(Post.user_id, Post.price, Post.quantity, Post.is_active, Post.product_type)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if not taken:
+            return None
+
+        seller_id, price, remaining, is_active, product_type = taken
+        events.publish('stock-changed', {'id': post_id, 'quantity': remaining, 'is_active': is_active})
+        if not is_active:
+            search_index.remove_posts([post_id])
+            price_index.remove_posts([post_id])
+            suggest_index.listings_closed([product_type])
+
+        return Order(
+            post_id=post_id,
+            seller_id=seller_id,
+            buyer_id=buyer_id,
+            quantity=quantity,
+            price=price
+        )
+
     @staticmethod
     def create_order(post_id, buyer_id, quantity):
-        """Create a new order"""
-        try:
-            # Get the post
-            post = Post.query.get(post_id)
-            if not post:
-                return None, "Post not found"
+        """Create a new order.
 
+        Stock is taken with a single conditional UPDATE, so concurrent buyers of
+        the same post can never oversell it; the order, the seller's and
+        buyer's stats and the daily rollup are written in the same transaction.
+        """
+        if quantity <= 0:
+            return None, "Quantity must be greater than 0"
+
+        try:
             # Check if buyer exists
             buyer = User.query.get(buyer_id)
-            if not buyer:
+            if not buyer or not buyer.is_active:
                 return None, "Buyer not found"
 
-            # Check if buyer is not the seller
-            if post.user_id == buyer_id:
-                return None, "You cannot purchase your own product"
-
-            # Check if quantity is available
-            if quantity > post.quantity:
-                return None, "Not enough quantity available"
-
-            # Create order
-            order = Order(
-                post_id=post_id,
-                seller_id=post.user_id,
-                buyer_id=buyer_id,
-                quantity=quantity,
-                price=post.price
-            )
-
-            # Update post quantity
-            post.quantity -= quantity
-
-            # If quantity becomes zero, mark post as inactive or delete it
-            if post.quantity == 0:
-                post.is_active = False
+            order = OrderService._take_stock(post_id, buyer_id, quantity)
+            if not order:
+                db.session.rollback()
+                return None, OrderService._placement_error(post_id, buyer_id)
 
             db.session.add(order)
+            db.session.flush()
+            StatsService.record_orders([order])
+            AnalyticsService.record_orders([order])
             db.session.commit()
+            cache.invalidate()
             return order, None
         except Exception as e:
             db.session.rollback()
             return None, str(e)
 
     @staticmethod
-    def get_orders_by_buyer(buyer_id):
+    def create_orders(buyer_id, items):
+        """Place orders for several posts in one transaction (cart checkout).
+
+        `items` is a list of (post_id, quantity) pairs. Either every order is
+        created and (orders, None) is returned, or nothing is and the result is
+        (None, failures), where failures lists {"index", "post_id", "error"} for
+        each item that could not be placed.
+        """
+        if not items:
+            return None, [{"index": None, "post_id": None, "error": "Cart is empty"}]
+
+        failures = [
+            {"index": index, "post_id": post_id, "error": "Quantity must be greater than 0"}
+            for index, (post_id, quantity) in enumerate(items) if quantity <= 0
+        ]
+        if failures:
+            return None, failures
+
+        try:
+            # Check if buyer exists
+            buyer = User.query.get(buyer_id)
+            if not buyer or not buyer.is_active:
+                return None, [{"index": None, "post_id": None, "error": "Buyer not found"}]
+
+            orders = []
+            for index, (post_id, quantity) in enumerate(items):
+                order = OrderService._take_stock(post_id, buyer_id, quantity)
+                if order:
+                    orders.append(order)
+                else:
+                    # Tiếp tục kiểm tra các món còn lại để trả về báo cáo đầy đủ
+                    failures.append({
+                        "index": index,
+                        "post_id": post_id,
+                        "error": OrderService._placement_error(post_id, buyer_id)
+                    })
+
+            if failures:
+                db.session.rollback()
+                return None, failures
+
+            db.session.add_all(orders)
+            db.session.flush()
+            StatsService.record_orders(orders)
+            AnalyticsService.record_orders(orders)
+            db.session.commit()
+            cache.invalidate()
+            return orders, None
+        except Exception as e:
+            db.session.rollback()
+            return None, [{"index": None, "post_id": None, "error": str(e)}]
+
+    @staticmethod
+    def _placement_error(post_id, buyer_id):
+        """Explain why the conditional stock update matched no row"""
+        post = Post.query.get(post_id)
+        if not post:
+            return "Post not found"
+
+        # Check if buyer is not the seller
+        if post.user_id == buyer_id:
+            return "You cannot purchase your own product"
+
+        return "Not enough quantity available"
+
+    @staticmethod
+    def _list_orders(query, limit=None, cursor=None):
+        """Serialize an order query, either fully or one keyset page at a time"""
+        query = ORDER_FIELDS.select(query)
+        if limit is None:
+            return ORDER_FIELDS.to_dicts(query.order_by(Order.created_at.desc()))
+
+        rows, next_cursor = keyset_page(query, Order, limit, cursor)
+        return ORDER_FIELDS.to_dicts(rows), next_cursor
+
+    @staticmethod
+    @query_budget(1)
+    def get_orders_by_buyer(buyer_id, limit=None, cursor=None):
         """Get all orders by a specific buyer"""
-        orders = Order.query.filter_by(buyer_id=buyer_id).order_by(Order.created_at.desc()).all()
-        return [order.to_dict() for order in orders]
+        query = read_query(Order).filter_by(buyer_id=buyer_id)
+        return OrderService._list_orders(query, limit, cursor)
 
     @staticmethod
-    def get_orders_by_seller(seller_id):
+    @query_budget(1)
+    def get_orders_by_seller(seller_id, limit=None, cursor=None):
         """Get all orders for a specific seller"""
-        orders = Order.query.filter_by(seller_id=seller_id).order_by(Order.created_at.desc()).all()
-        return [order.to_dict() for order in orders]
+        query = read_query(Order).filter_by(seller_id=seller_id)
+        return OrderService._list_orders(query, limit, cursor)
 
     @staticmethod
-    def get_all_orders():
+    @query_budget(1)
+    def get_all_orders(limit=None, cursor=None):
         """Get all orders (admin function)"""
-        orders = Order.query.order_by(Order.created_at.desc()).all()
-        return [order.to_dict() for order in orders]
+        return OrderService._list_orders(read_query(Order), limit, cursor)
+
+    @staticmethod
+    def iter_all_orders(batch_size=1000):
+        """Yield every order as a dict, reading the table in batches (admin function)"""
+        query = Order.query.order_by(Order.created_at.desc(), Order.id.desc())
+        for row in ORDER_FIELDS.select(query).yield_per(batch_size):
+            yield ORDER_FIELDS.to_dict(row)
+
+    @staticmethod
+    def get_order(order_id):
+        """Get an order by ID as a model instance"""
+        order = Order.query.get(order_id)
+        if not order:
+            return None, "Order not found"
+        return order, None
 
     @staticmethod
     def get_order_by_id(order_id):
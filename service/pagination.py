@@ -0,0 +1,131 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_key, row_id):
+    """Encode the sort key and id of the last row of a page into an opaque cursor.
+
+    The sort key is the row's created_at, or its relevance rank for ranked search.
+    """
+    key = sort_key.isoformat() if isinstance(sort_key, datetime) else repr(float(sort_key))
+    raw = f"{key}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_key, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        try:
+            sort_key = datetime.fromisoformat(sort_key)
+        except ValueError:
+            sort_key = float(sort_key)
+        return sort_key, int(row_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_page_args(args):
+    """Read limit/cursor from request args.
+
+    Pagination is opt-in: returns (None, None) when neither parameter is given,
+    so callers keep the full-list behaviour. Raises ValueError on bad input.
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+
+    if limit is None and cursor is None:
+        return None, None
+
+    limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    if limit <= 0:
+        raise ValueError("Limit must be greater than 0")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def keyset_page(query, model, limit, cursor=None):
+    """Return one page of `query` ordered newest first, plus the cursor of the next page.
+
+    Seeks on (created_at, id) instead of using OFFSET, so the cost of a page does
+    not depend on how deep into the table it is.
+    """
+    return keyset_rows(keyset_query(query, model, limit, cursor).all(), limit)
+
+
+def keyset_query(query, model, limit, cursor=None):
+    """The page of keyset_page() as an unexecuted query, one row longer to detect a next page.
+
+    Works on a Model.query as well as on a select(), which the async engine runs.
+    """
+    if cursor is not None:
+        created_at, row_id = cursor
+        if not isinstance(created_at, datetime):
+            raise ValueError("Invalid cursor")
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def keyset_rows(rows, limit):
+    """Split the rows fetched by a keyset_query() into the page and the cursor of the next one"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return rows, next_cursor
+
+
+def ranked_page(query, model, rank, limit=None, cursor=None):
+    """Like keyset_page, but ordered by a relevance rank column (lower is better).
+
+    `query` must select plain columns including the model's id; each returned
+    row carries the rank as an extra last column. Without a limit every match
+    is returned as a plain list of rows.
+    """
+    if cursor is not None:
+        last_rank, row_id = cursor
+        if not isinstance(last_rank, float):
+            raise ValueError("Invalid cursor")
+        query = query.filter(or_(
+            rank > last_rank,
+            and_(rank == last_rank, model.id > row_id)
+        ))
+
+    query = query.add_columns(rank).order_by(rank, model.id)
+    if limit is None:
+        return query.all()
+
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[-1], last.id)
+
+    return rows, next_cursor
+
+
+def page_payload(key, result):
+    """Build the JSON body for a list endpoint from a service result.
+
+    Service list methods return a plain list when called without a limit and a
+    (items, next_cursor) tuple when paginated.
+    """
+    if isinstance(result, tuple):
+        items, next_cursor = result
+        return {key: items, "next_cursor": next_cursor}
+    return {key: result}
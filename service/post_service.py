@@ -1,11 +1,20 @@
+from datetime import datetime
+
 from models import db, Post, User
-from sqlalchemy import or_
+from sqlalchemy import insert, or_, select, update
+from service import async_db, cache, events, jobs, price_index, search_index, suggest_index
+from service.analytics_service import AnalyticsService
+from service.pagination import encode_cursor, keyset_page, keyset_query, keyset_rows, ranked_page
+from service.query_budget import query_budget
+from service.replica import read_query
+from service.serialization import FEED_FIELDS, POST_FIELDS
+from service.stats_service import StatsService
 
 
 class PostService:
     @staticmethod
-    def create_post(user_id, product_type, quantity, price, description, contact_info):
-        """Create a new post"""
+    def _validate_post_fields(product_type, quantity, price, contact_info):
+        """Validate the fields of a new post, returning ((quantity, price), None) or (None, error)"""
         # Validate input
         if not all([product_type, quantity, price, contact_info]):
             return None, "Missing required fields"
@@ -23,10 +32,20 @@ class PostService:
         except (ValueError, TypeError):
             return None, "Quantity must be an integer and price must be a number"
 
+        return (quantity, price), None
+
+    @staticmethod
+    def create_post(user_id, product_type, quantity, price, description, contact_info):
+        """Create a new post"""
+        values, error = PostService._validate_post_fields(product_type, quantity, price, contact_info)
+        if error:
+            return None, error
+        quantity, price = values
+
         try:
             # Check if user exists
             user = User.query.get(user_id)
-            if not user:
+            if not user or not user.is_active:
                 return None, "User not found"
 
             post = Post(
@@ -40,24 +59,166 @@ class PostService:
             )
 
             db.session.add(post)
+            db.session.flush()
+            search_index.index_post(post)
+            price_index.post_saved(post)
+            suggest_index.listings_opened([post.product_type])
+            AnalyticsService.record_listings(post.created_at.date(), [post.product_type])
+            events.publish('post-created', post.to_dict())
             db.session.commit()
+            cache.invalidate()
             return post, None
         except Exception as e:
             db.session.rollback()
             return None, str(e)
 
     @staticmethod
-    def get_all_posts():
-        """Get all active posts"""
+    def bulk_create_posts(user_id, rows, batch_size=5000):
+        """Create many posts for one user, validating each row like create_post.
+
+        Valid rows are inserted with one executemany per batch and each batch is
+        committed on its own. Returns ({"created", "failed", "errors"}, None),
+        where errors lists {"row": 1-based index, "error": message} per bad row.
+        When a batch fails, the batches before it stay committed: the report of
+        what was created is returned with the error, with "resume_from_row", the
+        first row not imported, so the client can send the rest again.
+        """
+        user = User.query.get(user_id)
+        if not user or not user.is_active:
+            return None, "User not found"
+
+        created = 0
+        errors = []
+        batch = []
+        # Dòng đầu tiên chưa được commit, để client gửi lại từ đó khi một lô bị lỗi
+        resume_from_row = 1
+
+        try:
+            for index, row in enumerate(rows, start=1):
+                if not isinstance(row, dict):
+                    errors.append({"row": index, "error": "Row must be an object"})
+                    continue
+
+                values, error = PostService._validate_post_fields(
+                    row.get('product_type'), row.get('quantity'), row.get('price'), row.get('contact_info')
+                )
+                if error:
+                    errors.append({"row": index, "error": error})
+                    continue
+
+                quantity, price = values
+                batch.append({
+                    "user_id": user_id,
+                    "product_type": row['product_type'],
+                    "quantity": quantity,
+                    "price": price,
+                    "description": row.get('description') or '',
+                    "contact_info": row['contact_info'],
+                    "is_active": True
+                })
+
+                if len(batch) >= batch_size:
+                    created += PostService._insert_post_batch(batch)
+                    batch = []
+                    resume_from_row = index + 1
+
+            if batch:
+                created += PostService._insert_post_batch(batch)
+        except Exception as e:
+            db.session.rollback()
+            errors = [error for error in errors if error['row'] < resume_from_row]
+            return {"created": created, "failed": len(errors), "errors": errors,
+                    "resume_from_row": resume_from_row}, str(e)
+        finally:
+            if created:
+                cache.invalidate()
+
+        return {"created": created, "failed": len(errors), "errors": errors}, None
+
+    @staticmethod
+    def _insert_post_batch(batch):
+        """Insert and index one batch of validated post rows in a single transaction.
+
+        On SQLite the rows go through one driver-level executemany. The
+        transaction holds the write lock and rowids are assigned as max + 1, so
+        the batch gets the consecutive ids ending at last_insert_rowid().
+        """
+        connection = db.session.connection()
+        # Dùng chung một thời điểm cho cả lô
+        created_at = datetime.utcnow()
+
+        if connection.dialect.name != 'sqlite':
+            inserted = db.session.execute(
+                insert(Post).returning(Post.id, Post.product_type, Post.description, Post.price),
+                [dict(row, created_at=created_at, updated_at=created_at) for row in batch]
+            ).mappings().all()
+        else:
+            # Định dạng thời điểm giống như SQLAlchemy lưu DateTime
+            column_type = Post.__table__.c.created_at.type.dialect_impl(connection.dialect)
+            now = column_type.bind_processor(connection.dialect)(created_at)
+            connection.exec_driver_sql(
+                "INSERT INTO posts (user_id, product_type, quantity, price, description, "
+                "contact_info, is_active, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)",
+                [(row['user_id'], row['product_type'], row['quantity'], row['price'],
+                  row['description'], row['contact_info'], now, now) for row in batch]
+            )
+            last_id = connection.exec_driver_sql("SELECT last_insert_rowid()").scalar()
+            first_id = last_id - len(batch) + 1
+            inserted = [dict(row, id=first_id + offset) for offset, row in enumerate(batch)]
+
+        search_index.add_posts(inserted)
+        price_index.add_posts(inserted, created_at)
+        suggest_index.listings_opened([row['product_type'] for row in batch])
+        AnalyticsService.record_listings(created_at.date(), [row['product_type'] for row in batch])
+        db.session.commit()
+        return len(inserted)
+
+    @staticmethod
+    def _list_posts(query, limit=None, cursor=None, fields=POST_FIELDS):
+        """Serialize a post query, either fully or one keyset page at a time"""
+        query = fields.select(query)
+        if limit is None:
+            return fields.to_dicts(query.order_by(Post.created_at.desc()))
+
+        rows, next_cursor = keyset_page(query, Post, limit, cursor)
+        return fields.to_dicts(rows), next_cursor
+
+    @staticmethod
+    @cache.cached
+    @query_budget(1)
+    def get_all_posts(limit=None, cursor=None):
+        """Get all active posts, each with its seller's username"""
         # Chỉ lấy các bài đăng còn active (số lượng > 0)
-        posts = Post.query.filter_by(is_active=True).order_by(Post.created_at.desc()).all()
-        return [post.to_dict() for post in posts]
+        query = read_query(Post).join(User, User.id == Post.user_id).filter(Post.is_active == True)
+        return PostService._list_posts(query, limit, cursor, FEED_FIELDS)
+
+    @staticmethod
+    @cache.cached
+    @query_budget(1)
+    async def get_all_posts_async(limit=None, cursor=None):
+        """get_all_posts() for the ASGI app, read through the async engine"""
+        statement = select(*FEED_FIELDS.columns).join_from(Post, User, User.id == Post.user_id).where(Post.is_active == True)
+        if limit is None:
+            return FEED_FIELDS.to_dicts(await async_db.fetch_all(statement.order_by(Post.created_at.desc())))
+
+        rows = await async_db.fetch_all(keyset_query(statement, Post, limit, cursor))
+        rows, next_cursor = keyset_rows(rows, limit)
+        return FEED_FIELDS.to_dicts(rows), next_cursor
 
     @staticmethod
-    def get_posts_by_user(user_id):
+    def iter_all_posts(batch_size=1000):
+        """Yield every active post as a dict, reading the table in batches"""
+        query = Post.query.filter_by(is_active=True).order_by(Post.created_at.desc(), Post.id.desc())
+        for row in POST_FIELDS.select(query).yield_per(batch_size):
+            yield POST_FIELDS.to_dict(row)
+
+    @staticmethod
+    @cache.cached
+    @query_budget(1)
+    def get_posts_by_user(user_id, limit=None, cursor=None):
         """Get all posts by a specific user"""
-        posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
-        return [post.to_dict() for post in posts]
+        query = read_query(Post).filter_by(user_id=user_id)
+        return PostService._list_posts(query, limit, cursor)
 
     @staticmethod
     def get_post_by_id(post_id):
@@ -68,37 +229,163 @@ class PostService:
         return post, None
 
     @staticmethod
-    def search_posts_by_product_name(product_name):
-        """Search posts by product name"""
-        posts = Post.query.filter(
-            Post.product_type.like(f"%{product_name}%"),
-            Post.is_active == True
-        ).order_by(Post.created_at.desc()).all()
-        return [post.to_dict() for post in posts]
+    async def get_post_row_async(post_id):
+        """A post's POST_FIELDS row through the async engine, as (row, error)"""
+        row = await async_db.fetch_one(select(*POST_FIELDS.columns).where(Post.id == post_id))
+        if row is None:
+            return None, "Post not found"
+        return row, None
 
     @staticmethod
-    def search_posts_by_price_range(min_price, max_price):
+    @cache.cached
+    @query_budget(1)
+    def search_posts_by_product_name(product_name, limit=None, cursor=None):
+        """Search posts by product name and description, best matches first"""
+        matches = search_index.match(product_name)
+        if matches is None:
+            query = read_query(Post).filter(
+                Post.product_type.like(f"%{product_name}%"),
+                Post.is_active == True
+            )
+            return PostService._list_posts(query, limit, cursor)
+
+        query = read_query(Post).join(matches, matches.c.post_id == Post.id).filter(Post.is_active == True)
+        result = ranked_page(POST_FIELDS.select(query), Post, matches.c.rank, limit, cursor)
+        if limit is None:
+            return POST_FIELDS.to_dicts(result)
+
+        rows, next_cursor = result
+        return POST_FIELDS.to_dicts(rows), next_cursor
+
+    @staticmethod
+    @cache.cached
+    def search_posts_by_price_range(min_price, max_price, limit=None, cursor=None):
         """Search posts by price range"""
-        query = Post.query.filter_by(is_active=True)
+        index = price_index.get_index()
+        if index is not None and index.ensure_loaded():
+            return PostService._search_price_index(index, min_price, max_price, limit, cursor)
+
+        query = read_query(Post).filter_by(is_active=True)
 
         if min_price is not None:
             query = query.filter(Post.price >= min_price)
         if max_price is not None:
             query = query.filter(Post.price <= max_price)
 
-        posts = query.order_by(Post.created_at.desc()).all()
-        return [post.to_dict() for post in posts]
+        return PostService._list_posts(query, limit, cursor)
+
+    @staticmethod
+    def _search_price_index(index, min_price, max_price, limit=None, cursor=None):
+        """Price range search answered by the in-memory price index.
+
+        The index picks the ids in feed order; rows are then read by primary
+        key with the same filters as the SQL path, so an entry gone stale in
+        this process is skipped rather than returned.
+        """
+        after = None
+        if cursor is not None:
+            created_at, row_id = cursor
+            if not isinstance(created_at, datetime):
+                raise ValueError("Invalid cursor")
+            after = (price_index.to_micros(created_at), row_id)
+
+        wanted = None if limit is None else limit + 1
+        rows = []
+        while True:
+            requested = None if wanted is None else wanted - len(rows)
+            keys = index.search(min_price, max_price, after, requested)
+            rows.extend(PostService._posts_by_ids([post_id for _, post_id in keys], min_price, max_price))
+            # Tìm tiếp khi có dòng bị loại mà chỉ mục vẫn còn ứng viên
+            if requested is None or len(keys) < requested or len(rows) >= wanted:
+                break
+            after = keys[-1]
+
+        if limit is None:
+            return POST_FIELDS.to_dicts(rows)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return POST_FIELDS.to_dicts(rows), next_cursor
+
+    @staticmethod
+    def _posts_by_ids(post_ids, min_price, max_price, batch_size=500):
+        """Projected rows of the given active posts within the price range, in the order of post_ids"""
+        rows = []
+        for start in range(0, len(post_ids), batch_size):
+            batch = post_ids[start:start + batch_size]
+            # Chỉ lọc theo id để SQLite tra khóa chính; lọc giá trong SQL có thể khiến nó chọn ix_posts_is_active_price
+            found = {row.id: row for row in POST_FIELDS.select(read_query(Post).filter(Post.id.in_(batch)))}
+            for post_id in batch:
+                row = found.get(post_id)
+                if row is None or not row.is_active:
+                    continue
+                if (min_price is None or row.price >= min_price) and (max_price is None or row.price <= max_price):
+                    rows.append(row)
+        return rows
+
+    @staticmethod
+    def withdraw_posts(condition):
+        """Take the active posts matching `condition` off the marketplace; returns their ids. Does not commit.
+
+        They stay in the database as inactive posts, closed today, until deleted.
+        """
+        post_ids = db.session.scalars(select(Post.id).where(condition, Post.is_active == True)).all()
+        if not post_ids:
+            return []
+
+        before = AnalyticsService.footprint(post_ids, include_orders=False)
+        closed = db.session.execute(
+            update(Post)
+            .where(Post.id.in_(post_ids), Post.is_active == True)
+            .values(is_active=False, updated_at=datetime.utcnow())
+            .returning(Post.id, Post.product_type)
+        ).all()
+        AnalyticsService.replace(before, AnalyticsService.footprint(post_ids, include_orders=False))
+        search_index.remove_posts([post_id for post_id, _ in closed])
+        price_index.remove_posts([post_id for post_id, _ in closed])
+        suggest_index.listings_closed([product_type for _, product_type in closed])
+        return [post_id for post_id, _ in closed]
 
     @staticmethod
     def delete_post(post_id):
-        """Delete a post"""
+        """Delete a post: it disappears from listings now, and is deleted with its orders by a background job"""
+        if Post.query.get(post_id) is None:
+            return False, "Post not found"
+
+        try:
+            PostService.withdraw_posts(Post.id == post_id)
+            jobs.enqueue('purge_post', {'post_id': post_id})
+            events.publish('post-deleted', {'id': post_id})
+            db.session.commit()
+            cache.invalidate()
+            return True, None
+        except Exception as e:
+            db.session.rollback()
+            return False, str(e)
+
+    @staticmethod
+    def purge_post(post_id):
+        """Delete a post and its orders now; returns (False, None) when it is already gone"""
         post = Post.query.get(post_id)
         if not post:
-            return False, "Post not found"
+            return False, None
 
         try:
+            # Các đơn hàng bị xóa theo cascade làm thay đổi thống kê của người bán và người mua
+            affected_users = {order.buyer_id for order in post.orders}
+            search_index.remove_posts([post.id])
+            AnalyticsService.remove_posts([post.id])
+            price_index.remove_posts([post.id])
+            if post.is_active:
+                suggest_index.listings_closed([post.product_type])
             db.session.delete(post)
+            if affected_users:
+                db.session.flush()
+                StatsService.refresh_users(affected_users | {post.user_id})
             db.session.commit()
+            cache.invalidate()
             return True, None
         except Exception as e:
             db.session.rollback()
@@ -113,13 +400,18 @@ class PostService:
 
         # Kiểm tra xem người dùng có quyền sửa bài đăng không
         user = User.query.get(user_id)
-        if not user:
+        if not user or not user.is_active:
             return None, "User not found"
 
         if not user.is_admin and post.user_id != user_id:
             return None, "Unauthorized to update this post"
 
         try:
+            # Đổi loại sản phẩm thì các đơn hàng cũ cũng chuyển sang loại mới trong thống kê
+            type_changed = 'product_type' in data and data['product_type'] != post.product_type
+            before = AnalyticsService.footprint([post.id], include_orders=type_changed)
+            listed_before = (post.product_type, post.is_active)
+
             # Cập nhật các trường được cung cấp
             if 'product_type' in data:
                 post.product_type = data['product_type']
@@ -149,8 +441,26 @@ class PostService:
                 except (ValueError, TypeError):
                     return None, "Price must be a number"
 
+            db.session.flush()
+            AnalyticsService.replace(before, AnalyticsService.footprint([post.id], include_orders=type_changed))
+            search_index.index_post(post)
+            price_index.post_saved(post)
+            if listed_before != (post.product_type, post.is_active):
+                if listed_before[1]:
+                    suggest_index.listings_closed([listed_before[0]])
+                if post.is_active:
+                    suggest_index.listings_opened([post.product_type])
+            events.publish('post-updated', post.to_dict())
             db.session.commit()
+            cache.invalidate()
             return post, None
         except Exception as e:
             db.session.rollback()
-            return None, str(e)
\ No newline at end of file
+            return None, str(e)
+
+
+@jobs.job('purge_post')
+def purge_post_job(post_id):
+    _, error = PostService.purge_post(post_id)
+    if error:
+        raise jobs.JobError(error)
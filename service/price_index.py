@@ -0,0 +1,360 @@
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from models import db, Post
+
+# numpy là tùy chọn, thiếu thì dùng array của thư viện chuẩn. Chỉ nhập khi chỉ mục được bật (init_app),
+# vì nhập numpy tốn thời gian khởi động của mọi worker
+numpy = None
+USE_NUMPY = True
+
+EXTENSION_KEY = 'price_index'
+PENDING_KEY = 'price_index_changes'
+LOAD_BATCH_SIZE = 50000
+# Số thay đổi tối đa giữ ngoài mảng đã sắp xếp trước khi gộp lại
+COMPACT_THRESHOLD = 4096
+
+_EPOCH = datetime(1970, 1, 1)
+_session_hooks_installed = False
+
+
+def to_micros(value):
+    """created_at as integer microseconds, the recency key stored in the index"""
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class PriceIndex:
+    """Active posts sorted by price, answering range queries newest first.
+
+    The sorted arrays (price, id, created_at) are immutable between
+    compactions; writes land in a small overlay of added entries and removed
+    ids that every query merges in, and are folded into new arrays once the
+    overlay reaches COMPACT_THRESHOLD. Uses numpy when it is installed and
+    the standard library's array + bisect otherwise.
+
+    Like the response cache, the index is per process: it sees the writes
+    committed by its own process, and max_age bounds how long writes from
+    other workers can be missed before the next lazy reload.
+    """
+
+    def __init__(self, max_age=0):
+        self.max_age = max_age
+        self.loaded_at = None
+        self.load_seconds = None
+        self._prices, self._ids, self._created = self._empty()
+        self._added = {}
+        self._removed = set()
+        self._removed_ids = None
+        # Thay đổi được commit trong lúc đang nạp lại, để áp dụng lại sau khi nạp xong
+        self._journal = None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty():
+        if numpy is not None:
+            return numpy.empty(0, numpy.float64), numpy.empty(0, numpy.int64), numpy.empty(0, numpy.int64)
+        return array('d'), array('q'), array('q')
+
+    @property
+    def backend(self):
+        return 'numpy' if numpy is not None else 'array'
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        return bool(self.max_age) and time.monotonic() - self.loaded_at > self.max_age
+
+    def ensure_loaded(self):
+        """Load the index if it is cold or older than max_age.
+
+        Returns False while another thread is loading a cold index, so the
+        caller can answer from the database instead of waiting.
+        """
+        if not self.is_stale():
+            return True
+
+        with self._lock:
+            if self._loading:
+                return self.loaded_at is not None
+            self._loading = True
+
+        try:
+            self.load(_read_active_posts())
+        finally:
+            with self._lock:
+                self._loading = False
+        return True
+
+    def load(self, rows):
+        """Replace the arrays with (id, price, created_at micros) rows read from the database.
+
+        Changes committed while the rows are being read are journaled and
+        replayed on top of the new arrays; the older overlay is dropped, as
+        the rows already reflect it.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._journal = []
+
+        try:
+            ids, prices, created = array('q'), array('d'), array('q')
+            for post_id, price, created_us in rows:
+                ids.append(post_id)
+                prices.append(price)
+                created.append(created_us)
+            arrays = self._sorted(prices, ids, created)
+
+            with self._lock:
+                self._prices, self._ids, self._created = arrays
+                self._added = {}
+                self._removed = set()
+                self._apply_locked(self._journal)
+        finally:
+            with self._lock:
+                self._journal = None
+
+        self.loaded_at = time.monotonic()
+        self.load_seconds = time.perf_counter() - started
+
+    @staticmethod
+    def _sorted(prices, ids, created):
+        if numpy is not None:
+            prices = numpy.asarray(prices, numpy.float64)
+            order = numpy.argsort(prices, kind='stable')
+            return prices[order], numpy.asarray(ids, numpy.int64)[order], numpy.asarray(created, numpy.int64)[order]
+
+        order = sorted(range(len(prices)), key=prices.__getitem__)
+        return (
+            array('d', (prices[i] for i in order)),
+            array('q', (ids[i] for i in order)),
+            array('q', (created[i] for i in order)),
+        )
+
+    def apply(self, changes):
+        """Apply committed changes: (post_id, price, created_at micros) to upsert, or (post_id, None, None) to drop"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.extend(changes)
+            self._apply_locked(changes)
+            if len(self._added) + len(self._removed) > COMPACT_THRESHOLD:
+                self._compact()
+
+    def _apply_locked(self, changes):
+        for post_id, price, created_us in changes:
+            # Dòng cũ trong mảng (nếu có) luôn bị che, giá mới nằm trong phần thêm
+            self._removed.add(post_id)
+            if price is None:
+                self._added.pop(post_id, None)
+            else:
+                self._added[post_id] = (price, created_us)
+        self._removed_ids = None
+
+    def _compact(self):
+        # Gọi khi đang giữ khóa
+        prices, ids, created = self._prices, self._ids, self._created
+        added_ids = list(self._added)
+        added_prices = [self._added[post_id][0] for post_id in added_ids]
+        added_created = [self._added[post_id][1] for post_id in added_ids]
+
+        if numpy is not None:
+            keep = ~numpy.isin(ids, numpy.fromiter(self._removed, numpy.int64, len(self._removed)))
+            self._prices, self._ids, self._created = self._sorted(
+                numpy.concatenate([prices[keep], numpy.array(added_prices, numpy.float64)]),
+                numpy.concatenate([ids[keep], numpy.array(added_ids, numpy.int64)]),
+                numpy.concatenate([created[keep], numpy.array(added_created, numpy.int64)]),
+            )
+        else:
+            # Phần còn lại của mảng vẫn đã sắp xếp, chỉ cần trộn với các dòng mới thêm
+            kept = (
+                (prices[i], ids[i], created[i]) for i in range(len(ids)) if ids[i] not in self._removed
+            )
+            added = sorted(zip(added_prices, added_ids, added_created))
+            self._prices, self._ids, self._created = array('d'), array('q'), array('q')
+            for price, post_id, created_us in heapq.merge(kept, added, key=itemgetter(0)):
+                self._prices.append(price)
+                self._ids.append(post_id)
+                self._created.append(created_us)
+
+        self._added = {}
+        self._removed = set()
+        self._removed_ids = None
+
+    def search(self, min_price=None, max_price=None, after=None, limit=None):
+        """Keys (created_at micros, id) of posts priced in [min_price, max_price], newest first.
+
+        `after` is the key of the last row already returned; at most `limit`
+        keys are returned, all of them when limit is None.
+        """
+        with self._lock:
+            prices, ids, created = self._prices, self._ids, self._created
+            added = [
+                (created_us, post_id) for post_id, (price, created_us) in self._added.items()
+                if (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+            ]
+            if numpy is not None:
+                if self._removed_ids is None:
+                    self._removed_ids = numpy.fromiter(self._removed, numpy.int64, len(self._removed))
+                removed = self._removed_ids
+            else:
+                removed = set(self._removed)
+
+        # Tìm nhị phân khoảng giá trên mảng đã sắp xếp
+        if numpy is not None:
+            low = 0 if min_price is None else int(numpy.searchsorted(prices, min_price, 'left'))
+            high = len(prices) if max_price is None else int(numpy.searchsorted(prices, max_price, 'right'))
+        else:
+            low = 0 if min_price is None else bisect.bisect_left(prices, min_price)
+            high = len(prices) if max_price is None else bisect.bisect_right(prices, max_price)
+
+        if after is not None:
+            added = [key for key in added if key < after]
+
+        if numpy is None:
+            return self._top_array(ids, created, low, high, removed, added, after, limit)
+        return self._top_numpy(ids[low:high], created[low:high], removed, added, after, limit)
+
+    @staticmethod
+    def _top_numpy(ids, created, removed, added, after, limit):
+        keep = None
+        if len(removed):
+            keep = ~numpy.isin(ids, removed)
+        if after is not None:
+            before = (created < after[0]) | ((created == after[0]) & (ids < after[1]))
+            keep = before if keep is None else keep & before
+        if keep is not None:
+            ids, created = ids[keep], created[keep]
+
+        if added:
+            created = numpy.concatenate([created, numpy.fromiter((key[0] for key in added), numpy.int64, len(added))])
+            ids = numpy.concatenate([ids, numpy.fromiter((key[1] for key in added), numpy.int64, len(added))])
+
+        if limit is not None and len(ids) > limit:
+            # Chỉ sắp xếp những dòng có thể lọt vào trang: mới hơn hoặc bằng mốc thứ `limit`
+            threshold = numpy.partition(created, len(created) - limit)[len(created) - limit]
+            candidates = created >= threshold
+            ids, created = ids[candidates], created[candidates]
+
+        order = numpy.lexsort((ids, created))[::-1]
+        if limit is not None:
+            order = order[:limit]
+        return list(zip(created[order].tolist(), ids[order].tolist()))
+
+    @staticmethod
+    def _top_array(ids, created, low, high, removed, added, after, limit):
+        keys = (
+            (created[i], ids[i]) for i in range(low, high)
+            if ids[i] not in removed and (after is None or (created[i], ids[i]) < after)
+        )
+        if limit is None:
+            return sorted([*keys, *added], reverse=True)
+        return heapq.nlargest(limit, [*keys, *added])
+
+    def stats(self):
+        with self._lock:
+            indexed = len(self._ids)
+            pending = len(self._added) + len(self._removed)
+        return {
+            'backend': self.backend,
+            'indexed': indexed,
+            'pending': pending,
+            'loaded': self.loaded_at is not None,
+            'age': time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+            'load_seconds': self.load_seconds,
+        }
+
+
+def _read_active_posts():
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        # Đổi created_at ('YYYY-MM-DD HH:MM:SS[.ffffff]') sang micro giây ngay trong SQLite,
+        # nhanh hơn nhiều so với tạo một datetime cho mỗi dòng
+        yield from connection.exec_driver_sql(
+            "SELECT id, price, CAST(strftime('%s', created_at) AS INTEGER) * 1000000 "
+            "+ CAST(substr(created_at, 21, 6) AS INTEGER) FROM posts WHERE is_active = 1"
+        )
+        return
+
+    query = (
+        select(Post.id, Post.price, Post.created_at)
+        .where(Post.is_active == True)
+        .execution_options(yield_per=LOAD_BATCH_SIZE)
+    )
+    for post_id, price, created_at in db.session.execute(query):
+        yield post_id, price, to_micros(created_at)
+
+
+def init_app(app):
+    """Attach a price index to the app when PRICE_INDEX_ENABLED is set.
+
+    The index loads lazily on the first price search. Changes are queued on
+    the session by the write paths and applied after the commit, so a rolled
+    back write never shows up in the index.
+    """
+    global _session_hooks_installed, numpy
+
+    if not app.config.get('PRICE_INDEX_ENABLED'):
+        return
+
+    if USE_NUMPY and numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            pass
+
+    app.extensions[EXTENSION_KEY] = PriceIndex(app.config.get('PRICE_INDEX_MAX_AGE') or 0)
+
+    if not _session_hooks_installed:
+        event.listen(db.session, 'after_commit', _apply_pending)
+        event.listen(db.session, 'after_rollback', _discard_pending)
+        _session_hooks_installed = True
+
+
+def get_index():
+    """Price index of the current app, or None when it is disabled"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _queue(changes):
+    if get_index() is not None:
+        db.session.info.setdefault(PENDING_KEY, []).extend(changes)
+
+
+def post_saved(post):
+    """Queue a created or updated post; inactive posts are dropped from the index"""
+    if post.is_active:
+        _queue([(post.id, post.price, to_micros(post.created_at))])
+    else:
+        _queue([(post.id, None, None)])
+
+
+def add_posts(rows, created_at):
+    """Queue bulk-inserted rows (dicts with id and price) created at the same time"""
+    created_us = to_micros(created_at)
+    _queue([(row['id'], row['price'], created_us) for row in rows])
+
+
+def remove_posts(post_ids):
+    """Queue posts that were deleted or deactivated"""
+    _queue([(post_id, None, None) for post_id in post_ids])
+
+
+def _apply_pending(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    index = get_index()
+    if changes and index is not None:
+        index.apply(changes)
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
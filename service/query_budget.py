@@ -0,0 +1,136 @@
+import contextvars
+import functools
+import inspect
+from collections import Counter
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db
+from service import replica
+
+EXTENSION_KEY = 'query_budget'
+MODES = ('off', 'log', 'raise')
+# Số câu lệnh lặp lại nhiều nhất được nêu trong thông báo lỗi
+REPORTED_STATEMENTS = 3
+
+# Các ngân sách đang mở trong luồng hoặc task async hiện tại, ngoài cùng trước
+_active = contextvars.ContextVar('query_budgets', default=())
+# Bật khi có app dùng QUERY_BUDGET_MODE khác 'off'; nếu không, hàm được đánh dấu chạy như bình thường
+_enabled = False
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudget:
+    """A cap on the SQL statements run inside a block, or by each call of a function.
+
+        with query_budget(2, 'feed page'):
+            ...
+
+        @query_budget(1)
+        def get_all_posts(...):
+
+    Every statement run on an instrumented engine inside the block counts,
+    including those of nested calls, async reads and run_sync(); nested
+    budgets each count their own. What happens past the cap depends on
+    QUERY_BUDGET_MODE: `raise` (tests) raises QueryBudgetExceeded when the
+    block ends, `log` (staging) logs a warning, `off` does not count at all.
+    """
+
+    def __init__(self, limit, name=None):
+        self.limit = limit
+        self.name = name
+        self.statements = []
+        self._token = None
+
+    def __enter__(self):
+        if _enabled:
+            self.statements = []
+            self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._token is None:
+            return False
+        _active.reset(self._token)
+        self._token = None
+        # Một lỗi đang lan ra quan trọng hơn việc vượt ngân sách
+        if exc_type is None and len(self.statements) > self.limit:
+            _exceeded(self)
+        return False
+
+    def __call__(self, func):
+        name = self.name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with QueryBudget(self.limit, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with QueryBudget(self.limit, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def query_budget(limit, name=None):
+    """Context manager and decorator capping SQL statements at `limit`; see QueryBudget"""
+    return QueryBudget(limit, name)
+
+
+def _exceeded(budget):
+    repeated = Counter(' '.join(statement.split()) for statement in budget.statements).most_common(REPORTED_STATEMENTS)
+    details = '; '.join(f"{count}x {statement[:200]}" for statement, count in repeated)
+    message = (f"{budget.name or 'block'} ran {len(budget.statements)} SQL statements, "
+               f"budget {budget.limit}. Most repeated: {details}")
+
+    mode = current_app.extensions.get(EXTENSION_KEY, 'off') if has_app_context() else 'raise'
+    if mode == 'raise':
+        raise QueryBudgetExceeded(message)
+    if mode == 'log':
+        current_app.logger.warning("Query budget exceeded: %s", message)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for budget in _active.get():
+        budget.statements.append(statement)
+
+
+def instrument_engine(app, engine):
+    """Count statements run on `engine` towards open budgets, unless budgets are off for `app`"""
+    if app.extensions.get(EXTENSION_KEY, 'off') != 'off':
+        event.listen(engine, 'after_cursor_execute', _count_statement)
+
+
+def init_app(app):
+    """Enable query budgets per QUERY_BUDGET_MODE.
+
+    Must run in an app context, after the replica engine (if any) is
+    attached. With the default `off` no engine is instrumented and a
+    decorated function costs one extra call.
+    """
+    global _enabled
+
+    mode = app.config.get('QUERY_BUDGET_MODE') or 'off'
+    if mode not in MODES:
+        raise ValueError(f"Unknown query budget mode: {mode}")
+
+    app.extensions[EXTENSION_KEY] = mode
+    if mode == 'off':
+        return
+
+    _enabled = True
+    instrument_engine(app, db.engine)
+    replica_engine = app.extensions.get(replica.EXTENSION_KEY)
+    if replica_engine is not None:
+        instrument_engine(app, replica_engine)
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import threading
+import time
+
+import click
+from flask import current_app, g, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from models import db
+from service import startup
+
+EXTENSION_KEY = 'replica_engine'
+
+_commit_hook_installed = False
+
+
+def _sqlite_path(app, uri):
+    """Absolute file path of a SQLite URI, relative paths resolved like Flask-SQLAlchemy does"""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if os.path.isabs(url.database):
+        return url.database
+    return os.path.join(app.instance_path, url.database)
+
+
+def _replica_url(app):
+    uri = app.config['REPLICA_DATABASE_URI']
+    path = _sqlite_path(app, uri)
+    return make_url(uri).set(database=path) if path else make_url(uri)
+
+
+def _mark_primary_write(session):
+    # Sau khi ghi, các truy vấn còn lại trong request đọc từ primary để thấy dữ liệu vừa ghi
+    if has_app_context() and EXTENSION_KEY in current_app.extensions:
+        g.read_from_primary = True
+
+
+def init_app(app):
+    """Attach the optional read-only replica engine.
+
+    Does nothing unless REPLICA_DATABASE_URI is set. Must run after the
+    primary schema exists, since a missing replica file is seeded from it.
+    Replica connections are opened with query_only, so a write routed there
+    by mistake fails instead of silently diverging from the primary.
+    """
+    global _commit_hook_installed
+
+    if not app.config.get('REPLICA_DATABASE_URI'):
+        return
+
+    engine = create_engine(_replica_url(app))
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def set_query_only(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA query_only = ON")
+
+    app.extensions[EXTENSION_KEY] = engine
+    startup.dispose_after_fork(engine)
+
+    # Bản sao chưa tồn tại thì chép ngay để có schema trước khi phục vụ truy vấn đọc
+    target = _sqlite_path(app, app.config['REPLICA_DATABASE_URI'])
+    if target and not os.path.exists(target):
+        sync(app)
+
+    if not _commit_hook_installed:
+        event.listen(db.session, 'after_commit', _mark_primary_write)
+        _commit_hook_installed = True
+
+    @app.teardown_appcontext
+    def close_replica_session(exception=None):
+        replica_session = g.pop('replica_session', None)
+        if replica_session is not None:
+            replica_session.close()
+
+    app.cli.add_command(sync_command)
+
+    interval = app.config.get('REPLICA_SYNC_INTERVAL') or 0
+    if interval > 0:
+        threading.Thread(target=_sync_forever, args=(app, interval), daemon=True).start()
+
+
+def read_session():
+    """Session for read-only list and search queries.
+
+    Returns the replica session when a replica is configured and nothing has
+    been committed in the current context yet, otherwise db.session.
+    """
+    engine = current_app.extensions.get(EXTENSION_KEY)
+    if engine is None or g.get('read_from_primary'):
+        return db.session
+
+    if 'replica_session' not in g:
+        g.replica_session = Session(bind=engine)
+    return g.replica_session
+
+
+def read_query(model):
+    """`model.query` routed through read_session()"""
+    return model.query.with_session(read_session())
+
+
+def sync(app=None):
+    """Copy the primary SQLite database into the replica file.
+
+    A stand-in for real replication, meant for local testing: it uses the
+    SQLite online backup API, so the copy is a consistent snapshot even while
+    the primary is being written to.
+    """
+    app = app or current_app
+    source = _sqlite_path(app, app.config['SQLALCHEMY_DATABASE_URI'])
+    target = _sqlite_path(app, app.config['REPLICA_DATABASE_URI'])
+    if not source or not target:
+        raise ValueError("Replica sync only supports SQLite file databases")
+
+    started = time.perf_counter()
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+    return time.perf_counter() - started
+
+
+def _sync_forever(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            sync(app)
+        except sqlite3.Error as e:
+            app.logger.warning("Replica sync failed: %s", e)
+
+
+@click.command('replica-sync')
+@with_appcontext
+def sync_command():
+    """Copy the primary database into the read replica."""
+    elapsed = sync()
+    click.echo(f"Replica synced in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,219 @@
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Post
+
+FTS_TABLE = 'posts_fts'
+REBUILD_BATCH_SIZE = 5000
+
+# Cột product_type được ưu tiên hơn description khi xếp hạng
+PRODUCT_TYPE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_COMBINING_MARKS = re.compile('[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]')
+
+
+def fold_text(value):
+    """Lowercase and strip Vietnamese diacritics so "Cà Phê" and "ca phe" index the same"""
+    if not value:
+        return ''
+    if value.isascii():
+        return value.lower()
+    # "đ" không phải là chữ có dấu trong Unicode nên phải thay thế thủ công
+    value = value.replace('đ', 'd').replace('Đ', 'D')
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFD', value)).lower()
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 expression where every word is a prefix term"""
+    tokens = _TOKEN_PATTERN.findall(fold_text(query))
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+class LikeSearchBackend:
+    """Fallback backend: no index, the service keeps its LIKE '%q%' scan"""
+    name = 'like'
+
+    def setup(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def index_post(self, post):
+        pass
+
+    def add_posts(self, rows):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def match(self, query):
+        return None
+
+    def match_statement(self, expression=None, ranked=True):
+        return None
+
+
+class Fts5SearchBackend:
+    """SQLite FTS5 index over product_type and description of active posts.
+
+    Rows are keyed by post id and store accent-folded text. Writes go through
+    db.session so they commit or roll back together with the post change.
+    """
+    name = 'fts5'
+
+    def setup(self):
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        if exists:
+            return
+
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "product_type, description, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        self.rebuild()
+
+    def rebuild(self):
+        """Re-index every active post in batches"""
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+
+        rows = db.session.execute(
+            db.select(Post.id, Post.product_type, Post.description)
+            .where(Post.is_active == True)
+            .execution_options(yield_per=REBUILD_BATCH_SIZE)
+        )
+        for batch in rows.partitions():
+            self._insert([
+                {"id": post_id, "product_type": fold_text(product_type), "description": fold_text(description)}
+                for post_id, product_type, description in batch
+            ])
+        db.session.commit()
+
+    def index_post(self, post):
+        self.remove_posts([post.id])
+        if post.is_active:
+            self._insert([{
+                "id": post.id,
+                "product_type": fold_text(post.product_type),
+                "description": fold_text(post.description)
+            }])
+
+    def add_posts(self, rows):
+        """Index new posts given as dicts with id, product_type and description"""
+        self._insert([
+            {"id": row['id'], "product_type": fold_text(row['product_type']),
+             "description": fold_text(row.get('description'))}
+            for row in rows
+        ])
+
+    def remove_posts(self, post_ids):
+        if post_ids:
+            db.session.execute(
+                text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"),
+                [{"id": post_id} for post_id in post_ids]
+            )
+
+    def match(self, query):
+        """Return a subquery of (post_id, rank) for posts matching `query`, lower rank is better.
+
+        Returns None when the query has no searchable words, so the caller keeps the LIKE path.
+        """
+        expression = build_match_expression(query)
+        if not expression:
+            return None
+
+        return self.match_statement(expression).subquery()
+
+    def match_statement(self, expression=None, ranked=True):
+        """The (post_id, rank) select behind match(); only post_id when not ranked.
+
+        Without an expression the :expression parameter is left unbound, for
+        statements that are built once and executed with different queries.
+        Skipping the rank saves scoring every match when only counts are needed.
+        """
+        if not ranked:
+            statement = text(f"SELECT rowid AS post_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression")
+        else:
+            statement = text(
+                f"SELECT rowid AS post_id, "
+                f"bm25({FTS_TABLE}, {PRODUCT_TYPE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expression"
+            )
+        if expression is not None:
+            statement = statement.bindparams(expression=expression)
+        if not ranked:
+            return statement.columns(post_id=db.Integer)
+        return statement.columns(post_id=db.Integer, rank=db.Float)
+
+    @staticmethod
+    def _insert(rows):
+        if rows:
+            # executemany trực tiếp qua driver, tránh chi phí xử lý tham số từng dòng của SQLAlchemy
+            db.session.connection().exec_driver_sql(
+                f"INSERT INTO {FTS_TABLE} (rowid, product_type, description) VALUES (?, ?, ?)",
+                [(row['id'], row['product_type'], row['description']) for row in rows]
+            )
+
+
+_BACKENDS = {
+    LikeSearchBackend.name: LikeSearchBackend(),
+    Fts5SearchBackend.name: Fts5SearchBackend(),
+}
+
+
+def get_backend():
+    """Search backend configured for the current app"""
+    return _BACKENDS[current_app.config.get('SEARCH_BACKEND', Fts5SearchBackend.name)]
+
+
+def init_app(app):
+    """Create the index if needed; fall back to LIKE when FTS5 is unavailable.
+
+    Must be called inside an application context.
+    """
+    backend_name = app.config.get('SEARCH_BACKEND', Fts5SearchBackend.name)
+    if backend_name not in _BACKENDS:
+        raise ValueError(f"Unknown search backend: {backend_name}")
+
+    if backend_name == Fts5SearchBackend.name and db.engine.dialect.name != 'sqlite':
+        app.logger.warning("FTS5 search requires SQLite, falling back to LIKE search")
+        app.config['SEARCH_BACKEND'] = LikeSearchBackend.name
+        return
+
+    try:
+        _BACKENDS[backend_name].setup()
+        db.session.commit()
+    except OperationalError as e:
+        db.session.rollback()
+        app.logger.warning("Search index unavailable (%s), falling back to LIKE search", e)
+        app.config['SEARCH_BACKEND'] = LikeSearchBackend.name
+
+
+def index_post(post):
+    get_backend().index_post(post)
+
+
+def add_posts(rows):
+    get_backend().add_posts(rows)
+
+
+def remove_posts(post_ids):
+    get_backend().remove_posts(post_ids)
+
+
+def match(query):
+    return get_backend().match(query)
+
+
+def match_statement(expression=None, ranked=True):
+    return get_backend().match_statement(expression, ranked)
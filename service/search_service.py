@@ -0,0 +1,273 @@
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import and_, bindparam, case, cast, func, literal, literal_column, null, or_, select, union_all
+
+from models import db, Post
+from service import async_db, cache, search_index
+from service.pagination import encode_cursor
+from service.replica import read_session
+from service.serialization import POST_FIELDS
+
+SORTS = ('relevance', 'newest', 'price_asc', 'price_desc')
+# Cận dưới của các khoảng giá trong facet; khoảng cuối không có cận trên
+PRICE_BUCKETS = (0, 50, 100, 200, 500, 1000, 2000, 5000)
+# Số product_type nhiều bài nhất được trả về trong facet
+FACET_LIMIT = 20
+STATEMENT_CACHE_SIZE = 256
+
+_FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def parse_search_args(args):
+    """Read the filters of a combined search from request args, raising ValueError on bad input.
+
+    Returns keyword arguments for SearchService.search(): q, min_price,
+    max_price, seller_id, product_type, in_stock (default on), sort and
+    facets (default on).
+    """
+    def number(name, convert):
+        value = args.get(name)
+        return convert(value) if value not in (None, '') else None
+
+    filters = {
+        'query': (args.get('q') or args.get('query') or '').strip() or None,
+        'min_price': number('min_price', float),
+        'max_price': number('max_price', float),
+        'seller_id': number('seller_id', int),
+        'product_type': args.get('product_type') or None,
+        'in_stock': args.get('in_stock', '1').lower() not in _FALSE_VALUES,
+        'sort': args.get('sort') or None,
+        'facets': args.get('facets', '1').lower() not in _FALSE_VALUES,
+    }
+
+    if filters['sort'] is not None and filters['sort'] not in SORTS:
+        raise ValueError("Unknown sort")
+    if None not in (filters['min_price'], filters['max_price']) and filters['min_price'] > filters['max_price']:
+        raise ValueError("Minimum price is above maximum price")
+    return filters
+
+
+def _bucket_ranges():
+    return list(enumerate(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + (None,))))
+
+
+def _price_bucket():
+    # Các cận là hằng số nên được viết thẳng vào SQL: GROUP BY khớp đúng biểu thức đã SELECT
+    return case(
+        *[(Post.price < literal_column(str(high)), literal_column(str(index)))
+          for index, (low, high) in _bucket_ranges() if high is not None],
+        else_=literal_column(str(len(PRICE_BUCKETS) - 1))
+    )
+
+
+def _conditions(shape, exclude=None):
+    """WHERE clauses of a filter shape; `exclude` leaves out one facet's own filter"""
+    text_mode, filters, in_stock = shape[:3]
+    conditions = []
+    if in_stock:
+        conditions.append(Post.is_active == True)
+    if text_mode == 'like':
+        conditions.append(Post.product_type.like(bindparam('pattern')))
+    if 'min_price' in filters and exclude != 'price':
+        conditions.append(Post.price >= bindparam('min_price'))
+    if 'max_price' in filters and exclude != 'price':
+        conditions.append(Post.price <= bindparam('max_price'))
+    if 'seller_id' in filters:
+        conditions.append(Post.user_id == bindparam('seller_id'))
+    if 'product_type' in filters and exclude != 'product_type':
+        conditions.append(Post.product_type == bindparam('product_type'))
+    return conditions
+
+
+def _select(shape, match, *columns, exclude=None):
+    """SELECT over posts with the shape's filters; `match` is joined when it carries a rank, else used as an id set"""
+    statement = select(*columns).select_from(Post)
+    if match is not None:
+        if 'rank' in match.c:
+            statement = statement.join(match, match.c.post_id == Post.id)
+        else:
+            statement = statement.where(Post.id.in_(select(match.c.post_id)))
+    return statement.where(*_conditions(shape, exclude))
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _statements(shape):
+    """Build the page and facet statements of a filter shape once.
+
+    Every value is a bind parameter, so the same statement objects are reused
+    for every search of the shape and SQLAlchemy's compiled cache always hits.
+    """
+    text_mode, filters, in_stock, sort, has_cursor, paginated, with_facets = shape
+    match = search_index.match_statement().subquery() if text_mode == 'fts' else None
+
+    columns = list(POST_FIELDS.columns)
+    if sort == 'relevance':
+        sort_column, descending = match.c.rank, False
+        columns.append(match.c.rank)
+    elif sort == 'newest':
+        sort_column, descending = Post.created_at, True
+    else:
+        sort_column, descending = Post.price, sort == 'price_desc'
+
+    page = _select(shape, match, *columns)
+    if has_cursor:
+        key = bindparam('cursor_key', type_=sort_column.type)
+        row_id = bindparam('cursor_id', type_=db.Integer)
+        if descending:
+            page = page.where(or_(sort_column < key, and_(sort_column == key, Post.id < row_id)))
+        else:
+            page = page.where(or_(sort_column > key, and_(sort_column == key, Post.id > row_id)))
+    if descending:
+        page = page.order_by(sort_column.desc(), Post.id.desc())
+    else:
+        page = page.order_by(sort_column, Post.id)
+    if paginated:
+        page = page.limit(bindparam('limit', type_=db.Integer))
+
+    if not with_facets:
+        return page, None
+
+    # Các nhánh facet dùng chung một CTE không tính điểm, SQLite chỉ chạy truy vấn FTS5 một lần;
+    # lọc bằng IN (...) nhanh hơn nhiều so với JOIN với CTE đã materialize
+    match = search_index.match_statement(ranked=False).cte('matches') if text_mode == 'fts' else None
+    no_value, no_bucket = cast(null(), db.String), cast(null(), db.Integer)
+    count = func.count()
+
+    def facet(name, value, bucket, exclude=None):
+        return _select(shape, match, literal(name).label('facet'), value.label('value'),
+                       bucket.label('bucket'), count.label('count'), exclude=exclude)
+
+    arms = [facet('total', no_value, no_bucket)]
+    arms.append(select(
+        facet('product_type', Post.product_type, no_bucket, exclude='product_type')
+        .group_by(Post.product_type)
+        .order_by(count.desc(), Post.product_type)
+        .limit(FACET_LIMIT)
+        .subquery()
+    ))
+
+    if text_mode is None and 'seller_id' not in filters:
+        # Mọi bộ lọc còn lại đều nằm trong chỉ mục (is_active, [product_type,] price):
+        # đếm từng khoảng giá bằng một lần quét khoảng chỉ mục, không phải tính CASE cho mọi dòng
+        for index, (low, high) in _bucket_ranges():
+            arm = facet('price', no_value, literal_column(str(index)), exclude='price')
+            arm = arm.where(Post.price >= literal_column(str(low)))
+            if high is not None:
+                arm = arm.where(Post.price < literal_column(str(high)))
+            arms.append(arm)
+    else:
+        bucket = _price_bucket()
+        arms.append(facet('price', no_value, bucket, exclude='price').group_by(bucket))
+
+    return page, union_all(*arms)
+
+
+class SearchService:
+    @staticmethod
+    @cache.cached
+    def search(query=None, min_price=None, max_price=None, seller_id=None, product_type=None,
+               in_stock=True, sort=None, facets=True, limit=None, cursor=None):
+        """Search posts by text, price range, seller and product type at once.
+
+        Sorts by relevance (when there is a text query), newest, price_asc or
+        price_desc, with keyset pagination on the sort key. With facets, also
+        returns the total number of matches and counts per product type and
+        per price bucket; each facet ignores its own filter, so a client can
+        show the alternatives to the current selection. Runs one statement for
+        the page and one for all facet counts.
+        """
+        page, facet_statement, params, sort = SearchService._prepare(
+            query, min_price, max_price, seller_id, product_type, in_stock, sort, facets, limit, cursor
+        )
+        session = read_session()
+        rows = session.execute(page, params).all()
+        facet_rows = session.execute(facet_statement, params) if facet_statement is not None else None
+        return SearchService._result(rows, facet_rows, sort, limit)
+
+    @staticmethod
+    @cache.cached
+    async def search_async(query=None, min_price=None, max_price=None, seller_id=None, product_type=None,
+                           in_stock=True, sort=None, facets=True, limit=None, cursor=None):
+        """search() for the ASGI app, running the same statements through the async engine"""
+        page, facet_statement, params, sort = SearchService._prepare(
+            query, min_price, max_price, seller_id, product_type, in_stock, sort, facets, limit, cursor
+        )
+        rows = await async_db.fetch_all(page, params)
+        facet_rows = await async_db.fetch_all(facet_statement, params) if facet_statement is not None else None
+        return SearchService._result(rows, facet_rows, sort, limit)
+
+    @staticmethod
+    def _prepare(query, min_price, max_price, seller_id, product_type, in_stock, sort, facets, limit, cursor):
+        """Page statement, facet statement (or None), bind parameters and effective sort of a search"""
+        params = {}
+        text_mode = None
+        if query:
+            expression = search_index.build_match_expression(query)
+            if expression and search_index.get_backend().name == search_index.Fts5SearchBackend.name:
+                text_mode = 'fts'
+                params['expression'] = expression
+            else:
+                text_mode = 'like'
+                params['pattern'] = f"%{query}%"
+
+        filters = {'min_price': min_price, 'max_price': max_price, 'seller_id': seller_id, 'product_type': product_type}
+        params.update((name, value) for name, value in filters.items() if value is not None)
+
+        if sort is None or (sort == 'relevance' and text_mode != 'fts'):
+            sort = 'relevance' if text_mode == 'fts' else 'newest'
+
+        if cursor is not None:
+            key, row_id = cursor
+            # Con trỏ phải thuộc đúng kiểu sắp xếp: thời điểm cho newest, số cho giá và độ liên quan
+            if isinstance(key, datetime) != (sort == 'newest'):
+                raise ValueError("Invalid cursor")
+            params.update(cursor_key=key, cursor_id=row_id)
+        if limit is not None:
+            params['limit'] = limit + 1
+
+        shape = (text_mode, tuple(sorted(params.keys() & filters.keys())), bool(in_stock), sort,
+                 cursor is not None, limit is not None, bool(facets))
+        page, facet_statement = _statements(shape)
+        return page, facet_statement, params, sort
+
+    @staticmethod
+    def _result(rows, facet_rows, sort, limit):
+        result = {}
+        if limit is not None:
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                sort_key = {'relevance': last[-1], 'newest': last.created_at}.get(sort, last.price)
+                next_cursor = encode_cursor(sort_key, last.id)
+            result['next_cursor'] = next_cursor
+        result['posts'] = POST_FIELDS.to_dicts(rows)
+
+        if facet_rows is not None:
+            result.update(SearchService._facets(facet_rows))
+        return result
+
+    @staticmethod
+    def _facets(rows):
+        total = 0
+        product_types = []
+        prices = [
+            {'min': low, 'max': high, 'count': 0}
+            for low, high in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + (None,))
+        ]
+        for facet, value, bucket, count in rows:
+            if facet == 'total':
+                total = count
+            elif facet == 'product_type':
+                product_types.append({'value': value, 'count': count})
+            else:
+                prices[bucket]['count'] = count
+
+        product_types.sort(key=lambda item: (-item['count'], item['value']))
+        return {'total': total, 'facets': {'product_type': product_types, 'price': prices}}
+
+
+def statement_cache_info():
+    """Hits and misses of the per-shape statement cache"""
+    return _statements.cache_info()
@@ -0,0 +1,86 @@
+from flask import Response, current_app
+
+from models import db, Order, Post, User
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, thiếu thì dùng JSON provider của Flask
+    orjson = None
+
+
+class Projection:
+    """The columns behind a model's to_dict(), selected as plain rows.
+
+    Querying only these columns skips ORM instances and the identity map;
+    to_dict() turns a row back into exactly what Model.to_dict() returns.
+    Extra trailing columns on a row (such as a search rank) are ignored.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = tuple(column.label(key) for key, column in fields)
+        self._datetime_keys = tuple(key for key, column in fields if isinstance(column.type, db.DateTime))
+
+    def select(self, query):
+        """Restrict a Model.query to the projected columns, keeping its filters and joins"""
+        return query.with_entities(*self.columns)
+
+    def to_dict(self, row):
+        data = dict(zip(self.keys, row))
+        for key in self._datetime_keys:
+            value = data[key]
+            data[key] = value.isoformat() if value else None
+        return data
+
+    def to_dicts(self, rows):
+        return [self.to_dict(row) for row in rows]
+
+
+USER_FIELDS = Projection([
+    ('id', User.id),
+    ('username', User.username),
+    ('email', User.email),
+    ('is_admin', User.is_admin),
+    ('created_at', User.created_at),
+    ('updated_at', User.updated_at),
+])
+
+POST_FIELDS = Projection([
+    ('id', Post.id),
+    ('user_id', Post.user_id),
+    ('product_type', Post.product_type),
+    ('quantity', Post.quantity),
+    ('price', Post.price),
+    ('description', Post.description),
+    ('contact_info', Post.contact_info),
+    ('is_active', Post.is_active),
+    ('created_at', Post.created_at),
+    ('updated_at', Post.updated_at),
+])
+
+# Bảng tin: to_dict() của bài đăng cùng tên người bán, lấy bằng join thay vì post.author cho từng dòng
+FEED_FIELDS = Projection(POST_FIELDS.fields + (('seller', User.username),))
+
+ORDER_FIELDS = Projection([
+    ('id', Order.id),
+    ('post_id', Order.post_id),
+    ('seller_id', Order.seller_id),
+    ('buyer_id', Order.buyer_id),
+    ('quantity', Order.quantity),
+    ('price', Order.price),
+    # Tính tổng tiền trong SQL thay vì trong Python
+    ('total', Order.quantity * Order.price),
+    ('status', Order.status),
+    ('created_at', Order.created_at),
+    ('updated_at', Order.updated_at),
+])
+
+
+def json_response(payload):
+    """Drop-in for jsonify() that encodes with orjson when it is installed"""
+    if orjson is None:
+        return current_app.json.response(payload)
+
+    option = orjson.OPT_SORT_KEYS if current_app.json.sort_keys else 0
+    return Response(orjson.dumps(payload, option=option) + b'\n', mimetype='application/json')
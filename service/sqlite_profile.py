@@ -0,0 +1,90 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def _pragmas(config):
+    """PRAGMA statements for the configured profile; unset values keep SQLite's defaults"""
+    pragmas = []
+
+    journal_mode = config.get('SQLITE_JOURNAL_MODE')
+    if journal_mode:
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown SQLite journal mode: {journal_mode}")
+        pragmas.append(f"PRAGMA journal_mode={journal_mode.upper()}")
+
+    synchronous = config.get('SQLITE_SYNCHRONOUS')
+    if synchronous:
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown SQLite synchronous mode: {synchronous}")
+        pragmas.append(f"PRAGMA synchronous={synchronous.upper()}")
+
+    for name, key in (('mmap_size', 'SQLITE_MMAP_SIZE'), ('cache_size', 'SQLITE_CACHE_SIZE')):
+        value = config.get(key)
+        if value is not None:
+            pragmas.append(f"PRAGMA {name}={int(value)}")
+
+    return pragmas
+
+
+def configure_engine(app):
+    """Fill in pool and driver options for a file-backed SQLite database.
+
+    Must run before db.init_app. Values given explicitly in
+    SQLALCHEMY_ENGINE_OPTIONS win over the profile.
+    """
+    if not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    for option, key in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                        ('pool_timeout', 'DB_POOL_TIMEOUT')):
+        if app.config.get(key) is not None:
+            options.setdefault(option, app.config[key])
+
+    # Driver sqlite3 tự đặt busy timeout qua tham số timeout (giây)
+    busy_timeout = app.config.get('SQLITE_BUSY_TIMEOUT')
+    if busy_timeout is not None:
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('timeout', busy_timeout / 1000)
+        options['connect_args'] = connect_args
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_app(app):
+    """Apply the SQLite PRAGMA profile to every new pooled connection.
+
+    Must run after db.init_app and before the first connection is opened.
+    """
+    with app.app_context():
+        apply_profile(app, db.engine)
+
+
+def apply_profile(app, engine):
+    """Run the PRAGMA profile on every new connection of `engine` (sync, or the sync_engine of an async one)"""
+    if not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    pragmas = _pragmas(app.config)
+    if not pragmas:
+        return
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', apply_pragmas)
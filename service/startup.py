@@ -0,0 +1,207 @@
+import ast
+import os
+import re
+import weakref
+
+import click
+from flask import current_app
+from flask.cli import ScriptInfo, with_appcontext
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
+
+from models import db, User
+
+MIGRATIONS_DIRECTORY = 'migrations'
+ADMIN_USERNAME = 'admin'
+
+_REVISION_LINE = re.compile(r"^(revision|down_revision)\s*=\s*(.+)$", re.MULTILINE)
+
+_engines = weakref.WeakSet()
+_fork_hooks_installed = False
+
+
+def migrations_directory(app):
+    return os.path.join(app.root_path, MIGRATIONS_DIRECTORY)
+
+
+def head_revision(directory):
+    """Head revision of the migration scripts, or None when there is not exactly one.
+
+    Read from the `revision` / `down_revision` lines of the scripts rather
+    than through alembic, which takes longer to import than the whole app.
+    """
+    revisions, parents = set(), set()
+    for name in os.listdir(os.path.join(directory, 'versions')):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(directory, 'versions', name), encoding='utf-8') as f:
+            for key, value in _REVISION_LINE.findall(f.read()):
+                value = ast.literal_eval(value.strip())
+                if key == 'revision':
+                    revisions.add(value)
+                elif isinstance(value, (tuple, list)):
+                    parents.update(value)
+                elif value:
+                    parents.add(value)
+
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def current_revision():
+    """Revision stamped in alembic_version, or None for a database without one"""
+    try:
+        return db.session.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DatabaseError:
+        # Chưa có bảng alembic_version: cơ sở dữ liệu rỗng, hoặc tạo bằng create_all trước khi có phiên bản
+        db.session.rollback()
+        return None
+
+
+def init_database(app, upgrade=False):
+    """Bring the database up to the current schema and create the admin account.
+
+    An empty database gets the tables from the models and is stamped at the
+    head revision. One with tables but no stamped revision (made by
+    create_all before migrations were tracked) is migrated from the start,
+    since the migrations add the indexes and backfill the rollups create_all
+    leaves out; they skip the tables that already exist. So is one stamped at
+    an older revision. Migrating only happens when `upgrade` is set: several
+    workers starting at once must not race through the same migration.
+    Returns (result, error).
+    """
+    directory = migrations_directory(app)
+    head = head_revision(directory)
+    revision = current_revision()
+    result = {"revision": revision, "head": head, "created": False, "upgraded": False, "admin_created": False}
+
+    if revision is None and not _has_tables():
+        db.create_all()
+        _stamp(directory)
+        result['created'] = True
+    elif revision != head:
+        if not upgrade:
+            found = f"at revision {revision}" if revision else "not versioned"
+            return result, f"Database schema is {found}, expected {head}; run `flask init-db`"
+        import flask_migrate
+        _init_migrate(app)
+        flask_migrate.upgrade(directory)
+        result['upgraded'] = True
+
+    admin = db.session.query(db.exists().where(User.username == ADMIN_USERNAME)).scalar()
+    if not admin:
+        # Import muộn: user_service kéo theo cache, chỉ mục và job, không cần cho đường khởi động nhanh
+        from service.user_service import UserService
+        user, error = UserService.create_user(ADMIN_USERNAME, 'admin@example.com', 'admin123', is_admin=True)
+        if error:
+            return result, error
+        result['admin_created'] = True
+
+    return result, None
+
+
+def _has_tables():
+    """Whether any table of the models already exists"""
+    return bool(set(inspect(db.engine).get_table_names()) & set(db.metadata.tables))
+
+
+def _stamp(directory):
+    # Ghi phiên bản trực tiếp qua MigrationContext: alembic.command.stamp chạy env.py,
+    # mà env.py cấu hình lại logging của cả tiến trình
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    with db.engine.begin() as connection:
+        MigrationContext.configure(connection).stamp(ScriptDirectory(directory), 'head')
+
+
+def _init_migrate(app):
+    """Attach Flask-Migrate, which replaces the lazy `flask db` group with its own"""
+    from flask_migrate import Migrate
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=migrations_directory(app))
+
+
+class LazyMigrateGroup(click.Group):
+    """`flask db`, importing Flask-Migrate (and alembic with it) only when the command runs"""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # Nhường hẳn cho nhóm lệnh của Flask-Migrate, để các tùy chọn --directory, --x-arg của nó vẫn dùng được
+        _init_migrate(parent.ensure_object(ScriptInfo).load_app())
+        from flask_migrate.cli import db as migrate_group
+        return migrate_group.make_context(info_name, args, parent=parent, **extra)
+
+
+def dispose_after_fork(engine):
+    """Give a forked child process its own connection pool for `engine`.
+
+    The parent closes its idle connections right before forking and the
+    child drops whatever pool it inherited without touching it, so a preloaded
+    app (gunicorn --preload) never shares a SQLite connection across processes.
+    """
+    global _fork_hooks_installed
+
+    _engines.add(engine)
+    if not _fork_hooks_installed and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=_close_idle_connections, after_in_child=_drop_inherited_pools)
+        _fork_hooks_installed = True
+
+
+def _close_idle_connections():
+    for engine in list(_engines):
+        # Engine async chỉ đóng được kết nối trên event loop của nó; tiến trình cha không mở kết nối async
+        if not engine.dialect.is_async:
+            engine.dispose()
+
+
+def _drop_inherited_pools():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+def init_app(app):
+    """Check the schema revision at startup and register `flask init-db` and `flask db`.
+
+    Must be called inside an application context, before anything reads the
+    database. When the database is stamped at the head revision, startup
+    skips create_all and the admin seed altogether, one query instead of one
+    per table. Otherwise DB_INIT_ON_STARTUP runs init_database() without
+    migrating, which sets up an empty database and only logs that
+    `flask init-db` is due for any other; turned off, startup just logs it.
+    """
+    for engine in db.engines.values():
+        dispose_after_fork(engine)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(LazyMigrateGroup('db', help="Perform database migrations."))
+
+    head = head_revision(migrations_directory(app))
+    if head is not None and current_revision() == head:
+        return
+
+    if not app.config.get('DB_INIT_ON_STARTUP'):
+        app.logger.warning("Database schema is not current; run `flask init-db`")
+        return
+
+    result, error = init_database(app)
+    if error:
+        app.logger.warning(error)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or migrate the database schema and create the admin account, once per deploy."""
+    result, error = init_database(current_app, upgrade=True)
+    if error:
+        raise click.ClickException(error)
+
+    if result['created']:
+        click.echo(f"Created the schema at revision {result['head']}")
+    elif result['upgraded']:
+        found = f"revision {result['revision']}" if result['revision'] else "an unversioned database"
+        click.echo(f"Upgraded the schema from {found} to {result['head']}")
+    else:
+        click.echo(f"Schema is current at revision {result['head']}")
+    if result['admin_created']:
+        click.echo(f"Created the {ADMIN_USERNAME} account")
@@ -0,0 +1,105 @@
+from sqlalchemy import case, delete, func, or_, select, true
+
+from models import db, Order, UserStats
+from service.upsert import upsert_insert
+
+# Cột của orders xác định người dùng, và các cột thống kê tương ứng: (số đơn, số lượng, doanh thu, lần cuối)
+SIDES = (
+    ('seller_id', ('sales_count', 'units_sold', 'gross_revenue', 'last_sale_at')),
+    ('buyer_id', ('purchase_count', 'units_bought', 'gross_spent', 'last_purchase_at')),
+)
+
+
+class StatsService:
+    @staticmethod
+    def record_orders(orders):
+        """Add flushed orders to their seller's and buyer's stats.
+
+        Runs inside the caller's transaction, so the stats commit or roll back
+        together with the orders.
+        """
+        for user_column, (count, units, amount, last_at) in SIDES:
+            totals = {}
+            for order in orders:
+                user_id = getattr(order, user_column)
+                row = totals.setdefault(user_id, {
+                    'user_id': user_id, count: 0, units: 0, amount: 0.0, last_at: order.created_at
+                })
+                row[count] += 1
+                row[units] += order.quantity
+                row[amount] += order.quantity * order.price
+                row[last_at] = max(row[last_at], order.created_at)
+
+            stmt = upsert_insert(UserStats)
+            current_last = getattr(UserStats, last_at)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={
+                    count: getattr(UserStats, count) + stmt.excluded[count],
+                    units: getattr(UserStats, units) + stmt.excluded[units],
+                    amount: getattr(UserStats, amount) + stmt.excluded[amount],
+                    last_at: case(
+                        (or_(current_last.is_(None), current_last < stmt.excluded[last_at]), stmt.excluded[last_at]),
+                        else_=current_last
+                    ),
+                }
+            )
+            db.session.execute(stmt, list(totals.values()))
+
+    @staticmethod
+    def refresh_users(user_ids=None):
+        """Recompute stats from the orders table, for some users or for everyone.
+
+        Used after orders are deleted, and by the bulk rebuild. Does not commit.
+        """
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            if not user_ids:
+                return
+            db.session.execute(delete(UserStats).where(UserStats.user_id.in_(user_ids)))
+        else:
+            db.session.execute(delete(UserStats))
+
+        for user_column, (count, units, amount, last_at) in SIDES:
+            user_id = getattr(Order, user_column)
+            totals = (
+                select(
+                    user_id,
+                    func.count(Order.id),
+                    func.sum(Order.quantity),
+                    func.sum(Order.quantity * Order.price),
+                    func.max(Order.created_at)
+                )
+                # SQLite cần mệnh đề WHERE trước ON CONFLICT trong INSERT ... SELECT
+                .where(user_id.in_(user_ids) if user_ids is not None else true())
+                .group_by(user_id)
+            )
+            stmt = upsert_insert(UserStats).from_select(['user_id', count, units, amount, last_at], totals)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={column: stmt.excluded[column] for column in (count, units, amount, last_at)}
+            )
+            db.session.execute(stmt)
+
+    @staticmethod
+    def rebuild():
+        """Recompute every user's stats from orders and return how many rows were written"""
+        try:
+            StatsService.refresh_users()
+            db.session.commit()
+            return db.session.query(func.count(UserStats.user_id)).scalar(), None
+        except Exception as e:
+            db.session.rollback()
+            return None, str(e)
+
+    @staticmethod
+    def get_user_stats(user_id):
+        """Order totals of a user as a buyer and as a seller, zeros if they have no orders yet"""
+        stats = db.session.get(UserStats, user_id)
+        if stats is None:
+            stats = UserStats(
+                user_id=user_id,
+                sales_count=0, units_sold=0, gross_revenue=0.0,
+                purchase_count=0, units_bought=0, gross_spent=0.0
+            )
+        return stats.to_dict()
@@ -0,0 +1,265 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from operator import itemgetter
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+
+from models import db, Post
+from service.search_index import fold_text
+
+EXTENSION_KEY = 'suggest_index'
+PENDING_KEY = 'suggest_index_changes'
+# Số gợi ý được tính sẵn cho mỗi tiền tố, cũng là giới hạn tối đa của ?limit=
+MAX_SUGGESTIONS = 10
+# Mỗi tiền tố nhớ sâu hơn số gợi ý, để một product_type tụt hạng không bắt tính lại ngay
+TOP_DEPTH = 4 * MAX_SUGGESTIONS
+# Các tiền tố ngắn (nhiều khóa nhất) được tính sẵn khi nạp
+WARM_PREFIX_LENGTH = 2
+# Số tiền tố được nhớ kết quả
+TOP_CACHE_SIZE = 10000
+
+_LAST_CHARACTER = chr(0x10FFFF)
+
+_session_hooks_installed = False
+
+
+def normalize(value):
+    """Accent-folded, lowercased text with collapsed whitespace, the form keys and prefixes are compared in"""
+    return ' '.join(fold_text(value).split())
+
+
+class SuggestIndex:
+    """Distinct product types of active posts, looked up by prefix.
+
+    Keys are kept in a sorted list of (normalized product_type, product_type)
+    searched with bisect, next to a count of active posts per product type.
+    The top TOP_DEPTH entries of each prefix asked for are remembered and
+    kept exact as counts change: a product type moving up is merged into the
+    remembered lists of its prefixes, and one dropping below the last place is
+    removed from them (someone unlisted may now rank higher). A prefix is only
+    recomputed when its list gets shorter than MAX_SUGGESTIONS; prefixes of up
+    to WARM_PREFIX_LENGTH characters, the ones with the most keys to scan, are
+    computed while loading.
+
+    Like the price index, this is per process and reloaded after max_age.
+    """
+
+    def __init__(self, max_age=0):
+        self.max_age = max_age
+        self.loaded_at = None
+        self._keys = []
+        self._counts = {}
+        self._top = OrderedDict()
+        self._loading = False
+        self._journal = None
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        return bool(self.max_age) and time.monotonic() - self.loaded_at > self.max_age
+
+    def ensure_loaded(self):
+        """Load the counts if they are cold or older than max_age; False while another thread loads a cold index"""
+        if not self.is_stale():
+            return True
+
+        with self._lock:
+            if self._loading:
+                return self.loaded_at is not None
+            self._loading = True
+
+        try:
+            self.load(db.session.execute(
+                select(Post.product_type, func.count()).where(Post.is_active == True).group_by(Post.product_type)
+            ))
+        finally:
+            with self._lock:
+                self._loading = False
+        return True
+
+    def load(self, rows):
+        """Replace the index with (product_type, active post count) rows.
+
+        Changes committed while the rows are read are replayed afterwards. A
+        change that landed just before the read started is then counted twice;
+        the next reload corrects it.
+        """
+        with self._lock:
+            self._journal = []
+
+        try:
+            counts = {product_type: count for product_type, count in rows if product_type}
+            keys = sorted((normalize(product_type), product_type) for product_type in counts)
+            top = OrderedDict()
+            for length in range(WARM_PREFIX_LENGTH + 1):
+                groups = {}
+                for key, product_type in keys:
+                    if len(key) >= length:
+                        groups.setdefault(key[:length], []).append((-counts[product_type], product_type))
+                for prefix, entries in groups.items():
+                    top[prefix] = _TopList(entries, complete=len(entries) <= TOP_DEPTH)
+            with self._lock:
+                self._keys, self._counts, self._top = keys, counts, top
+                for product_type, delta in self._journal:
+                    self._change(product_type, delta)
+        finally:
+            with self._lock:
+                self._journal = None
+        self.loaded_at = time.monotonic()
+
+    def apply(self, changes):
+        """Apply committed (product_type, change in active post count) pairs"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.extend(changes)
+            for product_type, delta in changes:
+                self._change(product_type, delta)
+
+    def _change(self, product_type, delta):
+        # Gọi khi đang giữ khóa
+        if not product_type or not delta:
+            return
+
+        key = (normalize(product_type), product_type)
+        old = self._counts.get(product_type, 0)
+        new = old + delta
+        if new > 0:
+            self._counts[product_type] = new
+            if old <= 0:
+                bisect.insort(self._keys, key)
+        else:
+            self._counts.pop(product_type, None)
+            if old > 0:
+                index = bisect.bisect_left(self._keys, key)
+                if index < len(self._keys) and self._keys[index] == key:
+                    del self._keys[index]
+
+        entry = (-new, product_type)
+        for length in range(len(key[0]) + 1):
+            prefix = key[0][:length]
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+
+            entries = top.entries
+            position = next((i for i, (_, name) in enumerate(entries) if name == product_type), None)
+            if position is not None:
+                del entries[position]
+                if new > 0 and (delta > 0 or top.complete or (entries and entry < entries[-1])):
+                    bisect.insort(entries, entry)
+                elif not top.complete and len(entries) < MAX_SUGGESTIONS:
+                    # Không còn đủ gợi ý chắc chắn đúng, tính lại ở lần gợi ý sau
+                    del self._top[prefix]
+            elif new > 0 and (top.complete or entry < entries[-1]):
+                bisect.insort(entries, entry)
+                if len(entries) > TOP_DEPTH:
+                    del entries[TOP_DEPTH:]
+                    top.complete = False
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """[(product_type, active post count)] starting with `prefix`, most listed first"""
+        prefix = normalize(prefix)
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is not None:
+                self._top.move_to_end(prefix)
+            else:
+                top = self._top[prefix] = self._matching(prefix)
+                if len(self._top) > TOP_CACHE_SIZE:
+                    self._top.popitem(last=False)
+            return [(product_type, -negated) for negated, product_type in top.entries[:limit]]
+
+    def _matching(self, prefix):
+        # Gọi khi đang giữ khóa; các khóa có cùng tiền tố nằm liền nhau trên mảng đã sắp xếp
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + _LAST_CHARACTER,), start)
+        names = list(map(itemgetter(1), self._keys[start:end]))
+        counts = list(map(self._counts.__getitem__, names))
+        if len(names) <= TOP_DEPTH:
+            return _TopList([(-count, name) for count, name in zip(counts, names)], complete=True)
+        # So sánh số nguyên rẻ hơn nhiều so với tuple: lấy ngưỡng trước, chỉ dựng tuple cho các ứng viên
+        threshold = heapq.nlargest(TOP_DEPTH, counts)[-1]
+        return _TopList([(-count, name) for count, name in zip(counts, names) if count >= threshold], complete=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'product_types': len(self._keys),
+                'cached_prefixes': len(self._top),
+                'loaded': self.loaded_at is not None,
+                'age': time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+            }
+
+
+class _TopList:
+    """Best (-count, product_type) entries of a prefix, complete when no product type of the prefix was cut off"""
+
+    __slots__ = ('entries', 'complete')
+
+    def __init__(self, entries, complete):
+        self.entries = heapq.nsmallest(TOP_DEPTH, entries)
+        self.complete = complete
+
+
+def init_app(app):
+    """Attach the product type suggestion index to the app.
+
+    It loads lazily on the first suggestion request. Write paths queue count
+    changes on the session, applied after the commit like the price index.
+    """
+    global _session_hooks_installed
+
+    app.extensions[EXTENSION_KEY] = SuggestIndex(app.config.get('SUGGEST_INDEX_MAX_AGE') or 0)
+
+    if not _session_hooks_installed:
+        event.listen(db.session, 'after_commit', _apply_pending)
+        event.listen(db.session, 'after_rollback', _discard_pending)
+        _session_hooks_installed = True
+
+
+def get_index():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def suggest(prefix, limit=MAX_SUGGESTIONS):
+    """Top product types for a prefix, as dicts ready for JSON"""
+    index = get_index()
+    if index is None or not index.ensure_loaded():
+        return []
+    return [
+        {'product_type': product_type, 'count': count}
+        for product_type, count in index.suggest(prefix, min(limit, MAX_SUGGESTIONS))
+    ]
+
+
+def _queue(changes):
+    if get_index() is not None:
+        db.session.info.setdefault(PENDING_KEY, []).extend(changes)
+
+
+def listings_opened(product_types):
+    """Queue one more active post for each product type given (with repeats)"""
+    _queue([(product_type, 1) for product_type in product_types])
+
+
+def listings_closed(product_types):
+    """Queue one less active post for each product type given (with repeats)"""
+    _queue([(product_type, -1) for product_type in product_types])
+
+
+def _apply_pending(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    index = get_index()
+    if changes and index is not None:
+        index.apply(changes)
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
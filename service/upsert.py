@@ -0,0 +1,26 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db
+
+# Cả hai dialect đều hỗ trợ INSERT ... ON CONFLICT DO UPDATE với cùng một API
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def upsert_insert(model):
+    """INSERT for `model` that supports on_conflict_do_update() on the current dialect"""
+    return _UPSERT_INSERTS[db.session.get_bind().dialect.name](model)
+
+
+def init_app(app):
+    """Refuse to start on a database without INSERT ... ON CONFLICT.
+
+    Orders, post writes and jobs all upsert their rollups, so on any other
+    dialect they would fail one by one at runtime. Must run in an app context.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        raise ValueError(f"Unsupported database {dialect}: rollups need INSERT ... ON CONFLICT "
+                         f"({' or '.join(_UPSERT_INSERTS)})")
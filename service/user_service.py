@@ -1,4 +1,12 @@
-from models import db, User
+from models import db, Order, Post, User
+from sqlalchemy.orm import selectinload
+from service import cache, events, identity, jobs, price_index, search_index, suggest_index
+from service.analytics_service import AnalyticsService
+from service.post_service import PostService
+from service.query_budget import query_budget
+from service.replica import read_query
+from service.serialization import USER_FIELDS
+from service.stats_service import StatsService
 from flask_jwt_extended import create_access_token
 import re
 
@@ -55,7 +63,8 @@ class UserService:
         else:
             user = User.query.filter_by(username=username).first()
 
-        if not user or user.password != password:  # Should use password hashing
+        # Tài khoản đã bị admin xóa (đang chờ job purge_user) không đăng nhập được nữa
+        if not user or not user.is_active or user.password != password:  # Should use password hashing
             return None, "Invalid username or password"
 
         # Create access token
@@ -66,26 +75,89 @@ class UserService:
     def get_user_by_id(user_id):
         """Get a user by ID"""
         user = User.query.get(user_id)
-        if not user:
+        if not user or not user.is_active:
             return None, "User not found"
         return user, None
 
     @staticmethod
+    @query_budget(1)
     def get_all_users():
         """Get all users (admin function)"""
-        users = User.query.all()
-        return [user.to_dict() for user in users]
+        return USER_FIELDS.to_dicts(USER_FIELDS.select(read_query(User).filter(User.is_active == True)))
+
+    @staticmethod
+    def iter_all_users(batch_size=1000):
+        """Yield every user as a dict, reading the table in batches (admin function)"""
+        for row in USER_FIELDS.select(User.query.filter(User.is_active == True).order_by(User.id)).yield_per(batch_size):
+            yield USER_FIELDS.to_dict(row)
 
     @staticmethod
     def delete_user(user_id):
-        """Delete a user (admin function)"""
+        """Delete a user (admin function).
+
+        The account is disabled and its posts leave the listings in this
+        transaction; a background job deletes their posts, and the account
+        itself unless it has purchases, later.
+        """
         user = User.query.get(user_id)
-        if not user:
+        if not user or not user.is_active:
             return False, "User not found"
 
         try:
-            db.session.delete(user)
+            user.is_active = False
+            for post_id in PostService.withdraw_posts(Post.user_id == user_id):
+                events.publish('post-deleted', {'id': post_id})
+            jobs.enqueue('purge_user', {'user_id': user_id})
             db.session.commit()
+            identity.invalidate_user(user_id)
+            cache.invalidate()
+            return True, None
+        except Exception as e:
+            db.session.rollback()
+            return False, str(e)
+
+    @staticmethod
+    @query_budget(24)
+    def purge_user(user_id):
+        """Delete a user's posts, and the user too unless they bought from others.
+
+        Orders the user placed are part of other sellers' sales history, so
+        a user with purchases keeps their (disabled) row and only loses their
+        own posts, with the orders on them. Returns (False, None) when the
+        user is already gone.
+        """
+        # Nạp trước mọi thứ mà cascade sẽ xóa, để số câu lệnh không tăng theo số bài đăng
+        user = User.query.options(
+            selectinload(User.posts).selectinload(Post.orders),
+            selectinload(User.sales),
+            selectinload(User.stats),
+        ).filter_by(id=user_id).first()
+        if not user:
+            return False, None
+
+        try:
+            # Các bài đăng bị xóa theo cascade cũng phải được gỡ khỏi chỉ mục tìm kiếm
+            search_index.remove_posts([post.id for post in user.posts])
+            AnalyticsService.remove_posts([post.id for post in user.posts])
+            price_index.remove_posts([post.id for post in user.posts])
+            suggest_index.listings_closed([post.product_type for post in user.posts if post.is_active])
+            buyers = {order.buyer_id for post in user.posts for order in post.orders} - {user_id}
+            has_purchases = db.session.query(
+                db.exists().where(Order.buyer_id == user_id, Order.seller_id != user_id)
+            ).scalar()
+            if has_purchases:
+                # Giữ lại tài khoản (đã bị vô hiệu hóa) để đơn hàng của người bán khác vẫn còn
+                for post in user.posts:
+                    db.session.delete(post)
+                buyers.add(user_id)
+            else:
+                db.session.delete(user)
+            if buyers:
+                db.session.flush()
+                StatsService.refresh_users(buyers)
+            db.session.commit()
+            cache.invalidate()
+            identity.invalidate_user(user_id)
             return True, None
         except Exception as e:
             db.session.rollback()
@@ -95,10 +167,11 @@ class UserService:
     def update_user(user_id, data):
         """Update user information"""
         user = User.query.get(user_id)
-        if not user:
+        if not user or not user.is_active:
             return None, "User not found"
 
         try:
+            username = user.username
             # Cập nhật các trường được cung cấp
             if 'username' in data:
                 # Kiểm tra xem username mới đã tồn tại chưa (nếu khác username hiện tại)
@@ -128,8 +201,20 @@ class UserService:
                     return None, "Password must be at least 6 characters long"
                 user.password = data['password']  # Should hash password
 
+            renamed = user.username != username
             db.session.commit()
+            identity.invalidate_user(user_id)
+            if renamed:
+                # Tên người bán nằm trong bảng tin đã được cache
+                cache.invalidate()
             return user, None
         except Exception as e:
             db.session.rollback()
-            return None, str(e)
\ No newline at end of file
+            return None, str(e)
+
+
+@jobs.job('purge_user')
+def purge_user_job(user_id):
+    _, error = UserService.purge_user(user_id)
+    if error:
+        raise jobs.JobError(error)
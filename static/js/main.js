@@ -4,6 +4,7 @@ import { getFirestore, collection, getDocs, query, orderBy } from 'firebase/fire
 function init() {
   get_username();
   get_posts();
+  subscribeToListings();
 }
 
 function get_username() {
@@ -189,6 +190,38 @@ searchInput.addEventListener('keypress', (event) => {
   if (event.key === 'Enter') handleSearch();
 });
 
+// Gợi ý loại sản phẩm khi gõ; yêu cầu cũ bị hủy khi có ký tự mới
+const searchSuggestions = document.getElementById('search-suggestions');
+let suggestController = null;
+
+searchInput.addEventListener('input', async () => {
+  const prefix = searchInput.value.trim();
+  if (suggestController) suggestController.abort();
+  if (!prefix) {
+    searchSuggestions.innerHTML = '';
+    return;
+  }
+
+  suggestController = new AbortController();
+  try {
+    const response = await fetch(`/api/posts/suggest?prefix=${encodeURIComponent(prefix)}`, {
+      signal: suggestController.signal
+    });
+    if (!response.ok) return;
+
+    const data = await response.json();
+    searchSuggestions.innerHTML = '';
+    data.suggestions.forEach(suggestion => {
+      const option = document.createElement('option');
+      option.value = suggestion.product_type;
+      option.label = `${suggestion.count} bài đăng`;
+      searchSuggestions.appendChild(option);
+    });
+  } catch (error) {
+    if (error.name !== 'AbortError') console.error('Lỗi gợi ý:', error);
+  }
+});
+
 async function get_posts() {
   try {
     const posts = await fetch('/api/post', 
@@ -215,3 +248,32 @@ async function get_posts() {
     return [];
   }
 }
+
+// Nhận bài đăng mới và thay đổi qua SSE thay vì tải lại cả danh sách;
+// EventSource tự kết nối lại và gửi Last-Event-ID để nhận các sự kiện bị lỡ
+function subscribeToListings() {
+  if (!window.EventSource) return;
+
+  const source = new EventSource('/api/posts/stream');
+  const apply = (type, handler) => source.addEventListener(type, event => {
+    const data = JSON.parse(event.data);
+    const index = initialListings.findIndex(listing => listing.id === data.id);
+    handler(data, index);
+    renderListings(searchInput.value);
+  });
+  const remove = index => { if (index !== -1) initialListings.splice(index, 1); };
+
+  apply('post-created', (post, index) => { if (index === -1) initialListings.unshift(post); });
+  apply('post-updated', (post, index) => {
+    if (!post.is_active) return remove(index);
+    if (index === -1) initialListings.unshift(post);
+    else initialListings[index] = post;
+  });
+  apply('stock-changed', (stock, index) => {
+    if (!stock.is_active) return remove(index);
+    if (index !== -1) initialListings[index].quantity = stock.quantity;
+  });
+  apply('post-deleted', (post, index) => remove(index));
+  // Server không còn giữ các sự kiện bị lỡ: tải lại danh sách
+  source.addEventListener('reset', () => get_posts());
+}
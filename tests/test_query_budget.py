@@ -0,0 +1,105 @@
+"""The @query_budget caps of the list services, run with QUERY_BUDGET_MODE=raise.
+
+    python -m pytest tests
+
+A list that loads a relationship per row (an N+1) runs more statements than
+its budget and fails here instead of slowing down in production.
+"""
+import pytest
+
+from app import create_app
+from config import Config
+from models import db, Post
+from service.order_service import OrderService
+from service.pagination import decode_cursor
+from service.post_service import PostService
+from service.query_budget import QueryBudgetExceeded, query_budget
+from service.user_service import UserService
+
+SELLERS = 5
+POSTS_PER_SELLER = 4
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        SECRET_KEY = 'test'
+        JWT_SECRET_KEY = 'test-secret-key-for-query-budgets'
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        JOB_WORKERS = 0
+        METRICS_ENABLED = False
+        # Bộ đệm phản hồi trả lời từ bộ nhớ mà không chạy câu lệnh nào, che mất N+1
+        RESPONSE_CACHE_SIZE = 0
+        QUERY_BUDGET_MODE = 'raise'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def sellers(app):
+    """Usernames by id of SELLERS sellers with POSTS_PER_SELLER posts each; every seller buys from the next"""
+    users = []
+    for i in range(SELLERS):
+        user, error = UserService.create_user(f'seller{i}', f'seller{i}@example.com', 'secret')
+        assert error is None
+        users.append(user)
+    posts = []
+    for user in users:
+        for j in range(POSTS_PER_SELLER):
+            post, error = PostService.create_post(user.id, f'Món {j}', 3, 1000 + j, '', '0900000000')
+            assert error is None
+            posts.append(post)
+    for i, user in enumerate(users):
+        order, error = OrderService.create_order(posts[(i + 1) % SELLERS * POSTS_PER_SELLER].id, user.id, 1)
+        assert error is None
+    names = {user.id: user.username for user in users}
+    # Mỗi lần gọi bắt đầu với session rỗng như một request, để không có gì được nạp sẵn
+    db.session.remove()
+    return names
+
+
+def test_feed_runs_one_statement_with_seller_names(sellers):
+    with query_budget(1) as budget:
+        posts = PostService.get_all_posts()
+    assert len(budget.statements) == 1
+    assert len(posts) == SELLERS * POSTS_PER_SELLER
+    assert {post['seller'] for post in posts} == set(sellers.values())
+    assert all(post['seller'] == sellers[post['user_id']] for post in posts)
+
+
+def test_feed_pages_stay_within_budget(sellers):
+    seen, cursor = [], None
+    while True:
+        page, next_cursor = PostService.get_all_posts(limit=3, cursor=cursor)
+        seen += page
+        if next_cursor is None:
+            break
+        cursor = decode_cursor(next_cursor)
+    assert len(seen) == SELLERS * POSTS_PER_SELLER
+
+
+def test_order_lists_stay_within_budget(sellers):
+    seller_id = next(iter(sellers))
+    assert len(OrderService.get_all_orders()) == SELLERS
+    assert len(OrderService.get_orders_by_buyer(seller_id)) == 1
+    assert len(OrderService.get_orders_by_seller(seller_id)) == 1
+    page, _ = OrderService.get_all_orders(limit=2)
+    assert len(page) == 2
+
+
+def test_user_lists_stay_within_budget(sellers):
+    seller_id = next(iter(sellers))
+    assert len(PostService.get_posts_by_user(seller_id)) == POSTS_PER_SELLER
+    # Các seller cùng tài khoản admin tạo lúc khởi động
+    assert len(UserService.get_all_users()) == SELLERS + 1
+
+
+def test_lazy_author_access_exceeds_budget(sellers):
+    @query_budget(1)
+    def feed_with_lazy_authors():
+        return [(post.id, post.author.username) for post in Post.query.filter_by(is_active=True)]
+
+    with pytest.raises(QueryBudgetExceeded, match='feed_with_lazy_authors ran 6 SQL statements, budget 1'):
+        feed_with_lazy_authors()